@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the `helpfulfields` querysets and admin columns, run against
+generated `SQLite`_ databases of various sizes; see :doc:`benchmarks`
+"""
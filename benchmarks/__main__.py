@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Runs the benchmarks, or compares two sets of results::
+
+    python -m benchmarks run --sizes=1000,100000 --output=current.json
+    python -m benchmarks compare baseline.json current.json
+    python -m benchmarks changelist --page-sizes=10,100 --fan-outs=0,10
+"""
+from optparse import OptionParser
+import json
+import os
+import platform
+import sys
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+
+def run(options, args):
+    import django
+    from django.conf import settings
+    from benchmarks import fixtures, suite
+    sizes = fixtures.SIZES
+    if options.sizes:
+        sizes = [int(size) for size in options.sizes.split(',')]
+    names = [name for name in (options.only or '').split(',') if name]
+    output = {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'page_size': suite.PAGE_SIZE,
+        'results': {},
+    }
+    for size in sizes:
+        if fixtures.build(size, settings.BENCHMARK_DIR):
+            sys.stderr.write('generated %d rows\n' % size)
+        output['results'][str(size)] = suite.run(names=names,
+                                                 repeat=options.repeat)
+        for name, result in sorted(output['results'][str(size)].items()):
+            sys.stderr.write('%8d %-28s %8.4fs %4d queries %8d kb\n' % (
+                size, name, result['wall'], result['queries'],
+                result['peak_kb']))
+    if options.output:
+        with open(options.output, 'w') as destination:
+            json.dump(output, destination, indent=2, sort_keys=True)
+    else:
+        json.dump(output, sys.stdout, indent=2, sort_keys=True)
+    return 0
+
+
+def compare(options, args):
+    from benchmarks import suite
+    if len(args) != 2:
+        sys.stderr.write('compare needs a baseline and a current file\n')
+        return 2
+    with open(args[0]) as baseline:
+        before = json.load(baseline)
+    with open(args[1]) as current:
+        after = json.load(current)
+    regressions = suite.compare(before, after, tolerance=options.tolerance)
+    for regression in regressions:
+        sys.stdout.write('REGRESSION: %s\n' % regression)
+    if not regressions:
+        sys.stdout.write('no regressions\n')
+    return int(bool(regressions))
+
+
+def changelist(options, args):
+    import django
+    from django.conf import settings
+    from benchmarks import changelist
+    page_sizes = changelist.PAGE_SIZES
+    if options.page_sizes:
+        page_sizes = [int(size) for size in options.page_sizes.split(',')]
+    fan_outs = changelist.FAN_OUTS
+    if options.fan_outs:
+        fan_outs = [int(fan_out) for fan_out in options.fan_outs.split(',')]
+    results = changelist.run(settings.BENCHMARK_DIR, page_sizes=page_sizes,
+                             fan_outs=fan_outs, requests=options.requests)
+    for fan_out in fan_outs:
+        rows = [('changelist/%s' % size, result) for size, result in
+                sorted(results['changelist'][str(fan_out)].items(),
+                       key=lambda item: int(item[0]))]
+        rows.append(('change', results['change'][str(fan_out)]))
+        for name, result in rows:
+            sys.stderr.write('fan out %3d %-16s p50 %7.4fs p95 %7.4fs '
+                             'p99 %7.4fs %4d queries %8d bytes\n' % (
+                                 fan_out, name, result['p50'], result['p95'],
+                                 result['p99'], result['queries'],
+                                 result['bytes']))
+    results.update({
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'requests': options.requests,
+    })
+    if options.output:
+        with open(options.output, 'w') as destination:
+            json.dump(results, destination, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+    return 0
+
+
+COMMANDS = {'run': run, 'compare': compare, 'changelist': changelist}
+
+
+def main(argv):
+    parser = OptionParser(usage='%prog run|compare|changelist [options] '
+                                '[files]')
+    parser.add_option('--sizes', dest='sizes', default=None,
+                      help='Comma separated numbers of rows to generate.')
+    parser.add_option('--only', dest='only', default=None,
+                      help='Comma separated operations to run.')
+    parser.add_option('--repeat', dest='repeat', type='int', default=3,
+                      help='How many times to run each operation.')
+    parser.add_option('--output', dest='output', default=None,
+                      help='Where to write the results, as JSON.')
+    parser.add_option('--page-sizes', dest='page_sizes', default=None,
+                      help='Comma separated changelist page sizes.')
+    parser.add_option('--fan-outs', dest='fan_outs', default=None,
+                      help='Comma separated numbers of related objects '
+                           'per row.')
+    parser.add_option('--requests', dest='requests', type='int', default=50,
+                      help='How many requests to make per measurement.')
+    parser.add_option('--tolerance', dest='tolerance', type='float',
+                      default=0.2,
+                      help='How much slower or larger counts as a '
+                           'regression, as a fraction.')
+    options, args = parser.parse_args(argv)
+    if not args or args[0] not in COMMANDS:
+        parser.error('choose one of: %s' % ', '.join(sorted(COMMANDS)))
+    return COMMANDS[args[0]](options, args[1:])
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
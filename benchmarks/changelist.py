@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Measures what the `helpfulfields` admin helpers cost as a whole, by
+requesting the changelist and change views of a
+:class:`~django.contrib.admin.ModelAdmin` which uses every column, list
+filter, action and fieldset which can be used together, through the
+`Django`_ test client, at various page sizes and numbers of related objects
+per row.
+"""
+from datetime import datetime
+import math
+import os
+from random import Random
+import time
+from django.contrib import admin
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.urlresolvers import reverse
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+from django.test.client import Client
+from helpfulfields.admin import (ViewOnSite, RelationCount, RelationList,
+                                 LogEntrySparkline, RelationSparkline,
+                                 DatePublishingListFilter,
+                                 SoftDeleteListFilter, publish_selected,
+                                 unpublish_selected, soft_delete_selected,
+                                 restore_selected, titles_fieldset,
+                                 date_publishing_fieldset, seo_fieldset,
+                                 changetracking_fieldset,
+                                 changetracking_readonlys)
+from benchmarks.fixtures import generate, insert_rows, db_datetimes
+from benchmarks.models import Page, Block
+
+#: the changelist page sizes measured when none are given.
+PAGE_SIZES = (10, 100, 500)
+
+#: the numbers of related objects, and history entries, per row measured
+#: when none are given.
+FAN_OUTS = (0, 10, 50)
+
+#: the percentiles of latency reported.
+PERCENTILES = (50, 95, 99)
+
+
+class PageAdmin(admin.ModelAdmin):
+    # publishing_fieldset is for the Publishing mixin, which can't be used
+    # alongside DatePublishing.
+    fieldsets = [titles_fieldset, date_publishing_fieldset, seo_fieldset,
+                 changetracking_fieldset]
+    readonly_fields = changetracking_readonlys
+    list_display = ['title', ViewOnSite(),
+                    RelationCount('blocks', 'blocks'),
+                    RelationList('blocks', 'blocks'),
+                    RelationSparkline('blocks', 'new blocks'),
+                    LogEntrySparkline()]
+    list_filter = [DatePublishingListFilter, SoftDeleteListFilter]
+    actions = [publish_selected, unpublish_selected, soft_delete_selected,
+               restore_selected]
+
+
+def setup():
+    """
+    Mounts the models on the default admin site.
+    """
+    if Page not in admin.site._registry:
+        admin.site.register(Page, PageAdmin)
+    if Block not in admin.site._registry:
+        admin.site.register(Block)
+
+
+def populate(fan_out, using=DEFAULT_DB_ALIAS, seed=0):
+    """
+    Creates enough pages for the largest of the :data:`PAGE_SIZES`, each
+    with `fan_out` blocks and history entries, and a superuser called
+    ``admin`` to request them as.
+
+    :rtype: None
+    """
+    rng = Random(seed)
+    dates = db_datetimes(datetime.now(), days=14, using=using)
+    past = dates[:len(dates) // 2]
+    count = max(PAGE_SIZES)
+    with transaction.commit_on_success(using=using):
+        insert_rows(Page, ({
+            'created': rng.choice(past),
+            'modified': rng.choice(past),
+            'title': u'page %d' % i,
+            'publish_on': rng.choice(dates),
+            'unpublish_on': rng.choice([None, rng.choice(dates)]),
+        } for i in xrange(count)), using=using)
+        pks = list(Page._base_manager.using(using)
+                   .values_list('pk', flat=True))
+        insert_rows(Block, ({
+            'created': rng.choice(past),
+            'modified': rng.choice(past),
+            'page_id': pk,
+        } for pk in pks for i in xrange(fan_out)), using=using)
+        user = User.objects.db_manager(using).create_superuser(
+            'admin', 'admin@example.com', 'admin')
+        ct = ContentType.objects.db_manager(using).get_for_model(Page)
+        insert_rows(LogEntry, ({
+            'action_time': rng.choice(past),
+            'user_id': user.pk,
+            'content_type_id': ct.pk,
+            'object_id': unicode(pk),
+            'object_repr': u'page',
+            'action_flag': 2,
+            'change_message': u'',
+        } for pk in pks for i in xrange(fan_out)), using=using)
+
+
+def percentile(values, percent):
+    """
+    The nearest-rank percentile of some values.
+    """
+    ordered = sorted(values)
+    rank = int(math.ceil(percent / 100.0 * len(ordered)))
+    return ordered[max(0, rank - 1)]
+
+
+def measure(client, urls, using=DEFAULT_DB_ALIAS):
+    """
+    Requests each of `urls` in turn, after one request to warm up.
+
+    :return: the latency percentiles in seconds, and the most queries and
+             bytes any one request took.
+    :rtype: dictionary
+    """
+    connection = connections[using]
+    connection.use_debug_cursor = True
+    client.get(urls[0])
+    timings = []
+    queries = []
+    sizes = []
+    for url in urls:
+        del connection.queries[:]
+        began = time.time()
+        response = client.get(url)
+        timings.append(time.time() - began)
+        if response.status_code != 200:
+            raise RuntimeError('%s responded with %d'
+                               % (url, response.status_code))
+        queries.append(len(connection.queries))
+        sizes.append(len(response.content))
+    result = {'queries': max(queries), 'bytes': max(sizes)}
+    for percent in PERCENTILES:
+        result['p%d' % percent] = percentile(timings, percent)
+    return result
+
+
+def run(directory, page_sizes=PAGE_SIZES, fan_outs=FAN_OUTS, requests=50,
+        using=DEFAULT_DB_ALIAS):
+    """
+    Measures the changelist at each page size, and the change view, for each
+    fan out, generating the databases as necessary.
+
+    :param directory: where the databases are kept.
+    :param requests: how many requests to measure each time.
+    :rtype: dictionary
+    """
+    setup()
+    results = {'changelist': {}, 'change': {}}
+    changelist_url = reverse('admin:benchmarks_page_changelist')
+    for fan_out in fan_outs:
+        path = os.path.join(directory, 'changelist-%d.sqlite3' % fan_out)
+        generate(path, lambda using: populate(fan_out, using=using),
+                 using=using)
+        client = Client()
+        client.login(username='admin', password='admin')
+        model_admin = admin.site._registry[Page]
+        by_size = results['changelist'][str(fan_out)] = {}
+        for page_size in page_sizes:
+            model_admin.list_per_page = page_size
+            by_size[str(page_size)] = measure(
+                client, [changelist_url] * requests, using=using)
+        pks = list(Page._base_manager.using(using)
+                   .values_list('pk', flat=True)[:requests])
+        results['change'][str(fan_out)] = measure(client, [
+            reverse('admin:benchmarks_page_change', args=(pks[i % len(pks)],))
+            for i in range(requests)
+        ], using=using)
+    return results
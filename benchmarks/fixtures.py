@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Generates the tables the benchmarks run against, using the models from
+:mod:`helpfulfields.tests`, as quickly as `SQLite`_ allows: rows are
+inserted with ``executemany`` in large batches, inside a single transaction,
+without creating any model instances.
+"""
+from datetime import datetime, timedelta
+import os
+from random import Random
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+from django.db.models import AutoField
+from helpfulfields.tests import (TestModel, TestModelDates, TestTouchParent,
+                                 TestTouchChild, TestSoftDeleteTracked)
+
+#: the sizes benchmarked when none are given.
+SIZES = (1000, 100000, 1000000)
+
+#: how many rows are given to each ``executemany``
+INSERT_BATCH_SIZE = 10000
+
+#: every relation benchmark has this many children per parent, on average.
+FAN_OUT = 10
+
+
+def database_path(directory, size):
+    """
+    :return: where the database for the given number of rows is kept.
+    :rtype: string
+    """
+    return os.path.join(directory, 'helpfulfields-%d.sqlite3' % size)
+
+
+def use_database(path, using=DEFAULT_DB_ALIAS):
+    """
+    Points the connection at a different `SQLite`_ file, closing it first
+    so that the next query reconnects.
+
+    :rtype: None
+    """
+    connection = connections[using]
+    connection.close()
+    connection.settings_dict['NAME'] = path
+
+
+def insert_rows(model, rows, using=DEFAULT_DB_ALIAS):
+    """
+    Inserts rows without going through model instances, or even the field's
+    own conversion of each value, so datetimes must already be in their
+    database representation (see :func:`db_datetimes`).
+
+    :param model: the model whose table to insert into.
+    :param rows: an iterable of dictionaries of field attnames to values,
+                 with anything missing taken from the field's default.
+    :return: the number of rows inserted.
+    :rtype: integer
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    fields = [f for f in model._meta.local_fields
+              if not isinstance(f, AutoField)]
+    defaults = [f.get_db_prep_save(f.get_default(), connection)
+                for f in fields]
+    sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+        qn(model._meta.db_table),
+        ', '.join([qn(f.column) for f in fields]),
+        ', '.join(['%s'] * len(fields)))
+    cursor = connection.cursor()
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append([row.get(f.attname, defaults[i])
+                      for i, f in enumerate(fields)])
+        if len(batch) >= INSERT_BATCH_SIZE:
+            cursor.executemany(sql, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+        count += len(batch)
+    return count
+
+
+def db_datetimes(now, days, using=DEFAULT_DB_ALIAS):
+    """
+    One datetime per minute for `days` either side of `now`, already
+    converted for the database, so that generating millions of rows doesn't
+    mean converting millions of datetimes.
+
+    :return: the datetimes, oldest first.
+    :rtype: list
+    """
+    ops = connections[using].ops
+    minutes = days * 24 * 60
+    return [ops.value_to_db_datetime(now + timedelta(minutes=minute))
+            for minute in range(-minutes, minutes)]
+
+
+def populate(size, seed=0, using=DEFAULT_DB_ALIAS):
+    """
+    Fills the benchmark tables with `size` rows each; the relation tables
+    get ``size / FAN_OUT`` parents with `size` children and history entries
+    spread amongst them. The same `size` and `seed` always generate the
+    same data.
+
+    :param size: the number of rows in each table.
+    :param seed: for the random number generator.
+    :rtype: None
+    """
+    rng = Random(seed)
+    now = datetime.now()
+    # half in the past, half in the future.
+    dates = db_datetimes(now, days=30, using=using)
+    past = dates[:len(dates) // 2]
+    last_fortnight = past[-14 * 24 * 60:]
+    parents = max(1, size // FAN_OUT)
+
+    with transaction.commit_on_success(using=using):
+        insert_rows(TestModel, ({
+            'created': rng.choice(past),
+            'modified': rng.choice(past),
+            'title': u'title %d' % i,
+            'is_published': rng.random() < 0.5,
+        } for i in xrange(size)), using=using)
+
+        def publication_dates():
+            for i in xrange(size):
+                publish_on = rng.choice(dates)
+                unpublish_on = rng.choice([None, rng.choice(dates)])
+                yield {'title': u'title %d' % i, 'publish_on': publish_on,
+                       'unpublish_on': unpublish_on}
+        insert_rows(TestModelDates, publication_dates(), using=using)
+
+        deleted = [choice for choice, label in
+                   TestSoftDeleteTracked.DELETED_CHOICES]
+        insert_rows(TestSoftDeleteTracked, ({
+            'created': rng.choice(past),
+            'modified': rng.choice(past),
+            'title': u'title %d' % i,
+            'deleted': rng.choice(deleted),
+        } for i in xrange(size)), using=using)
+
+        insert_rows(TestTouchParent, ({
+            'created': rng.choice(past),
+            'modified': rng.choice(past),
+            'title': u'parent %d' % i,
+        } for i in xrange(parents)), using=using)
+        first_parent = (TestTouchParent._base_manager.using(using)
+                        .order_by('pk').values_list('pk', flat=True)[0])
+        insert_rows(TestTouchChild, ({
+            'created': rng.choice(past),
+            'modified': rng.choice(past),
+            'parent_id': first_parent + rng.randrange(parents),
+        } for i in xrange(size)), using=using)
+
+        user = User.objects.db_manager(using).create(username='benchmarks')
+        ct = ContentType.objects.db_manager(using).get_for_model(
+            TestTouchParent)
+        insert_rows(LogEntry, ({
+            'action_time': rng.choice(last_fortnight),
+            'user_id': user.pk,
+            'content_type_id': ct.pk,
+            'object_id': unicode(first_parent + rng.randrange(parents)),
+            'object_repr': u'parent',
+            'action_flag': 2,
+            'change_message': u'',
+        } for i in xrange(size)), using=using)
+
+
+def generate(path, populate, using=DEFAULT_DB_ALIAS):
+    """
+    Makes sure there's a database at `path`, creating the tables and
+    calling `populate` to fill them if it doesn't already exist, and
+    switches to it.
+
+    :param path: where the `SQLite`_ database should be.
+    :param populate: a callable given the `using` argument.
+    :return: whether or not the database had to be generated.
+    :rtype: boolean
+    """
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    if os.path.exists(path):
+        use_database(path, using=using)
+        return False
+    # an interrupted generation mustn't be mistaken for a finished one.
+    partial = '%s.partial' % path
+    if os.path.exists(partial):
+        os.remove(partial)
+    use_database(partial, using=using)
+    call_command('syncdb', interactive=False, verbosity=0, database=using)
+    populate(using=using)
+    # let the query planner know how big everything is.
+    connections[using].cursor().execute('ANALYZE')
+    connections[using].close()
+    os.rename(partial, path)
+    use_database(path, using=using)
+    return True
+
+
+def build(size, directory, seed=0, using=DEFAULT_DB_ALIAS):
+    """
+    Makes sure there's a database of the given `size` in `directory`,
+    generating it with :func:`populate` if it doesn't already exist, and
+    switches to it.
+
+    :return: whether or not the database had to be generated.
+    :rtype: boolean
+    """
+    return generate(database_path(directory, size),
+                    lambda using: populate(size, seed=seed, using=using),
+                    using=using)
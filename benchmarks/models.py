@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+Models for the end to end benchmarks in :mod:`benchmarks.changelist`, which
+between them use as much of `helpfulfields` as can be used at once.
+"""
+from django.db import models
+from helpfulfields.models import (ChangeTracking, Titles, SEO, DatePublishing,
+                                  SoftDelete)
+from helpfulfields.querysets import (ChangeTrackingQuerySet,
+                                     DatePublishingQuerySet,
+                                     SoftDeleteQuerySet)
+from model_utils.managers import PassThroughManager
+
+
+class PageQuerySet(ChangeTrackingQuerySet, DatePublishingQuerySet,
+                   SoftDeleteQuerySet):
+    pass
+
+
+class Page(ChangeTracking, Titles, SEO, DatePublishing, SoftDelete):
+    objects = PassThroughManager.for_queryset_class(PageQuerySet)()
+
+    def __unicode__(self):
+        return self.title
+
+    def get_absolute_url(self):
+        return u'/pages/%d/' % self.pk
+
+
+class Block(ChangeTracking):
+    page = models.ForeignKey(Page, related_name='blocks')
+    touch_parents = ('page',)
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import os
+
+# each benchmark size gets its own database in this directory, so that the
+# (slow to generate) large fixtures may be reused between runs.
+BENCHMARK_DIR = os.environ.get('HELPFULFIELDS_BENCHMARK_DIR',
+                               os.path.join(os.getcwd(), '.benchmarks'))
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BENCHMARK_DIR, 'default.sqlite3'),
+    }
+}
+
+INSTALLED_APPS = (
+    'django.contrib.auth',
+    'django.contrib.admin',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'helpfulfields',
+    'benchmarks',
+)
+
+ROOT_URLCONF = 'test_urls'
+
+SECRET_KEY = 'helpfulfields-benchmarks'
+
+ALLOWED_HOSTS = ['testserver']
+
+PASSWORD_HASHERS = (
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+)
+
+DEBUG = False
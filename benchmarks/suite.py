@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+The operations being benchmarked, and the means of measuring and comparing
+them. Each operation is measured in a forked child process, so that its
+peak memory use may be told apart from everything which came before it.
+"""
+import json
+import os
+import resource
+import time
+from django.contrib import admin
+from django.db import connections, DEFAULT_DB_ALIAS
+from helpfulfields.admin import RelationList, RelationCount, LogEntrySparkline
+from helpfulfields.tests import (TestModel, TestModelDates, TestTouchParent,
+                                 TestTouchChild, TestSoftDeleteTracked)
+
+#: how many objects the changelist-style operations render, and list
+#: operations fetch.
+PAGE_SIZE = 100
+
+#: the fraction by which wall time or peak memory may grow before
+#: :func:`compare` considers it a regression.
+TOLERANCE = 0.2
+
+OPERATIONS = []
+
+
+def operation(func):
+    """
+    Adds a function to the :data:`OPERATIONS` to be benchmarked.
+    """
+    OPERATIONS.append((func.__name__, func))
+    return func
+
+
+def count_and_page(queryset):
+    """
+    What a changelist does with a queryset: counts it, and fetches a page.
+    """
+    queryset.count()
+    list(queryset[:PAGE_SIZE])
+
+
+def parents_page():
+    return list(TestTouchParent.objects.order_by('pk')[:PAGE_SIZE])
+
+
+@operation
+def publishing_published():
+    count_and_page(TestModel.objects.published())
+
+
+@operation
+def date_publishing_published():
+    count_and_page(TestModelDates.objects.published())
+
+
+@operation
+def soft_delete_all():
+    count_and_page(TestSoftDeleteTracked.objects.get_query_set().all())
+
+
+@operation
+def relation_list():
+    column = RelationList('children', 'children')
+    for obj in parents_page():
+        column(obj)
+
+
+@operation
+def relation_count():
+    column = RelationCount('children', 'children')
+    objs = parents_page()
+    column.prepare(objs)
+    for obj in objs:
+        column(obj)
+
+
+@operation
+def logentry_sparkline():
+    column = LogEntrySparkline(days=14)
+    for obj in parents_page():
+        column(obj)
+
+
+def setup():
+    """
+    Mounts the models on the default admin site, as
+    :class:`~helpfulfields.admin.RelationList` links to their changelists.
+    """
+    for model in (TestTouchParent, TestTouchChild):
+        if model not in admin.site._registry:
+            admin.site.register(model)
+
+
+def _measure(func, repeat, using):
+    connection = connections[using]
+    connection.use_debug_cursor = True
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    queries = 0
+    for attempt in range(repeat):
+        del connection.queries[:]
+        began = time.time()
+        func()
+        timings.append(time.time() - began)
+        queries = len(connection.queries)
+    end_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'wall': min(timings),
+        'queries': queries,
+        'peak_kb': end_rss - start_rss,
+    }
+
+
+def measure(func, repeat=3, using=DEFAULT_DB_ALIAS):
+    """
+    Runs `func` `repeat` times in a child process.
+
+    :return: the fastest wall time in seconds, the number of queries
+             executed, and how far the peak resident memory grew, in
+             kilobytes.
+    :rtype: dictionary
+    """
+    # the child mustn't share the parent's database connection.
+    connections[using].close()
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        status = 0
+        try:
+            try:
+                result = _measure(func, repeat, using)
+            except Exception, e:
+                result = {'error': repr(e)}
+                status = 1
+            with os.fdopen(write_end, 'w') as output:
+                json.dump(result, output)
+        finally:
+            os._exit(status)
+    os.close(write_end)
+    with os.fdopen(read_end) as output:
+        data = output.read()
+    os.waitpid(pid, 0)
+    result = json.loads(data)
+    if 'error' in result:
+        raise RuntimeError('%s failed: %s' % (func.__name__, result['error']))
+    return result
+
+
+def run(names=None, repeat=3, using=DEFAULT_DB_ALIAS):
+    """
+    Measures each of the :data:`OPERATIONS`, or just those named, against
+    the database currently in use.
+
+    :rtype: dictionary
+    """
+    setup()
+    results = {}
+    for name, func in OPERATIONS:
+        if names and name not in names:
+            continue
+        results[name] = measure(func, repeat=repeat, using=using)
+    return results
+
+
+def compare(baseline, current, tolerance=TOLERANCE):
+    """
+    Finds the operations which have got worse since `baseline`: any extra
+    query is a regression, as is wall time or peak memory growing by more
+    than `tolerance`. Operations or sizes missing from either are ignored.
+
+    :param baseline: results previously written by ``run``
+    :param current: results to check.
+    :return: a description of each regression.
+    :rtype: list of strings
+    """
+    regressions = []
+    for size, operations in sorted(current['results'].items()):
+        before_operations = baseline['results'].get(size, {})
+        for name, after in sorted(operations.items()):
+            before = before_operations.get(name)
+            if before is None:
+                continue
+            if after['queries'] > before['queries']:
+                regressions.append('%s @ %s rows: %d queries, was %d' % (
+                    name, size, after['queries'], before['queries']))
+            for key, unit in (('wall', 's'), ('peak_kb', 'kb')):
+                # ignore noise around nothing at all.
+                allowed = max(before[key] * (1 + tolerance), 0.001
+                              if key == 'wall' else 64)
+                if after[key] > allowed:
+                    regressions.append('%s @ %s rows: %s %.3f%s, was %.3f%s'
+                                       % (name, size, key, after[key], unit,
+                                          before[key], unit))
+    return regressions
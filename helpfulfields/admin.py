@@ -1,20 +1,47 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime, timedelta
+import json
 import logging
 from operator import itemgetter
 from django.conf import settings
-from django.contrib.admin.models import LogEntry
-from django.contrib.contenttypes.models import ContentType
-from django.core.urlresolvers import reverse, NoReverseMatch
-from django.template import Template, Context
+from django.contrib.admin import SimpleListFilter
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator, InvalidPage
+from django.db import transaction
+from django.db.models.fields.related import ForeignRelatedObjectsDescriptor
+from django.db.models.query import prefetch_related_objects
+from django.forms import Media
+from django.http import HttpResponse
 from django.utils.encoding import force_unicode
 from django.utils.html import escape
 from django.utils.translation import string_concat
-from helpfulfields.settings import MAX_NUM_RELATIONS
+from helpfulfields.publishedcache import invalidate_published_pks
+from helpfulfields.querysets import has_live_column
+from helpfulfields.rowcache import (ROW_CACHE_ATTR, cached_rows,
+                                    invalidate_rows_on)
+from helpfulfields.settings import (MAX_NUM_RELATIONS,
+                                    ESTIMATED_COUNT_THRESHOLD,
+                                    ROW_CACHE_TIMEOUT, BULK_CHANGE_BATCH_SIZE)
 from helpfulfields.text import (seo_fieldset_label, changetracking_fieldset_label,
                                 dates_fieldset_label, view_on_site_label,
                                 object_not_mounted, logentry_label,
-                                logentry_empty)
+                                logentry_empty, logentry_bad_renderer,
+                                quick_publish_label,
+                                publication_published, publication_unpublished,
+                                publication_filter_label, soft_delete_label,
+                                soft_delete_present, soft_delete_false,
+                                soft_delete_true, list_filter_count,
+                                list_filter_all, approximate_count,
+                                publish_action_label, unpublish_action_label,
+                                soft_delete_action_label, restore_action_label,
+                                bulk_action_log, bulk_action_done,
+                                published_action, unpublished_action,
+                                soft_deleted_action, restored_action,
+                                deferred_loading)
+from helpfulfields.utils import (grouped_count, is_unfiltered, stamp_modified,
+                                 estimated_row_count, counts_for_querysets,
+                                 counts_by_day)
 
 logger = logging.getLogger(__name__)
 
@@ -161,6 +188,7 @@ class ViewOnSite(object):
         """
         if not hasattr(obj, 'get_absolute_url'):
             return u''
+        from django.contrib.contenttypes.models import ContentType
 
         output = (u'<a href="../../r/%(content_type)d/%(pk)d/" class="'
                   u'changelist-viewsitelink">%(text)s</a>')
@@ -184,6 +212,10 @@ class RelationCount(object):
     which adds a new column to the admin which shows the results of
     ``obj.accessor.count()`` and the verbose name.
 
+    Giving a `cap` stops counting after that many related items, showing
+    *10000+ items*, so that each count takes a bounded amount of work
+    regardless of how many related items there really are.
+
     .. note::
         We expect to be able to address the relation from the ``obj`` instance.
         As such, reverse relations denied via setting a ``related_name`` of ``+``
@@ -192,19 +224,39 @@ class RelationCount(object):
     .. warning::
         This should result in a maximum of **one** additional query being
         executed, *per object, per usage*, to get a count of related objects.
+        Using :class:`PreparedColumnsAdminMixin` reduces this to **one**
+        query per page.
 
     :test case: :class:`helpfulfields.tests.RelationCountTestCase`
     """
-    def __init__(self, accessor, label):
+    def __init__(self, accessor, label, cap=None):
         """
         :param accessor: The attribute to look for on each ``obj`` (Model instance)
         :param label: the short description for the
                       :meth:`~django.contrib.admin.ModelAdmin.changelist_view`
                       changelist column.
+        :param cap: the optional number of related items to stop counting at.
         """
         self.accessor = accessor
         self.short_description = label
         self.__name__ = label
+        self.cap = cap
+        self.cache_name = '_%s_count_%s_cache' % (accessor, cap)
+
+    def prepare(self, objs):
+        """
+        Counts the related items for a whole page of objects at once, using
+        :func:`~helpfulfields.utils.counts_for_querysets`, and remembers each
+        count on the object, for :meth:`__call__` to use.
+
+        :param objs: the objects in the changelist page.
+        :rtype: None
+        """
+        querysets = dict((obj.pk, getattr(obj, self.accessor).all())
+                         for obj in objs)
+        counts = counts_for_querysets(querysets, cap=self.cap)
+        for obj in objs:
+            setattr(obj, self.cache_name, counts.get(obj.pk, 0))
 
     def __call__(self, obj):
         """
@@ -218,10 +270,15 @@ class RelationCount(object):
         :return: a count and verbose name, eg: *3 categories*.
         :rtype: unicode string.
         """
-        relation = getattr(obj, self.accessor)
-        self._relcount = relation.count()
+        if not hasattr(obj, self.cache_name):
+            self.prepare([obj])
+        self._relcount = getattr(obj, self.cache_name)
         self._vname = obj._meta.get_field_by_name(self.accessor)[0].opts.verbose_name,
-        return u'%(count)d %(verbose_name)s' % {
+        output = u'%(count)d %(verbose_name)s'
+        if self.cap is not None and self._relcount > self.cap:
+            output = u'%(count)d+ %(verbose_name)s'
+            self._relcount = self.cap
+        return output % {
             'count': self._relcount,
             'verbose_name': self._vname,
         }
@@ -252,7 +309,8 @@ class RelationList(object):
         :class:`~django.contrib.admin.ModelAdmin` to use
         :meth:`~django.db.models.query.QuerySet.select_related` and/or
         :meth:`~django.db.models.query.QuerySet.prefetch_related` may remove
-        this extra query.
+        this extra query, as will using :class:`PreparedColumnsAdminMixin`,
+        which fetches the related objects for the whole page at once.
 
     :test case: :class:`helpfulfields.tests.RelationListTestCase`
     """
@@ -276,6 +334,22 @@ class RelationList(object):
         self.more_content = more_separator or u'&hellip;'
         self.allow_tags = True
 
+    def prepare(self, objs):
+        """
+        fetches the related objects for a whole page of objects at once, for
+        use with :class:`PreparedColumnsChangeListMixin`, via
+        :meth:`~django.db.models.query.QuerySet.prefetch_related`'s
+        machinery, rather than one query per object.
+
+        :param objs: the objects on the current changelist page.
+        :rtype: None
+        """
+        try:
+            prefetch_related_objects(objs, [self.accessor])
+        except (AttributeError, ValueError):
+            # not something which may be prefetched, such as a method.
+            pass
+
     def __call__(self, obj):
         """
         adds a new column to the admin which shows the results of
@@ -285,6 +359,7 @@ class RelationList(object):
         :return: a comma separated list of links to the related objects.
         :rtype: unicode string.
         """
+        from django.core.urlresolvers import reverse, NoReverseMatch
         relation = getattr(obj, self.accessor)
         if callable(relation):
             relation = relation()
@@ -357,68 +432,59 @@ class RelationList(object):
         return string_concat(items, more_link)
 
 
-class LogEntrySparkline(object):
+class Sparkline(object):
     """
-    An object capable of being used in the
+    The base for objects which may be used in the
     :class:`~django.contrib.admin.ModelAdmin`
-    :attr:`~django.contrib.admin.ModelAdmin.list_display` to show a tiny
-    HTML-only sparkline of recent changes made via the admin::
+    :attr:`~django.contrib.admin.ModelAdmin.list_display` to draw a tiny
+    sparkline of how many rows were created (or changed, etc) per day,
+    according to any date or datetime field.
 
-        class MyModelAdmin(ModelAdmin):
-            list_display = ['pk', LogEntrySparkline(days=60)]
+    The rows are counted per day by the database, so drawing a sparkline
+    takes a single query per object, and only fetches one row per day
+    which has any, however many rows are being counted.
 
-    .. warning::
-        It is worth highlighting that this will potentially result in a maximum
-        of **two** additional queries being executed, *per object*, to get
-        the :class:`~django.contrib.contenttypes.models.ContentType` and the
-        :class:`~django.contrib.admin.models.LogEntry` items.
+    Subclasses provide the :meth:`queryset` to count for each object; see
+    :class:`LogEntrySparkline` and :class:`RelationSparkline`.
 
-        This will be amortized down to **one** query, once all needed
-        :class:`~django.contrib.contenttypes.models.ContentType` objects have
-        been cached internally by `Django`_.
-
-    .. note::
-        For the sake of being portable, and not requiring we be in the
-        `INSTALLED_APPS`, the HTML and CSS are actually declared
-        on this class, rather than via a template which we might
-        :func:`~django.template.loader.render_to_string`. This may yet be a
-        mistake, so the API methods should be considered private.
+    :test case: :class:`helpfulfields.tests.SparklineTestCase`
+    """
+    #: the date or datetime field to count rows by.
+    field = None
 
-    An example of the output is provided below, though it may render slightly
-    differently due to font-sizing differences between this documentation and
-    the standard `Django`_ :class:`~django.contrib.admin.AdminSite`:
+    #: the ways in which a sparkline may be drawn; see :meth:`__init__`
+    RENDERERS = ('html', 'svg', 'text')
 
-    .. raw:: html
+    #: the unicode block characters used by the ``text`` renderer, from
+    #: lowest to highest.
+    BLOCKS = u'\u2581\u2582\u2583\u2584\u2585\u2586\u2587\u2588'
 
-        <div class="changelist-sparkline" style="overflow:hidden;border-bottom:1px dotted #5b80b2;height:1em; display:inline-block;">
-            <div class="changelist-sparkline-bar" style="height:0.3em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
-            <div class="changelist-sparkline-bar" style="height:0.5em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
-            <div class="changelist-sparkline-bar" style="height:0.6em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
-            <div class="changelist-sparkline-bar" style="height:1em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
-            <div class="changelist-sparkline-bar" style="height:1em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
-            <div class="changelist-sparkline-bar" style="height:0.8em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
-            <div class="changelist-sparkline-bar" style="height:0.1em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
-            <div class="changelist-sparkline-bar" style="height:0em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
-            <div class="changelist-sparkline-bar" style="height:0.2em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
-            <div class="changelist-sparkline-bar" style="height:0.35em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
-            <div class="changelist-sparkline-bar" style="height:0.6em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
-            <div class="changelist-sparkline-bar" style="height:0.75em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
-            <div class="changelist-sparkline-bar" style="height:1em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
-            <div class="changelist-sparkline-bar" style="height:0.3em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
-        </div>
-
-    :test case: :class:`helpfulfields.tests.SparklineTestCase`
-    """
-    def __init__(self, days=14, label=logentry_label):
+    def __init__(self, label, field=None, days=14, renderer='html'):
         """
-        :param days: How far back should we generate a sparkline for.
         :param label: the short description for the
                       :meth:`~django.contrib.admin.ModelAdmin.changelist_view`
                       changelist column.
+        :param field: the date or datetime field to count rows by, if not
+                      the class's own :attr:`field`
+        :param days: How far back should we generate a sparkline for.
+        :param renderer: ``html`` draws a styled element per day, as shown
+                         for :class:`LogEntrySparkline`; ``svg`` draws a
+                         single inline SVG line and ``text`` a string of
+                         unicode block characters, both of which stay small
+                         however many `days` there are, and are styled by
+                         the shared ``helpfulfields/sparkline.css``
+                         stylesheet.
         """
+        assert renderer in self.RENDERERS, logentry_bad_renderer % {
+            'renderer': renderer,
+            'choices': u', '.join(self.RENDERERS),
+        }
         self.short_description = label
         self.__name__ = label
+        if field is not None:
+            self.field = field
         self.days = days
+        self.renderer = renderer
         self.allow_tags = True
 
     def __call__(self, obj):
@@ -429,37 +495,103 @@ class LogEntrySparkline(object):
         :return: the HTML representing the sparkline graph.
         :rtype: unicode string.
         """
-        ct = ContentType.objects.get_for_model(obj)
         now = datetime.now()
         back_to = now - timedelta(days=self.days)
 
-        # get all entries for this object in the last N days.
-        # Note: It doesn't matter what order results are returned in, as
-        # we're popping them into a separate, unsorted data structure anyway.
-        entries = LogEntry.objects.filter(content_type=ct, object_id=obj.pk,
-                                          action_time__gte=back_to)
-
         # generate the initial list of items.
         days_with_counts = {}
         for day_distance in range(0, self.days):
             new_datetime = now - timedelta(days=day_distance)
             days_with_counts[new_datetime.date()] = 0
 
-        # populate the existing dates with change counts.
-        for entry in entries:
-            days_with_counts[entry.action_time.date()] += 1
+        # populate the existing dates with counts, which the database has
+        # already bucketed by day for us, possibly for the whole page at
+        # once. The earliest day may only be partially within the window,
+        # so is left off.
+        if hasattr(obj, self.cache_name):
+            found = getattr(obj, self.cache_name)
+        else:
+            entries = self.queryset(obj).filter(**{
+                '%s__gte' % self.field: back_to,
+            })
+            found = counts_by_day(entries, self.field)
+        for day, count in found.items():
+            if day in days_with_counts:
+                days_with_counts[day] = count
 
         maximum = max(days_with_counts.values()) #: 1em / 100%
         if maximum < 1:
             return logentry_empty
 
-        days_with_css_vals = {}
-        for key, val in days_with_counts.items():
-            val_as_percentage = val / maximum
-            days_with_css_vals[key] = val_as_percentage
+        counts = sorted(days_with_counts.items(), key=itemgetter(0))
+        return getattr(self, '_render_%s' % self.renderer)(counts, maximum)
+
+    def queryset(self, obj):
+        """
+        finds the rows to be counted for the given object; subclasses must
+        implement this.
+
+        :param obj: the current object in the changelist loop.
+        :return: the rows having a :attr:`field` to count by.
+        :rtype: :class:`~django.db.models.query.QuerySet`
+        """
+        raise NotImplementedError('subclasses of Sparkline must provide a '
+                                  'queryset() method')
+
+    def page_queryset(self, objs):
+        """
+        finds the rows to be counted for many objects at once, if the
+        subclass knows how; see :meth:`prepare`
+
+        :param objs: the objects on the current changelist page.
+        :return: the rows, and the name of the field on them which refers
+                 back to the objects, or :data:`None`
+        :rtype: tuple
+        """
+        return None
 
-        results = sorted(days_with_css_vals.items(), key=itemgetter(0))
+    @property
+    def cache_name(self):
+        """
+        the attribute on each object under which :meth:`prepare` stores its
+        counts.
+        """
+        return '_%s_%s_%d_cache' % (self.__class__.__name__.lower(),
+                                    self.field, self.days)
 
+    def prepare(self, objs):
+        """
+        counts the rows for a whole page of objects in a single query, for
+        use with :class:`PreparedColumnsChangeListMixin`, rather than one
+        query per object.
+
+        :param objs: the objects on the current changelist page.
+        :rtype: None
+        """
+        found = objs and self.page_queryset(objs)
+        if not found:
+            return None
+        queryset, owner = found
+        back_to = datetime.now() - timedelta(days=self.days)
+        entries = queryset.filter(**{'%s__gte' % self.field: back_to})
+        by_owner = dict(
+            (force_unicode(key), by_day) for key, by_day
+            in counts_by_day(entries, self.field, owner=owner).items())
+        for obj in objs:
+            setattr(obj, self.cache_name,
+                    by_owner.get(force_unicode(obj.pk), {}))
+
+    def _render_html(self, counts, maximum):
+        """
+        draws the sparkline as one styled element per day.
+
+        :param counts: pairs of dates and the number of changes, in order.
+        :param maximum: the greatest number of changes on any day.
+        :return: the HTML representing the sparkline graph.
+        :rtype: unicode string.
+        """
+        from django.template import Context
+        results = [(day, val / maximum) for day, val in counts]
         ctx = Context({
             'sparks': results,
             'sparkbar_css': self._sparkline_bar_css(),
@@ -467,6 +599,38 @@ class LogEntrySparkline(object):
         })
         return self._sparkline_template().render(ctx)
 
+    def _render_svg(self, counts, maximum):
+        """
+        draws the sparkline as a single SVG line, on a grid one unit wide per
+        day and ten units high.
+
+        :return: the SVG representing the sparkline graph.
+        :rtype: unicode string.
+        """
+        points = u' '.join([
+            u'%d,%d' % (x, 10 - int(round(10.0 * val / maximum)))
+            for x, (day, val) in enumerate(counts)
+        ])
+        return (u'<svg class="changelist-sparkline-svg" '
+                u'viewBox="0 0 %(width)d 10" preserveAspectRatio="none">'
+                u'<polyline points="%(points)s"'
+                u'/></svg>' % {'width': max(1, len(counts) - 1),
+                               'points': points})
+
+    def _render_text(self, counts, maximum):
+        """
+        draws the sparkline as one unicode block character per day.
+
+        :return: the HTML representing the sparkline graph.
+        :rtype: unicode string.
+        """
+        top = len(self.BLOCKS) - 1
+        blocks = u''.join([
+            self.BLOCKS[int(round(float(top) * val / maximum))]
+            for day, val in counts
+        ])
+        return u'<span class="changelist-sparkline-text">%s</span>' % blocks
+
     def _sparkline_bar_css(self):
         """
         generates the necessary CSS for an individual bar on the graph.
@@ -500,10 +664,19 @@ class LogEntrySparkline(object):
     def _sparkline_template(self):
         """
         generates the HTML, implements each bar and the appropriate CSS.
+        The template is compiled the first time each class needs it, and
+        kept for every sparkline of that class afterwards.
 
         :return: the template, ready to be rendered.
         :rtype: :class:`~django.template.base.Template`
         """
+        cls = self.__class__
+        if '_compiled_template' not in cls.__dict__:
+            cls._compiled_template = self._compile_template()
+        return cls._compiled_template
+
+    def _compile_template(self):
+        from django.template import Template
         return Template('''{% spaceless %}
         <div class="changelist-sparkline" style="{{ sparkline_css }}">
         {% for date, spark in sparks %}
@@ -511,3 +684,925 @@ class LogEntrySparkline(object):
         {% endfor %}
         </div>
         {% endspaceless %}''')
+
+
+class LogEntrySparkline(Sparkline):
+    """
+    An object capable of being used in the
+    :class:`~django.contrib.admin.ModelAdmin`
+    :attr:`~django.contrib.admin.ModelAdmin.list_display` to show a tiny
+    HTML-only sparkline of recent changes made via the admin::
+
+        class MyModelAdmin(ModelAdmin):
+            list_display = ['pk', LogEntrySparkline(days=60)]
+
+    .. warning::
+        It is worth highlighting that this will potentially result in a maximum
+        of **two** additional queries being executed, *per object*, to get
+        the :class:`~django.contrib.contenttypes.models.ContentType` and the
+        number of :class:`~django.contrib.admin.models.LogEntry` items per
+        day, which are counted by the database rather than fetched.
+
+        This will be amortized down to **one** query, once all needed
+        :class:`~django.contrib.contenttypes.models.ContentType` objects have
+        been cached internally by `Django`_, and to one query for the whole
+        page when using :class:`PreparedColumnsAdminMixin`.
+
+    .. note::
+        For the sake of being portable, and not requiring we be in the
+        `INSTALLED_APPS`, the HTML and CSS are actually declared
+        on this class, rather than via a template which we might
+        :func:`~django.template.loader.render_to_string`. This may yet be a
+        mistake, so the API methods should be considered private.
+
+    An example of the output is provided below, though it may render slightly
+    differently due to font-sizing differences between this documentation and
+    the standard `Django`_ :class:`~django.contrib.admin.AdminSite`:
+
+    .. raw:: html
+
+        <div class="changelist-sparkline" style="overflow:hidden;border-bottom:1px dotted #5b80b2;height:1em; display:inline-block;">
+            <div class="changelist-sparkline-bar" style="height:0.3em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
+            <div class="changelist-sparkline-bar" style="height:0.5em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
+            <div class="changelist-sparkline-bar" style="height:0.6em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
+            <div class="changelist-sparkline-bar" style="height:1em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
+            <div class="changelist-sparkline-bar" style="height:1em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
+            <div class="changelist-sparkline-bar" style="height:0.8em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
+            <div class="changelist-sparkline-bar" style="height:0.1em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
+            <div class="changelist-sparkline-bar" style="height:0em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
+            <div class="changelist-sparkline-bar" style="height:0.2em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
+            <div class="changelist-sparkline-bar" style="height:0.35em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
+            <div class="changelist-sparkline-bar" style="height:0.6em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
+            <div class="changelist-sparkline-bar" style="height:0.75em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
+            <div class="changelist-sparkline-bar" style="height:1em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
+            <div class="changelist-sparkline-bar" style="height:0.3em;width:0.3em;vertical-align:baseline;margin:0 0.05em;display:inline-block;background-color:#7CA0C7;"></div>
+        </div>
+
+    For longer periods, the ``svg`` and ``text`` renderers output a single
+    element per object, styled by a shared stylesheet, which may be included
+    via the :class:`~django.contrib.admin.ModelAdmin`'s media::
+
+        class MyModelAdmin(ModelAdmin):
+            list_display = ['pk', LogEntrySparkline(days=365, renderer='svg')]
+
+            class Media:
+                css = {'all': ['helpfulfields/sparkline.css']}
+
+    :test case: :class:`helpfulfields.tests.SparklineTestCase`
+    """
+    field = 'action_time'
+
+    def __init__(self, days=14, label=logentry_label, renderer='html'):
+        """
+        :param days: How far back should we generate a sparkline for.
+        :param label: the short description for the
+                      :meth:`~django.contrib.admin.ModelAdmin.changelist_view`
+                      changelist column.
+        :param renderer: the way in which to draw the sparkline; see
+                         :meth:`Sparkline.__init__`
+        """
+        super(LogEntrySparkline, self).__init__(label=label, days=days,
+                                                renderer=renderer)
+
+    def queryset(self, obj):
+        """
+        finds the admin's history for the given object.
+
+        :param obj: the current object in the changelist loop.
+        :rtype: :class:`~django.db.models.query.QuerySet`
+        """
+        from django.contrib.admin.models import LogEntry
+        from django.contrib.contenttypes.models import ContentType
+        ct = ContentType.objects.get_for_model(obj)
+        return LogEntry.objects.filter(content_type=ct, object_id=obj.pk)
+
+    def page_queryset(self, objs):
+        """
+        finds the admin's history for all the given objects.
+
+        :param objs: the objects on the current changelist page.
+        :rtype: tuple
+        """
+        from django.contrib.admin.models import LogEntry
+        from django.contrib.contenttypes.models import ContentType
+        ct = ContentType.objects.get_for_model(objs[0])
+        pks = [force_unicode(obj.pk) for obj in objs]
+        return (LogEntry.objects.filter(content_type=ct, object_id__in=pks),
+                'object_id')
+
+
+class RelationSparkline(Sparkline):
+    """
+    An object capable of being used in the
+    :class:`~django.contrib.admin.ModelAdmin`
+    :attr:`~django.contrib.admin.ModelAdmin.list_display` to show a tiny
+    sparkline of how many related objects were added per day, by any
+    date or datetime field on the related model, such as the
+    :attr:`~helpfulfields.models.ChangeTracking.created` date of objects
+    using :class:`~helpfulfields.models.ChangeTracking`::
+
+        class MyModelAdmin(ModelAdmin):
+            list_display = ['pk', RelationSparkline('comments', 'new comments',
+                                                    field='created', days=30)]
+
+    Rendering options are as for :class:`LogEntrySparkline`
+
+    :test case: :class:`helpfulfields.tests.SparklineTestCase`
+    """
+    field = 'created'
+
+    def __init__(self, accessor, label, field=None, days=14, renderer='html'):
+        """
+        :param accessor: the name of the reverse relation, or many to many
+                         field, on the object.
+        :param label: the short description for the changelist column.
+        :param field: the date or datetime field on the related model.
+        :param days: How far back should we generate a sparkline for.
+        :param renderer: the way in which to draw the sparkline; see
+                         :meth:`Sparkline.__init__`
+        """
+        super(RelationSparkline, self).__init__(label=label, field=field,
+                                                days=days, renderer=renderer)
+        self.accessor = accessor
+
+    def queryset(self, obj):
+        """
+        finds the related objects for the given object.
+
+        :param obj: the current object in the changelist loop.
+        :rtype: :class:`~django.db.models.query.QuerySet`
+        """
+        return getattr(obj, self.accessor).all()
+
+    def page_queryset(self, objs):
+        """
+        finds the related objects for all the given objects, if the
+        `accessor` is the reverse side of a foreign key.
+
+        :param objs: the objects on the current changelist page.
+        :rtype: tuple
+        """
+        descriptor = getattr(objs[0].__class__, self.accessor, None)
+        if not isinstance(descriptor, ForeignRelatedObjectsDescriptor):
+            return None
+        field = descriptor.related.field
+        manager = descriptor.related.model._default_manager
+        objs = manager.filter(**{
+            '%s__in' % field.name: [obj.pk for obj in objs],
+        })
+        return objs, field.name
+
+    @property
+    def cache_name(self):
+        return '_%s_%s_%s_%d_cache' % (self.__class__.__name__.lower(),
+                                       self.accessor, self.field, self.days)
+
+
+class CountingListFilter(SimpleListFilter):
+    """
+    A :class:`~django.contrib.admin.SimpleListFilter` which shows how many
+    objects each of its choices would find, taking into account any other
+    filters or searches currently applied to the changelist.
+
+    All the counts come from a single grouped query, built by
+    :meth:`counts`, rather than one ``COUNT`` per choice.
+
+    Subclasses should implement :meth:`lookups`, :meth:`queryset` and
+    :meth:`counts`, as usual.
+    """
+    def __init__(self, request, params, model, model_admin):
+        self.request = request
+        super(CountingListFilter, self).__init__(request, params, model,
+                                                 model_admin)
+
+    def counts(self, queryset):
+        """
+        Find how many objects in `queryset` match each lookup.
+
+        :param queryset: the changelist's objects, with every filter except
+                         this one applied.
+        :return: a mapping of lookup values to counts.
+        :rtype: dictionary
+        """
+        raise NotImplementedError
+
+    def unfiltered_queryset(self, cl):
+        """
+        Gets the changelist's objects, as they would be if this filter
+        weren't in use.
+
+        :param cl: the :class:`~django.contrib.admin.views.main.ChangeList`
+        :rtype: :class:`~django.db.models.query.QuerySet`
+        """
+        params = cl.params
+        filter_specs, has_filters = cl.filter_specs, cl.has_filters
+        cl.params = dict((k, v) for k, v in params.items()
+                         if k != self.parameter_name)
+        try:
+            queryset = cl.get_query_set(self.request).order_by()
+        finally:
+            cl.params = params
+            cl.filter_specs, cl.has_filters = filter_specs, has_filters
+        if queryset.query.distinct:
+            # counting values of a DISTINCT queryset would count the distinct
+            # values, rather than the rows.
+            queryset = queryset.__class__(model=queryset.model,
+                                          using=queryset.db).filter(
+                pk__in=queryset.values('pk'))
+        return queryset
+
+    def total(self, counts):
+        """
+        How many objects are there altogether, given the result of
+        :meth:`counts`? Assumes every object matches exactly one lookup.
+
+        :rtype: integer
+        """
+        return sum(counts.values())
+
+    def choices(self, cl):
+        counts = self.counts(self.unfiltered_queryset(cl))
+        yield {
+            'selected': self.value() is None,
+            'query_string': cl.get_query_string({}, [self.parameter_name]),
+            'display': list_filter_count % {
+                'title': force_unicode(list_filter_all),
+                'count': self.total(counts),
+            },
+        }
+        for lookup, title in self.lookup_choices:
+            yield {
+                'selected': self.value() == force_unicode(lookup),
+                'query_string': cl.get_query_string({
+                    self.parameter_name: lookup,
+                }, []),
+                'display': list_filter_count % {
+                    'title': force_unicode(title),
+                    'count': counts.get(force_unicode(lookup), 0),
+                },
+            }
+
+
+class PublishingListFilter(CountingListFilter):
+    """
+    A changelist filter for models using
+    :class:`~helpfulfields.models.Publishing`, whose queryset is a
+    :class:`~helpfulfields.querysets.PublishingQuerySet`::
+
+        class MyModelAdmin(ModelAdmin):
+            list_filter = [PublishingListFilter]
+
+    :test case: :class:`helpfulfields.tests.ListFilterTestCase`
+    """
+    title = quick_publish_label
+    parameter_name = 'published'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('1', publication_published),
+            ('0', publication_unpublished),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == '1':
+            return queryset.published()
+        if self.value() == '0':
+            return queryset.unpublished()
+        return queryset
+
+    def counts(self, queryset):
+        found = grouped_count(queryset, 'is_published')
+        return {
+            u'1': found.get(True, 0),
+            u'0': found.get(False, 0),
+        }
+
+
+class DatePublishingListFilter(CountingListFilter):
+    """
+    A changelist filter for models using
+    :class:`~helpfulfields.models.DatePublishing`, whose queryset is a
+    :class:`~helpfulfields.querysets.DatePublishingQuerySet`, showing
+    whether objects are scheduled, published or expired::
+
+        class MyModelAdmin(ModelAdmin):
+            list_filter = [DatePublishingListFilter]
+
+    :test case: :class:`helpfulfields.tests.ListFilterTestCase`
+    """
+    title = publication_filter_label
+    parameter_name = 'publication_state'
+
+    def lookups(self, request, model_admin):
+        return model_admin.model.PUBLICATION_STATES
+
+    def queryset(self, request, queryset):
+        scheduled, published, expired = [state[0] for state
+                                         in queryset.model.PUBLICATION_STATES]
+        if self.value() == scheduled:
+            return queryset.scheduled()
+        if self.value() == published:
+            return queryset.published()
+        if self.value() == expired:
+            return queryset.expired()
+        return queryset
+
+    def counts(self, queryset):
+        return grouped_count(queryset.annotate_publication_state(),
+                             'publication_state')
+
+
+class SoftDeleteListFilter(CountingListFilter):
+    """
+    A changelist filter for models using
+    :class:`~helpfulfields.models.SoftDelete`, whose queryset is a
+    :class:`~helpfulfields.querysets.SoftDeleteQuerySet`::
+
+        class MyModelAdmin(ModelAdmin):
+            list_filter = [SoftDeleteListFilter]
+
+    :test case: :class:`helpfulfields.tests.ListFilterTestCase`
+    """
+    title = soft_delete_label
+    parameter_name = 'soft_deleted'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('present', soft_delete_present),
+            ('restored', soft_delete_false),
+            ('deleted', soft_delete_true),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == 'present':
+            return queryset.all()
+        if self.value() == 'restored':
+            return queryset.restored()
+        if self.value() == 'deleted':
+            return queryset.deleted()
+        return queryset
+
+    def counts(self, queryset):
+        found = grouped_count(queryset, 'deleted')
+        restored_val = queryset.model.DELETED_CHOICES[1][0]
+        deleted_val = queryset.model.DELETED_CHOICES[2][0]
+        return {
+            u'present': found.get(None, 0) + found.get(restored_val, 0),
+            u'restored': found.get(restored_val, 0),
+            u'deleted': found.get(deleted_val, 0),
+        }
+
+    def total(self, counts):
+        return counts[u'present'] + counts[u'deleted']
+
+
+class ApproximateCount(int):
+    """
+    A number which displays itself as being an estimate, eg: *about 20000*,
+    but otherwise behaves exactly as the integer it is.
+    """
+    def __unicode__(self):
+        return force_unicode(approximate_count % {'count': int(self)})
+
+    def __str__(self):
+        return self.__unicode__().encode('utf-8')
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A :class:`~django.core.paginator.Paginator` which avoids ``COUNT(*)`` on
+    very large tables, by asking the database how many rows it thinks there
+    are instead, via :func:`~helpfulfields.utils.estimated_row_count`::
+
+        class MyModelAdmin(ModelAdmin):
+            paginator = EstimatedCountPaginator
+
+    The estimate is only used when the whole table is being paginated,
+    and the estimate is greater than :attr:`threshold`; filtered or small
+    sets of objects are counted exactly, as usual. When the estimate is used,
+    :attr:`approximate` is set, and the count will be an
+    :class:`ApproximateCount`.
+
+    .. note::
+        For `SQLite`, estimates only exist once ``ANALYZE`` has been run.
+
+    :test case: :class:`helpfulfields.tests.EstimatedCountTestCase`
+    """
+    #: the number of rows above which the estimate is trusted; defaults to
+    #: :data:`~helpfulfields.settings.ESTIMATED_COUNT_THRESHOLD`
+    threshold = ESTIMATED_COUNT_THRESHOLD
+
+    def __init__(self, *args, **kwargs):
+        super(EstimatedCountPaginator, self).__init__(*args, **kwargs)
+        #: whether or not the count is an estimate.
+        self.approximate = False
+
+    def estimate_count(self):
+        """
+        Finds the database's estimate of the number of objects being
+        paginated, if they may be estimated at all. Override this to
+        estimate counts in some other way.
+
+        :return: the estimate, or :data:`None`
+        :rtype: integer
+        """
+        if not hasattr(self.object_list, 'query'):
+            return None
+        if not is_unfiltered(self.object_list):
+            return None
+        return estimated_row_count(self.object_list)
+
+    def _get_count(self):
+        if self._count is None:
+            estimate = self.estimate_count()
+            if estimate is not None and estimate > self.threshold:
+                self._count = ApproximateCount(estimate)
+                self.approximate = True
+        return super(EstimatedCountPaginator, self)._get_count()
+    count = property(_get_count)
+
+
+class EstimatedCountChangeListMixin(object):
+    """
+    A mixin for :class:`~django.contrib.admin.views.main.ChangeList` which
+    uses the model admin's paginator to count the unfiltered total, rather
+    than always running an exact ``COUNT(*)`` when filters are applied, so
+    that an :class:`EstimatedCountPaginator` may estimate it.
+    """
+    def get_results(self, request):
+        paginator = self.model_admin.get_paginator(request, self.query_set,
+                                                   self.list_per_page)
+        result_count = paginator.count
+        if not self.query_set.query.where:
+            full_result_count = result_count
+        else:
+            full_result_count = self.model_admin.get_paginator(
+                request, self.root_query_set, self.list_per_page).count
+
+        can_show_all = result_count <= self.list_max_show_all
+        multi_page = result_count > self.list_per_page
+        if (self.show_all and can_show_all) or not multi_page:
+            result_list = self.query_set._clone()
+        else:
+            try:
+                result_list = paginator.page(self.page_num+1).object_list
+            except InvalidPage:
+                raise IncorrectLookupParameters
+
+        self.result_count = result_count
+        self.full_result_count = full_result_count
+        self.result_list = result_list
+        self.can_show_all = can_show_all
+        self.multi_page = multi_page
+        self.paginator = paginator
+
+
+class EstimatedCountAdminMixin(object):
+    """
+    A mixin for :class:`~django.contrib.admin.ModelAdmin` which puts
+    :class:`EstimatedCountPaginator` and :class:`EstimatedCountChangeListMixin`
+    to use::
+
+        class MyModelAdmin(EstimatedCountAdminMixin, ModelAdmin):
+            pass
+
+    :test case: :class:`helpfulfields.tests.EstimatedCountTestCase`
+    """
+    paginator = EstimatedCountPaginator
+
+    def get_changelist(self, request, **kwargs):
+        changelist = super(EstimatedCountAdminMixin, self).get_changelist(
+            request, **kwargs)
+        return type('Estimated%s' % changelist.__name__,
+                    (EstimatedCountChangeListMixin, changelist), {})
+
+
+def bulk_change(modeladmin, request, queryset, action, **changes):
+    """
+    Applies `changes` to every object in `queryset` with one ``UPDATE`` per
+    batch of objects, and
+    records the change against each of them in the admin's history with a
+    :meth:`~django.db.models.query.QuerySet.bulk_create` of
+    :class:`~django.contrib.admin.models.LogEntry` objects per batch, rather
+    than saving and calling
+    :meth:`~django.contrib.admin.ModelAdmin.log_change` for each.
+
+    Used to implement the bulk actions below; the objects themselves are
+    only fetched so that their history can be written, and exactly those
+    objects are changed, all in one transaction. They are iterated over
+    rather than held in memory, and if the
+    :class:`~django.contrib.admin.ModelAdmin` has an ``object_repr_fields``
+    attribute naming the fields its model's ``__unicode__`` needs, only
+    those (and the primary key) are selected. Batches are of
+    :data:`~helpfulfields.settings.BULK_CHANGE_BATCH_SIZE` objects, unless
+    it has a ``bulk_change_batch_size``::
+
+        class MyModelAdmin(ModelAdmin):
+            actions = [publish_selected, unpublish_selected]
+            object_repr_fields = ('title',)
+            bulk_change_batch_size = 1000
+
+    :param modeladmin: the :class:`~django.contrib.admin.ModelAdmin` the
+                       action is being run from.
+    :param request: the current request.
+    :param queryset: the objects to change.
+    :param action: text describing the change, for the history and messages.
+    :param changes: the field values to set.
+    :return: the number of objects changed.
+    :rtype: integer
+    """
+    from django.contrib.admin.models import LogEntry, CHANGE
+    from django.contrib.contenttypes.models import ContentType
+    if not modeladmin.has_change_permission(request):
+        raise PermissionDenied
+    model = queryset.model
+    repr_fields = getattr(modeladmin, 'object_repr_fields', None)
+    batch_size = getattr(modeladmin, 'bulk_change_batch_size',
+                         BULK_CHANGE_BATCH_SIZE)
+    if repr_fields is not None:
+        queryset = queryset.only(model._meta.pk.name, *repr_fields)
+    message = force_unicode(bulk_action_log % {'action': action})
+    using = queryset.db
+    count = 0
+    # keep ChangeTracking models' modified date truthful, as purgeable() and
+    # the row cache rely on it.
+    changes = stamp_modified(model, changes)
+
+    def change(objs):
+        model._base_manager.using(using).filter(
+            pk__in=[obj.pk for obj in objs]).update(**changes)
+        content_type = ContentType.objects.get_for_model(model)
+        LogEntry.objects.bulk_create([
+            LogEntry(user_id=request.user.pk, content_type_id=content_type.pk,
+                     object_id=force_unicode(obj.pk),
+                     object_repr=force_unicode(obj)[:200],
+                     action_flag=CHANGE, change_message=message)
+            for obj in objs
+        ])
+
+    with transaction.commit_on_success(using=using):
+        batch = []
+        for obj in queryset.iterator():
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                change(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            change(batch)
+            count += len(batch)
+    if count:
+        # update() sends no signals to do this.
+        invalidate_published_pks(model, using=using)
+    modeladmin.message_user(request, bulk_action_done % {
+        'action': action,
+        'count': count,
+        'verbose_name_plural': model._meta.verbose_name_plural,
+    })
+    return count
+
+
+def publish_selected(modeladmin, request, queryset):
+    """
+    An admin action for publishing objects using either
+    :class:`~helpfulfields.models.Publishing` or
+    :class:`~helpfulfields.models.DatePublishing`, whose queryset provides
+    the matching `unpublished` method::
+
+        class MyModelAdmin(ModelAdmin):
+            actions = [publish_selected, unpublish_selected]
+
+    Objects which are already published are left alone.
+
+    :test case: :class:`helpfulfields.tests.BulkActionsTestCase`
+    """
+    queryset = queryset.unpublished()
+    if hasattr(queryset.model, 'PUBLICATION_STATES'):
+        # the same as setting DatePublishing.is_published to True
+        now = datetime.now() - timedelta(seconds=1)
+        changes = {'publish_on': now, 'unpublish_on': None}
+        if has_live_column(queryset.model):
+            changes['is_live'] = True
+    else:
+        changes = {'is_published': True}
+    bulk_change(modeladmin, request, queryset, published_action, **changes)
+
+
+publish_selected.short_description = publish_action_label
+
+
+def unpublish_selected(modeladmin, request, queryset):
+    """
+    An admin action for unpublishing objects using either
+    :class:`~helpfulfields.models.Publishing` or
+    :class:`~helpfulfields.models.DatePublishing`, whose queryset provides
+    the matching `published` method. Objects which aren't currently published
+    are left alone.
+
+    :test case: :class:`helpfulfields.tests.BulkActionsTestCase`
+    """
+    queryset = queryset.published()
+    if hasattr(queryset.model, 'PUBLICATION_STATES'):
+        # the same as DatePublishing.unpublish()
+        changes = {'unpublish_on': datetime.now() - timedelta(seconds=1)}
+        if has_live_column(queryset.model):
+            changes['is_live'] = False
+    else:
+        changes = {'is_published': False}
+    bulk_change(modeladmin, request, queryset, unpublished_action, **changes)
+
+
+unpublish_selected.short_description = unpublish_action_label
+
+
+def soft_delete_selected(modeladmin, request, queryset):
+    """
+    An admin action for marking objects using
+    :class:`~helpfulfields.models.SoftDelete` as deleted, without cascading.
+    Objects which are already deleted are left alone.
+
+    :test case: :class:`helpfulfields.tests.BulkActionsTestCase`
+    """
+    deleted_val = queryset.model.DELETED_CHOICES[2][0]
+    queryset = queryset.exclude(deleted=deleted_val)
+    bulk_change(modeladmin, request, queryset, soft_deleted_action,
+                deleted=deleted_val)
+
+
+soft_delete_selected.short_description = soft_delete_action_label
+
+
+def restore_selected(modeladmin, request, queryset):
+    """
+    An admin action for restoring objects using
+    :class:`~helpfulfields.models.SoftDelete` which have been marked as
+    deleted, via their queryset's `deleted` method.
+
+    :test case: :class:`helpfulfields.tests.BulkActionsTestCase`
+    """
+    restored_val = queryset.model.DELETED_CHOICES[1][0]
+    bulk_change(modeladmin, request, queryset.deleted(), restored_action,
+                deleted=restored_val)
+
+
+restore_selected.short_description = restore_action_label
+
+
+class PreparedColumnsChangeListMixin(object):
+    """
+    A mixin for :class:`~django.contrib.admin.views.main.ChangeList` which,
+    once the page of objects to display is known, gives every object in the
+    :attr:`~django.contrib.admin.ModelAdmin.list_display` which has a
+    ``prepare`` method (eg: :meth:`RelationCount.prepare`) the chance to
+    fetch what it needs for the whole page at once, rather than per row.
+    """
+    def get_results(self, request):
+        super(PreparedColumnsChangeListMixin, self).get_results(request)
+        columns = [column for column in self.list_display
+                   if hasattr(column, 'prepare')]
+        if columns:
+            # evaluating the queryset here caches the results on it, so the
+            # template doesn't fetch them again.
+            objs = list(self.result_list)
+            for column in columns:
+                column.prepare(objs)
+
+
+class PreparedColumnsAdminMixin(object):
+    """
+    A mixin for :class:`~django.contrib.admin.ModelAdmin` which puts
+    :class:`PreparedColumnsChangeListMixin` to use::
+
+        class MyModelAdmin(PreparedColumnsAdminMixin, ModelAdmin):
+            list_display = ['pk', RelationCount('items', 'items', cap=10000)]
+
+    :test case: :class:`helpfulfields.tests.RelationCountTestCase`
+    """
+    def get_changelist(self, request, **kwargs):
+        changelist = super(PreparedColumnsAdminMixin, self).get_changelist(
+            request, **kwargs)
+        return type('Prepared%s' % changelist.__name__,
+                    (PreparedColumnsChangeListMixin, changelist), {})
+
+
+class DeferredColumn(object):
+    """
+    Wraps another :attr:`~django.contrib.admin.ModelAdmin.list_display`
+    column (such as a :class:`RelationList` or :class:`LogEntrySparkline`)
+    so that the changelist only renders a placeholder for it. Once the page
+    has loaded, every deferred cell on it is fetched in one request to
+    :class:`DeferredColumnsAdminMixin`, so the cost of the column no longer
+    delays the changelist itself::
+
+        class MyModelAdmin(DeferredColumnsAdminMixin, ModelAdmin):
+            list_display = ['pk',
+                            DeferredColumn(LogEntrySparkline(), 'history')]
+
+    :test case: :class:`helpfulfields.tests.DeferredColumnsTestCase`
+    """
+    def __init__(self, column, name):
+        """
+        :param column: the callable to defer.
+        :param name: a name for the column, unique within the
+                     :attr:`~django.contrib.admin.ModelAdmin.list_display`,
+                     by which its cells are requested.
+        """
+        self.column = column
+        self.name = name
+        self.short_description = getattr(column, 'short_description', name)
+        self.__name__ = getattr(column, '__name__', name)
+        if hasattr(column, 'admin_order_field'):
+            self.admin_order_field = column.admin_order_field
+        self.allow_tags = True
+
+    def __call__(self, obj):
+        """
+        :param obj: the current object in the changelist loop.
+        :return: the placeholder to be replaced once loaded.
+        :rtype: unicode string.
+        """
+        return (u'<span class="changelist-deferred" data-column="%(name)s" '
+                u'data-pk="%(pk)s">%(text)s</span>' % {
+                    'name': escape(self.name),
+                    'pk': escape(obj.pk),
+                    'text': deferred_loading,
+                })
+
+    def render(self, obj):
+        """
+        renders the wrapped column for real, escaping it unless it
+        declares ``allow_tags``
+
+        :param obj: the object to render the cell for.
+        :rtype: unicode string.
+        """
+        value = force_unicode(self.column(obj))
+        if not getattr(self.column, 'allow_tags', False):
+            value = escape(value)
+        return value
+
+
+class DeferredColumnsAdminMixin(object):
+    """
+    A mixin for :class:`~django.contrib.admin.ModelAdmin` which provides the
+    endpoint and script needed by any :class:`DeferredColumn` in its
+    :attr:`~django.contrib.admin.ModelAdmin.list_display`.
+
+    The endpoint lives at ``deferred-columns/`` beneath the changelist, and
+    takes the primary keys of the visible rows as repeated ``pk``
+    parameters. It answers with a JSON object mapping each primary key to
+    the rendered cells for each deferred column, by name. Columns which
+    have a ``prepare`` method (see :class:`PreparedColumnsChangeListMixin`)
+    are given all of the requested objects at once.
+
+    :test case: :class:`helpfulfields.tests.DeferredColumnsTestCase`
+    """
+    @property
+    def media(self):
+        media = super(DeferredColumnsAdminMixin, self).media
+        return media + Media(js=['helpfulfields/deferred_columns.js'])
+
+    def get_urls(self):
+        from django.conf.urls import patterns, url
+        info = self.model._meta.app_label, self.model._meta.module_name
+        urls = patterns(
+            '',
+            url(r'^deferred-columns/$',
+                self.admin_site.admin_view(self.deferred_columns_view),
+                name='%s_%s_deferred_columns' % info),
+        )
+        return urls + super(DeferredColumnsAdminMixin, self).get_urls()
+
+    def get_deferred_columns(self, request):
+        """
+        :return: the :class:`DeferredColumn` instances in use.
+        :rtype: list
+        """
+        return [column for column in self.get_list_display(request)
+                if isinstance(column, DeferredColumn)]
+
+    def deferred_columns_view(self, request):
+        """
+        renders the deferred cells for the requested primary keys, up to
+        :attr:`~django.contrib.admin.ModelAdmin.list_max_show_all` of them.
+
+        :return: the cells, as JSON.
+        :rtype: :class:`~django.http.HttpResponse`
+        """
+        if not self.has_change_permission(request, None):
+            raise PermissionDenied
+        pks = request.GET.getlist('pk')[:self.list_max_show_all]
+        columns = self.get_deferred_columns(request)
+        cells = {}
+        if pks and columns:
+            try:
+                objs = list(self.queryset(request).filter(pk__in=pks))
+            except (ValueError, TypeError):
+                objs = []
+            for column in columns:
+                if hasattr(column.column, 'prepare'):
+                    column.column.prepare(objs)
+            for obj in objs:
+                cells[force_unicode(obj.pk)] = dict(
+                    (column.name, column.render(obj)) for column in columns)
+        return HttpResponse(json.dumps(cells),
+                            content_type='application/json')
+
+
+class CachedColumn(object):
+    """
+    Stands in for a :attr:`~django.contrib.admin.ModelAdmin.list_display`
+    column whose cells have already been found by
+    :class:`CachedColumnsChangeListMixin`, so that the column itself isn't
+    called at all for rows which were cached.
+    """
+    def __init__(self, column, index):
+        """
+        :param column: the column being stood in for.
+        :param index: the position of its cell in each object's
+                      :data:`~helpfulfields.rowcache.ROW_CACHE_ATTR`
+        """
+        self.column = column
+        self.index = index
+        for attr in ('short_description', '__name__', 'allow_tags',
+                     'admin_order_field'):
+            if hasattr(column, attr):
+                setattr(self, attr, getattr(column, attr))
+
+    def __call__(self, obj):
+        cells = getattr(obj, ROW_CACHE_ATTR, None)
+        if cells is None:
+            return self.column(obj)
+        return cells[self.index]
+
+
+class CachedColumnsChangeListMixin(object):
+    """
+    A mixin for :class:`~django.contrib.admin.views.main.ChangeList` which
+    caches the rendered output of the `helpfulfields` columns in its
+    :attr:`~django.contrib.admin.ModelAdmin.list_display`, per row, for
+    models using :class:`~helpfulfields.models.ChangeTracking`. See
+    :func:`~helpfulfields.rowcache.cached_rows` for how rows are looked up.
+
+    Columns with a ``prepare`` method are only prepared for the rows which
+    weren't cached, so this should be used instead of
+    :class:`PreparedColumnsChangeListMixin`, rather than alongside it.
+    """
+    #: the types of column whose output is cached.
+    cached_column_types = (ViewOnSite, RelationCount, RelationList, Sparkline)
+
+    def get_results(self, request):
+        super(CachedColumnsChangeListMixin, self).get_results(request)
+        field_names = [f.name for f in self.model._meta.fields]
+        if 'modified' not in field_names:
+            return None
+        positions = [i for i, column in enumerate(self.list_display)
+                     if isinstance(column, self.cached_column_types)]
+        if positions:
+            columns = [self.list_display[i] for i in positions]
+            cached_rows(list(self.result_list), columns,
+                        timeout=self.model_admin.row_cache_timeout)
+            list_display = list(self.list_display)
+            for index, position in enumerate(positions):
+                list_display[position] = CachedColumn(columns[index], index)
+            self.list_display = list_display
+
+
+class CachedColumnsAdminMixin(object):
+    """
+    A mixin for :class:`~django.contrib.admin.ModelAdmin` which puts
+    :class:`CachedColumnsChangeListMixin` to use. A cached row is redrawn
+    once the object's
+    :attr:`~helpfulfields.models.ChangeTracking.modified` date changes, or
+    when any of the :attr:`row_cache_invalidators` say so::
+
+        class CategoryAdmin(CachedColumnsAdminMixin, ModelAdmin):
+            list_display = ['pk', RelationCount('items', 'items'),
+                            LogEntrySparkline()]
+            row_cache_invalidators = (
+                (post_save, Item, 'category'),
+                (post_delete, Item, 'category'),
+                (post_save, LogEntry, logentry_object_pks),
+            )
+
+    :test case: :class:`helpfulfields.tests.CachedColumnsTestCase`
+    """
+    #: tuples of a signal, the sender to listen for, and either the name of
+    #: the sender's foreign key to this model, or a callable returning the
+    #: primary keys to invalidate; see
+    #: :class:`~helpfulfields.rowcache.RowCacheInvalidator`
+    row_cache_invalidators = ()
+
+    #: how long to cache each row for, in seconds.
+    row_cache_timeout = ROW_CACHE_TIMEOUT
+
+    def __init__(self, *args, **kwargs):
+        super(CachedColumnsAdminMixin, self).__init__(*args, **kwargs)
+        for signal, sender, parents in self.row_cache_invalidators:
+            invalidate_rows_on(signal, sender, self.model, parents)
+
+    def get_changelist(self, request, **kwargs):
+        changelist = super(CachedColumnsAdminMixin, self).get_changelist(
+            request, **kwargs)
+        return type('Cached%s' % changelist.__name__,
+                    (CachedColumnsChangeListMixin, changelist), {})
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser
+from django.db.models.fields import FieldDoesNotExist
+from django.db.models.fields.related import ForeignRelatedObjectsDescriptor
+from django.utils.encoding import force_unicode
+from helpfulfields.admin import (RelationCount, RelationList, Sparkline,
+                                 RelationSparkline, DeferredColumn,
+                                 PreparedColumnsChangeListMixin,
+                                 CachedColumnsChangeListMixin)
+from helpfulfields.text import (check_per_row_queries, check_per_row_hint,
+                                check_per_row_unpreparable_hint,
+                                check_unindexed_accessor,
+                                check_unindexed_accessor_hint,
+                                check_unbounded_relation_list,
+                                check_unbounded_relation_list_hint)
+
+#: the id of warnings about columns which query the database once per row.
+PER_ROW_QUERIES = 'helpfulfields.W001'
+
+#: the id of warnings about columns following an unindexed relation.
+UNINDEXED_ACCESSOR = 'helpfulfields.W002'
+
+#: the id of warnings about :class:`~helpfulfields.admin.RelationList`
+#: columns showing every related object.
+UNBOUNDED_RELATION_LIST = 'helpfulfields.W003'
+
+#: the changelist mixins which call ``prepare`` on columns for a whole page.
+PREPARING_CHANGELISTS = (PreparedColumnsChangeListMixin,
+                         CachedColumnsChangeListMixin)
+
+#: the types of column which go to the database for every row unless
+#: prepared beforehand.
+PER_ROW_COLUMNS = (RelationCount, RelationList, Sparkline)
+
+
+class AdminWarning(object):
+    """
+    A problem found with a :class:`~django.contrib.admin.ModelAdmin`,
+    shaped like the warnings of newer versions of `Django`_, so that
+    they may be printed, or compared by :attr:`id` in tests.
+    """
+    def __init__(self, id, msg, hint, obj):
+        """
+        :param id: one of :data:`PER_ROW_QUERIES`, :data:`UNINDEXED_ACCESSOR`
+                   or :data:`UNBOUNDED_RELATION_LIST`
+        :param msg: what is wrong.
+        :param hint: how it might be fixed.
+        :param obj: the :class:`~django.contrib.admin.ModelAdmin` at fault.
+        """
+        self.id = id
+        self.msg = msg
+        self.hint = hint
+        self.obj = obj
+
+    def __unicode__(self):
+        return u'%s.%s: (%s) %s\n\tHINT: %s' % (
+            self.obj.model._meta.app_label, self.obj.__class__.__name__,
+            self.id, self.msg, self.hint)
+
+    def __repr__(self):
+        return '<%s: id=%r, obj=%r>' % (self.__class__.__name__, self.id,
+                                        self.obj)
+
+
+def relation_index_field(model, accessor):
+    """
+    Finds the field whose index is used to fetch the objects related via
+    `accessor`: the foreign key on the other side of a reverse relation, the
+    foreign key in the ``through`` model of a many to many relation, or the
+    object id of a generic relation.
+
+    :param model: the model the accessor is on.
+    :param accessor: the name of the relation.
+    :return: the field, or :data:`None` if the relation is a foreign key on
+             `model` itself, which uses the primary key of the other side,
+             or isn't a model field at all.
+    :rtype: :class:`~django.db.models.Field` or :data:`None`
+    """
+    try:
+        field, owner, direct, m2m = model._meta.get_field_by_name(accessor)
+    except FieldDoesNotExist:
+        return None
+    if direct and not m2m:
+        return None
+    if direct:
+        object_id = getattr(field, 'object_id_field_name', None)
+        if object_id is not None:
+            return field.rel.to._meta.get_field(object_id)
+        return field.rel.through._meta.get_field(field.m2m_field_name())
+    if m2m:
+        through = field.field.rel.through
+        return through._meta.get_field(field.field.m2m_reverse_field_name())
+    return field.field
+
+
+def is_indexed(field):
+    """
+    :return: whether the database will have an index for the field.
+    :rtype: boolean
+    """
+    return field.db_index or field.unique or field.primary_key
+
+
+def runs_per_row(model, column):
+    """
+    Whether a column will still query the database once per row after
+    being prepared for the whole page.
+
+    :rtype: boolean
+    """
+    if isinstance(column, RelationSparkline):
+        descriptor = getattr(model, column.accessor, None)
+        return not isinstance(descriptor, ForeignRelatedObjectsDescriptor)
+    if isinstance(column, Sparkline):
+        return (column.page_queryset.im_func is
+                Sparkline.page_queryset.im_func)
+    return False
+
+
+def is_prefetched(queryset, accessor):
+    """
+    :return: whether the queryset prefetches the accessor.
+    :rtype: boolean
+    """
+    for lookup in getattr(queryset, '_prefetch_related_lookups', ()):
+        if lookup == accessor or lookup.startswith('%s__' % accessor):
+            return True
+    return False
+
+
+def check_model_admin(model_admin):
+    """
+    Looks for the `helpfulfields` columns in a
+    :class:`~django.contrib.admin.ModelAdmin` which will be slow on large
+    changelists:
+
+    * :data:`PER_ROW_QUERIES` when a
+      :class:`~helpfulfields.admin.RelationCount`,
+      :class:`~helpfulfields.admin.RelationList` or sparkline isn't prepared
+      for the whole page by
+      :class:`~helpfulfields.admin.PreparedColumnsAdminMixin`,
+      :class:`~helpfulfields.admin.CachedColumnsAdminMixin` or a
+      :class:`~helpfulfields.admin.DeferredColumn`, nor (for a
+      :class:`~helpfulfields.admin.RelationList`) prefetched by the
+      :meth:`~django.contrib.admin.ModelAdmin.queryset`, or when it
+      can't be prepared at all.
+    * :data:`UNINDEXED_ACCESSOR` when the relation a column follows has no
+      index on the other side, so every lookup reads the related table.
+    * :data:`UNBOUNDED_RELATION_LIST` when a
+      :class:`~helpfulfields.admin.RelationList` has no ``max_num``, and so
+      loads and draws every related object, for every row.
+
+    :param model_admin: a registered :class:`~django.contrib.admin.ModelAdmin`
+    :return: the problems found.
+    :rtype: list of :class:`AdminWarning`
+    """
+    from django.test.client import RequestFactory
+    request = RequestFactory().get('/')
+    request.user = AnonymousUser()
+    model = model_admin.model
+    changelist = model_admin.get_changelist(request)
+    prepared = issubclass(changelist, PREPARING_CHANGELISTS)
+    queryset = model_admin.queryset(request)
+    warnings = []
+    for column in model_admin.get_list_display(request):
+        deferred = isinstance(column, DeferredColumn)
+        if deferred:
+            column = column.column
+        if not isinstance(column, PER_ROW_COLUMNS):
+            continue
+        parts = {
+            'column': force_unicode(column.short_description),
+            'accessor': getattr(column, 'accessor', u''),
+        }
+        if runs_per_row(model, column):
+            warnings.append(AdminWarning(
+                PER_ROW_QUERIES, check_per_row_queries % parts,
+                check_per_row_unpreparable_hint % parts, model_admin))
+        elif not (prepared or deferred or (isinstance(column, RelationList)
+                  and is_prefetched(queryset, column.accessor))):
+            warnings.append(AdminWarning(
+                PER_ROW_QUERIES, check_per_row_queries % parts,
+                check_per_row_hint % parts, model_admin))
+        index_field = None
+        if parts['accessor']:
+            index_field = relation_index_field(model, column.accessor)
+        if index_field is not None and not is_indexed(index_field):
+            parts.update(field=index_field.name,
+                         model=index_field.model._meta.object_name)
+            warnings.append(AdminWarning(
+                UNINDEXED_ACCESSOR, check_unindexed_accessor % parts,
+                check_unindexed_accessor_hint % parts, model_admin))
+        if isinstance(column, RelationList) and column.max_num is None:
+            warnings.append(AdminWarning(
+                UNBOUNDED_RELATION_LIST, check_unbounded_relation_list % parts,
+                check_unbounded_relation_list_hint % parts, model_admin))
+    return warnings
+
+
+def check_admin_site(site=None):
+    """
+    Runs :func:`check_model_admin` for every
+    :class:`~django.contrib.admin.ModelAdmin` registered with an admin site.
+
+    :param site: the :class:`~django.contrib.admin.AdminSite`, by default
+                 ``django.contrib.admin.site``
+    :return: the problems found.
+    :rtype: list of :class:`AdminWarning`
+    :test case: :class:`helpfulfields.tests.AdminChecksTestCase`
+    """
+    site = site or admin.site
+    model_admins = sorted(site._registry.values(),
+                          key=lambda obj: obj.model._meta.db_table)
+    warnings = []
+    for model_admin in model_admins:
+        warnings.extend(check_model_admin(model_admin))
+    return warnings
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+from operator import or_
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.deletion import Collector, CASCADE, ProtectedError
+from django.utils.datastructures import SortedDict
+from helpfulfields.settings import (SOFT_DELETE_CASCADE_POLICY,
+                                    PURGE_BATCH_SIZE)
+from helpfulfields.text import soft_delete_protected, soft_delete_bad_policy
+from helpfulfields.utils import stamp_modified
+
+#: leave dependants which can't be soft deleted alone, as
+#: :meth:`~helpfulfields.models.SoftDelete.delete` always has.
+IGNORE = 'ignore'
+
+#: refuse to soft delete anything which has dependants that can't themselves
+#: be soft deleted, by raising :exc:`~django.db.models.ProtectedError`
+PROTECT = 'protect'
+
+#: really delete any dependants which can't be soft deleted.
+DELETE = 'delete'
+
+POLICIES = (IGNORE, PROTECT, DELETE)
+
+
+def can_soft_delete(model):
+    """
+    Whether or not the given model is using
+    :class:`~helpfulfields.models.SoftDelete`
+
+    :rtype: boolean
+    """
+    return hasattr(model, 'DELETED_CHOICES')
+
+
+class SoftDeleteCollector(Collector):
+    """
+    Finds everything which would be removed by deleting some objects, by
+    walking the same ``on_delete=CASCADE`` relations `Django`_'s own
+    :class:`~django.db.models.deletion.Collector` does.
+
+    Unlike the standard collector, dependants are kept as unevaluated
+    querysets rather than being loaded into memory, so that soft deleting
+    an object with thousands of dependants takes a single ``UPDATE`` per
+    affected model, rather than one per object::
+
+        collector = SoftDeleteCollector(using='default', policy=PROTECT)
+        collector.collect_queryset(Category.objects.filter(pk=1))
+        collector.soft_delete()
+
+    Models which don't use :class:`~helpfulfields.models.SoftDelete` are
+    handled according to `policy`, one of :data:`IGNORE`, :data:`PROTECT`
+    or :data:`DELETE`.
+
+    :test case: :class:`helpfulfields.tests.SoftDeleteCascadeTestCase`
+    """
+    def __init__(self, using, policy=SOFT_DELETE_CASCADE_POLICY):
+        """
+        :param using: the db router to use.
+        :param policy: what to do about dependants which can't be soft deleted.
+        """
+        assert policy in POLICIES, soft_delete_bad_policy % {
+            'policy': policy,
+            'choices': ', '.join(POLICIES),
+        }
+        super(SoftDeleteCollector, self).__init__(using=using)
+        self.policy = policy
+        #: a mapping of models to the querysets of objects to soft delete.
+        self.soft_deletes = SortedDict()
+        #: querysets of objects to really delete, under the :data:`DELETE`
+        #: policy.
+        self.hard_deletes = []
+        # primary keys we've had to evaluate to get out of a cyclic relation.
+        self._seen_pks = {}
+
+    def collect_queryset(self, queryset, path=()):
+        """
+        Adds the objects in `queryset`, and everything depending on them,
+        to the things to be soft deleted.
+
+        Relations which loop back on to a model already being collected (eg:
+        a tree of categories) can't be followed lazily forever, so each
+        level is evaluated to primary keys until no new objects are found.
+
+        :param queryset: the objects to soft delete.
+        :param path: the models collected on the way to this one.
+        :rtype: None
+        """
+        model = queryset.model
+        self.soft_deletes.setdefault(model, []).append(queryset)
+        path = path + (model,)
+        opts = model._meta
+        for related in opts.get_all_related_objects(include_hidden=True):
+            if related.field.rel.on_delete is not CASCADE:
+                continue
+            sub_objs = self.related_objects(related, queryset)
+            if not can_soft_delete(related.model):
+                self.handle_unsupported(related, sub_objs)
+            elif related.model in path:
+                seen = self._seen_pks.setdefault(related.model, set())
+                pks = set(sub_objs.values_list('pk', flat=True)) - seen
+                if pks:
+                    seen.update(pks)
+                    manager = related.model._base_manager.using(self.using)
+                    self.collect_queryset(manager.filter(pk__in=pks), path)
+            else:
+                self.collect_queryset(sub_objs, path)
+
+    def handle_unsupported(self, related, sub_objs):
+        """
+        Applies the `policy` to dependants which can't be soft deleted.
+
+        :param related: the :class:`~django.db.models.related.RelatedObject`
+                        the dependants were found through.
+        :param sub_objs: the dependant objects.
+        :rtype: None
+        """
+        if self.policy == PROTECT:
+            protected = list(sub_objs[:1])
+            if protected:
+                raise ProtectedError(soft_delete_protected % {
+                    'model': related.model._meta.object_name,
+                    'field': related.field.name,
+                }, protected)
+        elif self.policy == DELETE:
+            self.hard_deletes.append(sub_objs)
+
+    def soft_delete(self, now=None):
+        """
+        Marks everything collected as deleted, using one ``UPDATE`` statement
+        per model, and really deletes anything the :data:`DELETE` policy
+        found, all inside a single transaction.
+
+        :param now: the :class:`~datetime.datetime` to set as the
+                    ``modified`` date of models using
+                    :class:`~helpfulfields.models.ChangeTracking`; defaults
+                    to :meth:`datetime.datetime.now()`
+        :return: the number of rows marked as deleted, per model.
+        :rtype: :class:`~django.utils.datastructures.SortedDict`
+        """
+        counts = SortedDict()
+        if now is None:
+            now = datetime.now()
+        with transaction.commit_on_success(using=self.using):
+            for queryset in self.hard_deletes:
+                queryset.delete()
+            for model, querysets in self.soft_deletes.items():
+                if len(querysets) == 1:
+                    objs = querysets[0]
+                else:
+                    objs = model._base_manager.using(self.using).filter(
+                        reduce(or_, [Q(pk__in=qs.values('pk'))
+                                     for qs in querysets]))
+                # keep ChangeTracking models' modified date truthful, as
+                # purgeable() relies on it.
+                changes = stamp_modified(
+                    model, {'deleted': model.DELETED_CHOICES[2][0]}, now=now)
+                counts[model] = objs.update(**changes)
+        return counts
+
+
+def purgeable(model, days=0, using=None):
+    """
+    Finds the objects which have been soft deleted for at least `days`.
+    How long something has been deleted for is only known if the model also
+    uses :class:`~helpfulfields.models.ChangeTracking`, as marking it deleted
+    will have changed the
+    :attr:`~helpfulfields.models.ChangeTracking.modified` date.
+
+    :param model: a model using :class:`~helpfulfields.models.SoftDelete`
+    :param days: the minimum number of days since deletion.
+    :param using: the db router to use.
+    :return: the deleted objects.
+    :rtype: :class:`~django.db.models.query.QuerySet`
+    """
+    objs = model._base_manager.using(using).filter(
+        deleted=model.DELETED_CHOICES[2][0])
+    if days:
+        cutoff = datetime.now() - timedelta(days=days)
+        objs = objs.filter(modified__lte=cutoff)
+    return objs
+
+
+def collect_for_purge(objs, using):
+    """
+    Finds everything `Django`_ would really delete along with `objs`, and
+    which of those (besides `objs` themselves) are dependants using
+    :class:`~helpfulfields.models.SoftDelete` that haven't themselves been
+    soft deleted, and so shouldn't be purged.
+
+    :param objs: the objects to purge.
+    :param using: the db router to use.
+    :return: the :class:`~django.db.models.deletion.Collector`, ready to
+             delete everything, and the live dependants it found.
+    :rtype: tuple of :class:`~django.db.models.deletion.Collector` and list
+    """
+    collector = Collector(using=using)
+    collector.collect(objs)
+    purging = set((obj.__class__, obj.pk) for obj in objs)
+    live = []
+    for model, instances in collector.data.items():
+        if can_soft_delete(model):
+            deleted = model.DELETED_CHOICES[2][0]
+            live.extend([obj for obj in instances if obj.deleted != deleted
+                         and (model, obj.pk) not in purging])
+    # newer versions of Django delete some dependants without loading them.
+    for queryset in getattr(collector, 'fast_deletes', ()):
+        if can_soft_delete(queryset.model):
+            deleted = queryset.model.DELETED_CHOICES[2][0]
+            live.extend(queryset.exclude(deleted=deleted))
+    return collector, live
+
+
+def purge_in_batches(queryset, batch_size=PURGE_BATCH_SIZE, archive=None,
+                     start_after=None):
+    """
+    Permanently deletes everything in `queryset`, a batch at a time, with
+    one short transaction per batch so that locks aren't held for long.
+
+    Batches are taken in primary key order, so an interrupted purge may be
+    continued by passing the last primary key it reported as `start_after`;
+    re-running from scratch works too, as purged rows are no longer found.
+
+    Each batch is filtered by `queryset` again inside its transaction, so
+    anything restored since the batch was chosen is left alone. Objects
+    whose ``on_delete=CASCADE`` dependants include any using
+    :class:`~helpfulfields.models.SoftDelete` which aren't deleted (as
+    :meth:`~helpfulfields.models.SoftDelete.delete` leaves them, unless
+    asked to cascade) are skipped rather than purged, so that live objects
+    are never lost.
+
+    :param queryset: the objects to purge, usually from :func:`purgeable`
+    :param batch_size: the maximum number of objects per transaction.
+    :param archive: an optional model with the same field names, into
+                    which rows are copied before being deleted.
+    :param start_after: the primary key to resume after.
+    :return: yields the last primary key, the number of objects purged, and
+             the primary keys of those skipped for each batch.
+    :rtype: generator of tuples
+    """
+    using = queryset.db
+    if archive is not None:
+        archive_fields = set(f.attname for f in archive._meta.fields)
+        copy_fields = [f.attname for f in queryset.model._meta.fields
+                       if f.attname in archive_fields]
+    last_pk = start_after
+    while True:
+        batch = queryset.order_by('pk')
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        pks = list(batch.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+        skipped = []
+        with transaction.commit_on_success(using=using):
+            objs = list(queryset.filter(pk__in=pks).order_by('pk'))
+            collector, live = collect_for_purge(objs, using)
+            if live:
+                # find out which objects the live dependants belong to, one
+                # at a time, which should only be needed rarely.
+                skipped = [obj.pk for obj in objs
+                           if collect_for_purge([obj], using)[1]]
+                objs = [obj for obj in objs if obj.pk not in skipped]
+                collector = collect_for_purge(objs, using)[0]
+            if archive is not None and objs:
+                archived = queryset.model._base_manager.using(using).filter(
+                    pk__in=[obj.pk for obj in objs])
+                archive._base_manager.db_manager(using).bulk_create([
+                    archive(**values)
+                    for values in archived.values(*copy_fields)
+                ])
+            if objs:
+                collector.delete()
+        last_pk = pks[-1]
+        yield last_pk, len(objs), skipped
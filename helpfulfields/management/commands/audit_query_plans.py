@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+from optparse import make_option
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import get_app, get_models, get_model
+from helpfulfields.querysets import (ChangeTrackingQuerySet,
+                                     PublishingQuerySet,
+                                     DatePublishingQuerySet,
+                                     SoftDeleteQuerySet)
+from helpfulfields.text import query_plan_unsupported
+from helpfulfields.utils import query_plan, QUERY_PLANNERS
+
+#: the queryset methods audited, for each of the querysets providing them.
+AUDITED_METHODS = (
+    (ChangeTrackingQuerySet, ('created_recently', 'modified_recently')),
+    (PublishingQuerySet, ('published', 'unpublished')),
+    (DatePublishingQuerySet, ('published', 'unpublished', 'scheduled',
+                              'expired')),
+    (SoftDeleteQuerySet, ('all', 'deleted', 'restored')),
+)
+
+
+class Command(BaseCommand):
+    """
+    Asks the database how it would run the filtering methods of the
+    `helpfulfields` querysets, for every model whose default manager
+    provides them, and reports any which would read every row of the table,
+    or sort rows without an index::
+
+        python manage.py audit_query_plans myapp --database=default
+
+    Exits with an error if any problems are found, so that it may be used to
+    catch a missing index in continuous integration.
+    ``EXPLAIN QUERY PLAN`` is used on `SQLite`, and ``EXPLAIN`` on
+    PostgreSQL and MySQL; see :data:`~helpfulfields.utils.QUERY_PLANNERS`.
+
+    :test case: :class:`helpfulfields.tests.AuditQueryPlansTestCase`
+    """
+    args = '<app_label app_label.ModelName ...>'
+    help = ('Reports full table scans and temporary sorts in the query plans '
+            'of the helpfulfields queryset methods.')
+    option_list = BaseCommand.option_list + (
+        make_option('--database', action='store', dest='database',
+                    default=DEFAULT_DB_ALIAS,
+                    help='Nominates a specific database to audit against.'),
+    )
+
+    def handle(self, *args, **options):
+        using = options['database']
+        vendor = connections[using].vendor
+        if vendor not in QUERY_PLANNERS:
+            raise CommandError(query_plan_unsupported % {'vendor': vendor})
+        verbosity = int(options['verbosity'])
+        problems = 0
+        audited = 0
+        for model in self.get_models(args):
+            queryset = model._default_manager.db_manager(using).get_query_set()
+            for name in self.audited_methods(queryset):
+                audited += 1
+                label = '%s.%s.%s()' % (model._meta.app_label,
+                                        model._meta.object_name, name)
+                lines, found = query_plan(getattr(queryset, name)())
+                if not found:
+                    if verbosity > 1:
+                        self.stdout.write('%s: ok\n' % label)
+                    continue
+                problems += 1
+                for kind, line in found:
+                    self.stdout.write('%s: %s: %s\n' % (label, kind, line))
+                if verbosity > 1:
+                    for line in lines:
+                        self.stdout.write('    %s\n' % line)
+        if verbosity > 0:
+            self.stdout.write('%d of %d query plans have problems\n'
+                              % (problems, audited))
+        if problems:
+            raise CommandError('%d query plans have full table scans or '
+                               'temporary sorts.' % problems)
+
+    def audited_methods(self, queryset):
+        """
+        :return: the names of the methods to audit on the queryset.
+        :rtype: list
+        """
+        names = []
+        for queryset_class, methods in AUDITED_METHODS:
+            if isinstance(queryset, queryset_class):
+                names.extend([name for name in methods if name not in names])
+        return names
+
+    def get_models(self, labels):
+        """
+        :return: the concrete models named, or all of them.
+        :rtype: list
+        """
+        if not labels:
+            models = get_models()
+        else:
+            models = []
+            for label in labels:
+                if '.' in label:
+                    app_label, model_name = label.split('.', 1)
+                    model = get_model(app_label, model_name)
+                    if model is None:
+                        raise CommandError('Unknown model: %s' % label)
+                    models.append(model)
+                else:
+                    try:
+                        models.extend(get_models(get_app(label)))
+                    except ImproperlyConfigured:
+                        raise CommandError('Unknown application: %s' % label)
+        return [candidate for candidate in models
+                if not candidate._meta.abstract and not candidate._meta.proxy]
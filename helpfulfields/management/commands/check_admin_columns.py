@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from django.contrib import admin
+from django.core.management.base import NoArgsCommand, CommandError
+from helpfulfields.checks import check_admin_site
+
+
+class Command(NoArgsCommand):
+    """
+    Inspects every :class:`~django.contrib.admin.ModelAdmin` registered with
+    the default admin site by the ``admin`` modules of the installed
+    applications for `helpfulfields` columns which will be slow on
+    large changelists, as described by
+    :func:`~helpfulfields.checks.check_model_admin`::
+
+        python manage.py check_admin_columns
+
+    Exits with an error if any are found, so that it may be run in
+    continuous integration.
+
+    `Django`_ 1.4 and 1.5 have no system check framework to hook into, so
+    this must be run on purpose, rather than by every other command.
+
+    :test case: :class:`helpfulfields.tests.AdminChecksTestCase`
+    """
+    help = ('Warns about helpfulfields changelist columns which run queries '
+            'per row, follow unindexed relations, or load unbounded lists.')
+
+    def handle_noargs(self, **options):
+        # the urlconf, which usually does this, isn't loaded for commands.
+        admin.autodiscover()
+        verbosity = int(options['verbosity'])
+        warnings = check_admin_site(admin.site)
+        for warning in warnings:
+            self.stdout.write('%s\n' % unicode(warning))
+        if verbosity > 0:
+            self.stdout.write('%d problems found\n' % len(warnings))
+        if warnings:
+            raise CommandError('%d changelist columns may be slow.'
+                               % len(warnings))
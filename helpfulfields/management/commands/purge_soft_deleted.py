@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+from optparse import make_option
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import get_model
+from helpfulfields.deletion import can_soft_delete, purgeable, purge_in_batches
+from helpfulfields.settings import PURGE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    """
+    Permanently removes objects which have been soft deleted via
+    :class:`~helpfulfields.models.SoftDelete` for longer than a given number of
+    days, in small batches, optionally copying them into an archive model
+    first::
+
+        python manage.py purge_soft_deleted myapp.Item --days=90 \\
+            --archive=myapp.ArchivedItem
+
+    Objects with dependants which use :class:`~helpfulfields.models.SoftDelete`
+    but haven't been deleted themselves are skipped, and counted, rather than
+    taking those dependants with them.
+
+    :test case: :class:`helpfulfields.tests.PurgeSoftDeletedTestCase`
+    """
+    args = '<app_label.ModelName app_label.ModelName ...>'
+    help = ('Permanently deletes rows which have been soft deleted for more '
+            'than --days days, in batches of --batch-size.')
+    option_list = BaseCommand.option_list + (
+        make_option('--days', action='store', dest='days', type='int',
+                    default=None,
+                    help='Only purge rows deleted at least this many days '
+                         'ago; requires the model to use ChangeTracking.'),
+        make_option('--batch-size', action='store', dest='batch_size',
+                    type='int', default=PURGE_BATCH_SIZE,
+                    help='How many rows to remove per transaction.'),
+        make_option('--archive', action='store', dest='archive', default=None,
+                    help='An app_label.ModelName to copy rows into before '
+                         'removing them. Only valid with one model.'),
+        make_option('--start-after', action='store', dest='start_after',
+                    default=None,
+                    help='Resume an interrupted purge after this primary '
+                         'key.'),
+        make_option('--sleep', action='store', dest='sleep', type='float',
+                    default=0,
+                    help='Seconds to pause between batches.'),
+        make_option('--database', action='store', dest='database',
+                    default=DEFAULT_DB_ALIAS,
+                    help='Nominates a specific database to purge.'),
+    )
+
+    def handle(self, *args, **options):
+        if not args:
+            raise CommandError('Enter at least one app_label.ModelName.')
+        if options['days'] is None:
+            raise CommandError('--days is required; use --days=0 to purge '
+                               'everything marked as deleted.')
+        models = [self.get_model(label) for label in args]
+        archive = None
+        if options['archive']:
+            if len(models) > 1:
+                raise CommandError('--archive may only be used with one '
+                                   'model.')
+            archive = self.get_model(options['archive'])
+
+        for model in models:
+            if not can_soft_delete(model):
+                raise CommandError('%s does not use SoftDelete.'
+                                   % model._meta.object_name)
+            field_names = [f.name for f in model._meta.fields]
+            if options['days'] and 'modified' not in field_names:
+                raise CommandError('%s does not use ChangeTracking, so how '
+                                   'long objects have been deleted is '
+                                   'unknown.'
+                                   % model._meta.object_name)
+
+        for model in models:
+            objs = purgeable(model, days=options['days'],
+                             using=options['database'])
+            total = 0
+            skipped = 0
+            batches = purge_in_batches(objs, batch_size=options['batch_size'],
+                                       archive=archive,
+                                       start_after=options['start_after'])
+            for last_pk, count, skipped_pks in batches:
+                total += count
+                skipped += len(skipped_pks)
+                if int(options['verbosity']) > 1:
+                    self.stdout.write('%s: purged %d, up to pk %s\n' % (
+                        model._meta.object_name, total, last_pk))
+                if options['sleep']:
+                    time.sleep(options['sleep'])
+            if int(options['verbosity']) > 0:
+                self.stdout.write('%s: purged %d objects\n' % (
+                    model._meta.object_name, total))
+                if skipped:
+                    self.stdout.write('%s: skipped %d objects with dependants '
+                                      'which are not deleted\n' % (
+                                          model._meta.object_name, skipped))
+
+    def get_model(self, label):
+        try:
+            app_label, model_name = label.split('.')
+        except ValueError:
+            raise CommandError('%s is not in the form app_label.ModelName'
+                               % label)
+        model = get_model(app_label, model_name)
+        if model is None:
+            raise CommandError('Unknown model: %s' % label)
+        return model
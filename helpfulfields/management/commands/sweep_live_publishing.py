@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from optparse import make_option
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import get_model
+from helpfulfields.querysets import has_live_column
+from helpfulfields.settings import LIVE_SWEEP_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    """
+    Corrects :attr:`~helpfulfields.models.LiveDatePublishing.is_live` for
+    objects which have been published or unpublished by the passing of
+    time, via
+    :meth:`~helpfulfields.querysets.DatePublishingQuerySet.sweep_live`::
+
+        python manage.py sweep_live_publishing myapp.Article --batch-size=500
+
+    Queries stay correct however rarely this runs, but the more often it
+    does, the fewer objects they have to compare the dates of; running it
+    every few minutes is reasonable. The sweep is only noticed by processes
+    sharing the same cache backend, so it's of no use with the local memory
+    cache.
+
+    :test case: :class:`helpfulfields.tests.LiveDatePublishingTestCase`
+    """
+    args = '<app_label.ModelName app_label.ModelName ...>'
+    help = ('Updates the is_live column of LiveDatePublishing models, in '
+            'batches of --batch-size.')
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size', action='store', dest='batch_size',
+                    type='int', default=LIVE_SWEEP_BATCH_SIZE,
+                    help='How many rows to update per transaction.'),
+        make_option('--database', action='store', dest='database',
+                    default=DEFAULT_DB_ALIAS,
+                    help='Nominates a specific database to sweep.'),
+    )
+
+    def handle(self, *args, **options):
+        if not args:
+            raise CommandError('Enter at least one app_label.ModelName.')
+        models = [self.get_model(label) for label in args]
+        for model in models:
+            if not has_live_column(model):
+                raise CommandError('%s does not use LiveDatePublishing.'
+                                   % model._meta.object_name)
+
+        for model in models:
+            queryset = model._default_manager.db_manager(
+                options['database']).get_query_set()
+            if not hasattr(queryset, 'sweep_live'):
+                raise CommandError('%s has no DatePublishingQuerySet.'
+                                   % model._meta.object_name)
+            totals = {True: 0, False: 0}
+            batches = queryset.sweep_live(batch_size=options['batch_size'])
+            for is_live, count in batches:
+                totals[is_live] += count
+            if int(options['verbosity']) > 0:
+                self.stdout.write('%s: %d made live, %d no longer live\n' % (
+                    model._meta.object_name, totals[True], totals[False]))
+
+    def get_model(self, label):
+        try:
+            app_label, model_name = label.split('.')
+        except ValueError:
+            raise CommandError('%s is not in the form app_label.ModelName'
+                               % label)
+        model = get_model(app_label, model_name)
+        if model is None:
+            raise CommandError('Unknown model: %s' % label)
+        return model
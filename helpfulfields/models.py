@@ -1,9 +1,14 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime, timedelta
+import django
 from django.contrib.contenttypes.generic import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
-from helpfulfields.settings import RECENTLY_MINUTES
+from django.db import models, router
+from django.db.models.signals import pre_save, post_save, post_delete
+from helpfulfields.deletion import SoftDeleteCollector
+from helpfulfields.publishedcache import invalidate_published_pks_receiver
+from helpfulfields.settings import RECENTLY_MINUTES, SOFT_DELETE_CASCADE_POLICY
+from helpfulfields.touching import touch_parents_receiver
 from helpfulfields.text import (seo_title_label, seo_title_help,
                                 seo_description_label, seo_description_help,
                                 seo_keywords_label, seo_keywords_help,
@@ -15,7 +20,11 @@ from helpfulfields.text import (seo_title_label, seo_title_help,
                                 unpublish_help, quick_publish_label,
                                 quick_publish_help, object_lacks_pk,
                                 object_not_deleted, created_label, created_help,
-                                modified_label, modified_help)
+                                modified_label, modified_help,
+                                publication_scheduled, publication_published,
+                                publication_expired, is_live_label,
+                                is_live_help)
+from helpfulfields.utils import has_modified
 
 
 class ChangeTracking(models.Model):
@@ -30,8 +39,28 @@ class ChangeTracking(models.Model):
         `django-model-utils`_ TimeStampedModel, though it provides a few
         extra bits.
 
+    Setting :attr:`track_dirty_fields` to :data:`True` on a subclass
+    remembers the values each object was loaded with, so that saving an
+    object which hasn't changed doesn't touch the database (or the
+    :attr:`modified` date) at all, and saving one which has only writes the
+    changed fields, where `Django`_ supports ``update_fields``.
+
+    Listing foreign keys in :attr:`touch_parents` keeps the parent's
+    :attr:`modified` date up to date whenever this object is saved or
+    deleted. Inside :class:`~helpfulfields.touching.deferred_touches`, all
+    the parents are touched together just before the transaction commits.
+
     :test case: :class:`helpfulfields.tests.ChangeTrackingTestCase`
+    :test case: :class:`helpfulfields.tests.TouchParentsTestCase`
     """
+    #: names of foreign keys to other :class:`ChangeTracking` models, whose
+    #: :attr:`modified` date should change whenever this object does.
+    touch_parents = ()
+
+    #: whether or not to skip saving objects which haven't been changed since
+    #: they were loaded. Off by default, because it costs a copy of every
+    #: field's value per object.
+    track_dirty_fields = False
 
     #: a :class:`~datetime.datetime` representing the original date this
     #: object was saved. Represented as a
@@ -81,6 +110,64 @@ class ChangeTracking(models.Model):
         recently = datetime.now() - timedelta(**kwargs)
         return self.modified >= recently
 
+    def __init__(self, *args, **kwargs):
+        super(ChangeTracking, self).__init__(*args, **kwargs)
+        if self.track_dirty_fields:
+            self._remember_loaded_values()
+
+    def _remember_loaded_values(self):
+        # deferred fields aren't in the instance dict, and looking them up
+        # would cost a query each, so they're never remembered.
+        self._loaded_values = dict(
+            (field.attname, self.__dict__[field.attname])
+            for field in self._meta.fields
+            if field.attname in self.__dict__
+        )
+
+    def dirty_fields(self):
+        """
+        Which fields have changed since this object was loaded or saved?
+        Only available when :attr:`track_dirty_fields` is enabled.
+
+        :return: the names of the changed fields, excluding :attr:`modified`
+        :rtype: list
+        """
+        loaded = self._loaded_values
+        missing = object()
+        return [field.name for field in self._meta.fields
+                if not field.primary_key and field.name != 'modified'
+                and field.attname in self.__dict__
+                and (loaded.get(field.attname, missing)
+                     != self.__dict__[field.attname])]
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the object as normal, unless :attr:`track_dirty_fields` is
+        enabled and the object was loaded from the database. In that case,
+        nothing happens if no fields have changed, and otherwise only the
+        changed fields and :attr:`modified` are written.
+
+        Explicitly passing `force_insert`, `force_update` or
+        `update_fields`, or saving to a database other than the one the
+        object was loaded from, always saves.
+
+        :rtype: None
+        """
+        forced = ('force_insert', 'force_update', 'update_fields')
+        using = kwargs.get('using')
+        if (self.track_dirty_fields and not self._state.adding and not args
+                and using in (None, self._state.db)
+                and not any(kwargs.get(x) for x in forced)):
+            dirty = self.dirty_fields()
+            if not dirty:
+                return None
+            if django.VERSION >= (1, 5):
+                kwargs['update_fields'] = dirty + ['modified']
+        super(ChangeTracking, self).save(*args, **kwargs)
+        if self.track_dirty_fields:
+            self._remember_loaded_values()
+    save.alters_data = True
+
     class Meta:
         abstract = True
 
@@ -207,6 +294,14 @@ class DatePublishing(models.Model):
 
     :test case: :class:`helpfulfields.tests.DatePublishingTestCase`
     """
+    #: the states an object may be in, as calculated by the
+    #: ``annotate_publication_state`` method of
+    #: :class:`~helpfulfields.querysets.DatePublishingQuerySet`
+    PUBLICATION_STATES = (
+        ('scheduled', publication_scheduled),
+        ('published', publication_published),
+        ('expired', publication_expired),
+    )
 
     #: Defaults to :meth:`datetime.datetime.now()` - the date on which this
     #: should be available on the site. Represented as a
@@ -227,10 +322,20 @@ class DatePublishing(models.Model):
         :class:`Publishing` which uses a boolean property, this method is
         accessed the same way, and is decorated with :func:`~property` for this reason.
 
+        If the object was fetched via
+        :meth:`~helpfulfields.querysets.DatePublishingQuerySet.annotate_publication_state`
+        the state calculated by the database is used instead, so that every
+        object in the same queryset agrees on what "now" is.
+
         :return: Whether or not this object is currently visible
         :rtype: boolean
         """
-        now = datetime.now()
+        state = getattr(self, 'publication_state', None)
+        if state is not None:
+            return state == self.PUBLICATION_STATES[1][0]
+        return self._published_at(datetime.now())
+
+    def _published_at(self, now):
         if self.unpublish_on is not None:
             # maybe self.unpublish_on >= now >= self.publish_on ???
             return self.unpublish_on >= now and self.publish_on <= now
@@ -238,6 +343,8 @@ class DatePublishing(models.Model):
             return self.publish_on <= now
 
     def _set_is_published(self, value):
+        # any previously annotated state is no longer true.
+        self.__dict__.pop('publication_state', None)
         now = datetime.now() - timedelta(seconds=1)
         if value:
             self.publish_on = now
@@ -251,6 +358,7 @@ class DatePublishing(models.Model):
     def unpublish(self, using=None):
         assert self.is_published is True, 'cannot unpublish an unpublised thing!'
         self.unpublish_on = datetime.now() - timedelta(seconds=1)
+        self.__dict__.pop('publication_state', None)
         return self.save(using)
 
 
@@ -258,6 +366,67 @@ class DatePublishing(models.Model):
         abstract = True
 
 
+class LiveDatePublishing(DatePublishing):
+    """
+    :class:`DatePublishing`, plus an indexed :attr:`is_live` column recording
+    whether the object was published when it was last saved, or swept by
+    :meth:`~helpfulfields.querysets.DatePublishingQuerySet.sweep_live`
+    (usually via the ``sweep_live_publishing`` management command), and an
+    index on :attr:`~DatePublishing.publish_on`.
+
+    Once the model has been swept,
+    :meth:`~helpfulfields.querysets.DatePublishingQuerySet.published` looks
+    up objects which are live, or have been published since the sweep, by
+    those indexes, rather than comparing the dates of every object. The
+    results are the same either way, however long ago the sweep was, so
+    long as :attr:`is_live` is kept up to date whenever the dates change.
+    Saving (including the raw saves of ``loaddata``, via
+    :func:`set_is_live_receiver`), and the
+    :meth:`~helpfulfields.querysets.DatePublishingQuerySet.update` and
+    :meth:`~helpfulfields.querysets.DatePublishingQuerySet.bulk_create` of
+    :class:`~helpfulfields.querysets.DatePublishingQuerySet` do so; run the
+    sweeper again after changing the dates any other way, such as through a
+    manager without it.
+
+    .. note::
+        The time of the last sweep is kept in `Django`_'s cache, which must
+        be shared between the sweeper and the processes querying, such as
+        memcached; with the default local memory cache, the sweep goes
+        unnoticed and every query compares the dates instead.
+
+    :test case: :class:`helpfulfields.tests.LiveDatePublishingTestCase`
+    """
+    #: :class:`~django.db.models.BooleanField` set whenever the object is
+    #: saved, and by the sweeper; not for editing.
+    is_live = models.BooleanField(default=False, db_index=True, editable=False,
+                                  verbose_name=is_live_label,
+                                  help_text=is_live_help)
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the object as normal, with :attr:`is_live` set from the dates
+        by :func:`set_is_live_receiver`. If only some fields are being saved,
+        :attr:`is_live` is saved too.
+
+        :rtype: None
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'is_live' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['is_live']
+        super(LiveDatePublishing, self).save(*args, **kwargs)
+    save.alters_data = True
+
+    class Meta:
+        abstract = True
+
+
+# published() looks for objects scheduled since the last sweep by their
+# publish_on, so it needs an index here; fields inherited from an abstract
+# model can't be redeclared, but the copy each model using this one takes is
+# of this model's own.
+LiveDatePublishing._meta.get_field('publish_on').db_index = True
+
+
 class SoftDelete(models.Model):
     """ I've not actually used this yet. It's just a sketch of something I'd like.
 
@@ -279,22 +448,45 @@ class SoftDelete(models.Model):
                                       verbose_name=soft_delete_label,
                                       help_text=soft_delete_help)
 
-    def delete(self, using=None):
+    def delete(self, using=None, cascade=False,
+               policy=SOFT_DELETE_CASCADE_POLICY):
         """
         Instead of deleting this object, and all it's related items,
-        we hide remove it softly. This means that currently there will be a lot
-        of pseudo-orphans, because I've not yet decided on how to handle them.
+        we hide remove it softly. By default this means that there will be a
+        lot of pseudo-orphans, because related items are left alone.
         They're just hangers-on, really.
 
+        With `cascade`, everything which would have been deleted along with
+        this object is found via
+        :class:`~helpfulfields.deletion.SoftDeleteCollector`, and soft deleted
+        too, using one ``UPDATE`` per affected model. Dependants whose models
+        don't use :class:`SoftDelete` are handled according to `policy`.
+
         :param using: the db router to use.
+        :param cascade: whether to soft delete dependant objects too.
+        :param policy: one of ``ignore``, ``protect`` or ``delete``,
+                       defaulting to
+                       :data:`~helpfulfields.settings.SOFT_DELETE_CASCADE_POLICY`
         :rtype: None
         """
         assert self._get_pk_val() is not None, object_lacks_pk % {
             'model': self._meta.object_name,
             'pk': self._meta.pk.attname
         }
+        if not cascade:
+            self.deleted = self.DELETED_CHOICES[2][0]
+            self.save(using=using)
+            return None
+        using = using or router.db_for_write(self.__class__, instance=self)
+        collector = SoftDeleteCollector(using=using, policy=policy)
+        collector.collect_queryset(self.__class__._base_manager.using(using)
+                                   .filter(pk=self._get_pk_val()))
+        now = datetime.now()
+        collector.soft_delete(now=now)
+        # only once the rows have changed, in case the policy refused.
         self.deleted = self.DELETED_CHOICES[2][0]
-        self.save(using=using)
+        if has_modified(self.__class__):
+            self.modified = now
     delete.alters_data = True
 
     def restore(self, using=None):
@@ -342,3 +534,26 @@ class Generic(models.Model):
 
     class Meta:
         abstract = True
+
+
+def set_is_live_receiver(sender, instance, **kwargs):
+    """
+    Listens to :data:`~django.db.models.signals.pre_save` for every model,
+    and sets :attr:`~LiveDatePublishing.is_live` on those using
+    :class:`LiveDatePublishing` from their dates, whether saved normally or
+    raw, as by ``loaddata``.
+    """
+    if isinstance(instance, LiveDatePublishing):
+        instance.is_live = instance._published_at(datetime.now())
+
+
+pre_save.connect(set_is_live_receiver,
+                 dispatch_uid='helpfulfields_is_live_save')
+post_save.connect(touch_parents_receiver,
+                  dispatch_uid='helpfulfields_touch_parents_save')
+post_delete.connect(touch_parents_receiver,
+                    dispatch_uid='helpfulfields_touch_parents_delete')
+post_save.connect(invalidate_published_pks_receiver,
+                  dispatch_uid='helpfulfields_published_pks_save')
+post_delete.connect(invalidate_published_pks_receiver,
+                    dispatch_uid='helpfulfields_published_pks_delete')
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models import Min
+from helpfulfields.settings import (PUBLISHED_PKS_TIMEOUT,
+                                    PUBLISHED_PKS_UNCOMMITTED_TIMEOUT)
+from helpfulfields.text import published_pks_unsupported
+from helpfulfields.touching import after_transaction
+
+#: cached in place of the primary keys while a change to them is yet to be
+#: committed, so that nobody caches what they read in the meantime.
+UNCOMMITTED = 'uncommitted'
+
+
+def published_pks_key(model, using):
+    """
+    The cache key holding the published primary keys of a model, as found
+    in the database `using`.
+
+    :rtype: string
+    """
+    opts = model._meta
+    return 'helpfulfields:published:%s.%s:%s' % (
+        opts.app_label, opts.module_name, using)
+
+
+class PublishedPks(object):
+    """
+    The primary keys of a model's published objects, sorted, so that
+    membership is found by binary search in ``O(log n)`` time::
+
+        pks = published_pks(Article)
+        if article_id in pks:
+            ...
+
+    Integer keys are kept in an :class:`~array.array`, which pickles to a
+    fraction of the size of a list or set of the same numbers.
+
+    :test case: :class:`helpfulfields.tests.PublishedPksTestCase`
+    """
+    def __init__(self, pks, expires=None):
+        """
+        :param pks: the primary keys, in any order.
+        :param expires: the :class:`~datetime.datetime` at which the next
+                        object is due to be published or unpublished, if
+                        there is one.
+        """
+        pks = sorted(pks)
+        if all(isinstance(pk, (int, long)) for pk in pks):
+            self.pks = array('l', pks)
+        else:
+            self.pks = tuple(pks)
+        self.expires = expires
+
+    def __contains__(self, pk):
+        index = bisect_left(self.pks, pk)
+        return index < len(self.pks) and self.pks[index] == pk
+
+    def __iter__(self):
+        return iter(self.pks)
+
+    def __len__(self):
+        return len(self.pks)
+
+    def is_stale(self, now=None):
+        """
+        :return: whether an object has been published or unpublished by the
+                 passing of time since these were found.
+        :rtype: boolean
+        """
+        if self.expires is None:
+            return False
+        return (now or datetime.now()) >= self.expires
+
+
+def next_boundary(queryset, now):
+    """
+    Finds when the next object using
+    :class:`~helpfulfields.models.DatePublishing` will be published, or
+    unpublished, after `now`.
+
+    :return: the :class:`~datetime.datetime`, or :data:`None`
+    """
+    publish = queryset.filter(publish_on__gt=now).aggregate(
+        boundary=Min('publish_on'))['boundary']
+    unpublish = queryset.filter(unpublish_on__gte=now).aggregate(
+        boundary=Min('unpublish_on'))['boundary']
+    if unpublish is not None:
+        # objects are still published at their unpublish_on.
+        unpublish += timedelta(microseconds=1)
+    boundaries = [boundary for boundary in (publish, unpublish)
+                  if boundary is not None]
+    return boundaries and min(boundaries) or None
+
+
+def find_published_pks(model, using=None, now=None):
+    """
+    Asks the database for the published primary keys of a model using
+    :class:`~helpfulfields.models.Publishing` or
+    :class:`~helpfulfields.models.DatePublishing`, and, for the latter,
+    when they will next change.
+
+    :rtype: :class:`PublishedPks`
+    """
+    from helpfulfields.models import DatePublishing
+    now = now or datetime.now()
+    queryset = model._default_manager.db_manager(using).get_query_set()
+    assert hasattr(queryset, 'published'), published_pks_unsupported % {
+        'model': model._meta.object_name,
+    }
+    expires = None
+    if issubclass(model, DatePublishing):
+        pks = queryset.published(now=now)
+        expires = next_boundary(queryset, now)
+    else:
+        pks = queryset.published()
+    return PublishedPks(pks.order_by().values_list('pk', flat=True),
+                        expires=expires)
+
+
+def published_pks(model, using=None, timeout=PUBLISHED_PKS_TIMEOUT):
+    """
+    The published primary keys of a model, from Django's cache if they're
+    there and still true, or from the database (and then cached) otherwise.
+    The cached keys are discarded when any object of the model is saved or
+    deleted (see :func:`invalidate_published_pks_receiver`), and when the
+    next object is due to be published or unpublished.
+
+    While a change is yet to be committed, the keys are read from the
+    database, but not cached, lest keys read before the commit outlive it.
+
+    .. note::
+        :meth:`~django.db.models.query.QuerySet.update` sends no signals;
+        call :func:`invalidate_published_pks` after using it to change
+        publication.
+
+    :param model: a model using :class:`~helpfulfields.models.Publishing`
+                  or :class:`~helpfulfields.models.DatePublishing`, whose
+                  default manager provides ``published()``
+    :param using: the db router to use.
+    :param timeout: the most seconds to cache the keys for.
+    :rtype: :class:`PublishedPks`
+    :test case: :class:`helpfulfields.tests.PublishedPksTestCase`
+    """
+    using = using or router.db_for_read(model)
+    key = published_pks_key(model, using)
+    now = datetime.now()
+    pks = cache.get(key)
+    if pks == UNCOMMITTED:
+        return find_published_pks(model, using=using, now=now)
+    if pks is None or pks.is_stale(now):
+        if pks is not None:
+            cache.delete(key)
+        pks = find_published_pks(model, using=using, now=now)
+        if pks.expires is not None:
+            remaining = pks.expires - now
+            seconds = remaining.days * 86400 + remaining.seconds + 1
+            timeout = max(1, min(timeout, seconds))
+        # only if nobody has begun changing them since they were read.
+        cache.add(key, pks, timeout)
+    return pks
+
+
+def is_published_pk(model, pk, using=None):
+    """
+    Whether the object of `model` with the primary key `pk` is published,
+    according to :func:`published_pks`
+
+    :rtype: boolean
+    """
+    return pk in published_pks(model, using=using)
+
+
+def invalidate_published_pks(model, using=None):
+    """
+    Discards the cached published primary keys of a model.
+
+    Inside a transaction, the change may not be visible to anyone else
+    until it commits, so :data:`UNCOMMITTED` is cached instead, and the
+    keys aren't cached again until the transaction has ended, if it is a
+    :class:`~helpfulfields.touching.deferred_touches` block, or
+    :data:`~helpfulfields.settings.PUBLISHED_PKS_UNCOMMITTED_TIMEOUT`
+    seconds have passed.
+
+    :param using: the db router whose keys changed; by default, the one
+                  the model is written to.
+    :rtype: None
+    """
+    using = using or router.db_for_write(model)
+    key = published_pks_key(model, using)
+    if not transaction.is_managed(using=using):
+        cache.delete(key)
+        return None
+    cache.set(key, UNCOMMITTED, PUBLISHED_PKS_UNCOMMITTED_TIMEOUT)
+    after_transaction(cache.delete, key)
+
+
+def invalidate_published_pks_receiver(sender, **kwargs):
+    """
+    Listens to :data:`~django.db.models.signals.post_save` and
+    :data:`~django.db.models.signals.post_delete` for every model, and
+    discards the cached published primary keys of those using
+    :class:`~helpfulfields.models.Publishing` or
+    :class:`~helpfulfields.models.DatePublishing`
+    """
+    # the receiver is connected by helpfulfields.models, so can't import it
+    # before then.
+    from helpfulfields.models import Publishing, DatePublishing
+    if issubclass(sender, (Publishing, DatePublishing)):
+        invalidate_published_pks(sender, using=kwargs.get('using'))
@@ -1,8 +1,16 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime, timedelta
+from django.core.cache import cache
+from django.db import transaction
 from django.db.models import Q
+from django.db.models.expressions import ExpressionNode
 from django.db.models.query import QuerySet
-from helpfulfields.settings import RECENTLY_MINUTES
+from helpfulfields.intervals import PublicationIndex
+from helpfulfields.settings import (RECENTLY_MINUTES, RECENCY_BUCKETS,
+                                    RECENCY_OLDER, LIVE_SWEEP_BATCH_SIZE,
+                                    LIVE_SWEPT_TIMEOUT)
+from helpfulfields.utils import (quoted_column, datetime_param, grouped_count,
+                                 stamp_modified)
 
 # The querysets represented herein are designed to be used with their
 # approrpriate abstract models, and typically provide additional methods by
@@ -73,6 +81,73 @@ class ChangeTrackingQuerySet(QuerySet):
         recently = datetime.now() - timedelta(**kwargs)
         return self.filter(modified__gte=recently)
 
+    def update(self, touch_modified=True, **kwargs):
+        """
+        Updates all objects in the queryset, as
+        :meth:`~django.db.models.query.QuerySet.update` does, but also sets
+        :attr:`~helpfulfields.models.ChangeTracking.modified` to now in the
+        same statement, as saving each object would have done.
+
+        Passing a value for `modified` explicitly uses that instead.
+
+        :param touch_modified: set to :data:`False` to leave `modified` alone.
+        :return: the number of rows matched.
+        :rtype: integer
+        """
+        if touch_modified:
+            kwargs = stamp_modified(self.model, kwargs)
+        return super(ChangeTrackingQuerySet, self).update(**kwargs)
+    update.alters_data = True
+
+    def annotate_recency(self, field='modified', buckets=RECENCY_BUCKETS,
+                         now=None):
+        """
+        Sorts each object into a bucket describing how recently it was
+        created or changed, adding the name of the bucket as a `recency`
+        attribute on every object, in the same query.
+
+        Objects older than the last bucket are put in
+        :data:`~helpfulfields.settings.RECENCY_OLDER`.
+
+        :param field: either `created` or `modified`
+        :param buckets: pairs of names and :class:`~datetime.timedelta`
+                        `kwargs`, ordered from most to least recent; defaults
+                        to :data:`~helpfulfields.settings.RECENCY_BUCKETS`
+        :param now: the :class:`~datetime.datetime` to compare against;
+                    defaults to :meth:`datetime.datetime.now()`
+        :return: objects with a `recency`
+        :rtype: :class:`~django.db.models.query.QuerySet` subclass
+        """
+        if now is None:
+            now = datetime.now()
+        column = quoted_column(self, field)
+        whens = []
+        params = []
+        for name, delta in buckets:
+            whens.append('WHEN %s >= %%s THEN %%s' % column)
+            since = now - timedelta(**delta)
+            params.extend([datetime_param(self, since), name])
+        params.append(RECENCY_OLDER)
+        sql = 'CASE %s ELSE %%s END' % ' '.join(whens)
+        return self.extra(select={'recency': sql}, select_params=params)
+
+    def recency_counts(self, field='modified', buckets=RECENCY_BUCKETS,
+                       now=None):
+        """
+        Counts how many objects fall into each of the buckets used by
+        :meth:`annotate_recency`, using one grouped query.
+
+        :return: a mapping of every bucket name to a count, including those
+                 with no objects.
+        :rtype: dictionary
+        """
+        counts = dict((name, 0) for name, delta in buckets)
+        counts[RECENCY_OLDER] = 0
+        counts.update(grouped_count(
+            self.annotate_recency(field=field, buckets=buckets, now=now),
+            'recency'))
+        return counts
+
 
 class PublishingQuerySet(QuerySet):
     """
@@ -105,6 +180,28 @@ class PublishingQuerySet(QuerySet):
         return self.filter(is_published=False)
 
 
+def live_swept_key(model, using):
+    """
+    The cache key holding when
+    :meth:`DatePublishingQuerySet.sweep_live` last finished sweeping a
+    model using :class:`~helpfulfields.models.LiveDatePublishing`
+
+    :rtype: string
+    """
+    opts = model._meta
+    return 'helpfulfields:live_swept:%s.%s:%s' % (
+        opts.app_label, opts.module_name, using)
+
+
+def has_live_column(model):
+    """
+    :return: whether the model uses
+             :class:`~helpfulfields.models.LiveDatePublishing`
+    :rtype: boolean
+    """
+    return 'is_live' in [field.name for field in model._meta.fields]
+
+
 class DatePublishingQuerySet(QuerySet):
     """
     A custom queryset for filtering things using the
@@ -113,7 +210,7 @@ class DatePublishingQuerySet(QuerySet):
 
     :test case: :class:`helpfulfields.tests.DatePublishingTestCase`
     """
-    def published(self):
+    def published(self, now=None):
         """
         Find all objects whose
         :attr:`~helpfulfields.models.DatePublishing.unpublish_on` value is in
@@ -121,12 +218,33 @@ class DatePublishingQuerySet(QuerySet):
         :attr:`~helpfulfields.models.DatePublishing.publish_on` value which is
         in the past or present.
 
+        For models using :class:`~helpfulfields.models.LiveDatePublishing`
+        which have been swept, objects published as of the sweep are found by
+        the :attr:`~helpfulfields.models.LiveDatePublishing.is_live` index,
+        and those published since by the index on
+        :attr:`~helpfulfields.models.DatePublishing.publish_on`, rather than
+        by comparing the dates of every object. As
+        :attr:`~helpfulfields.models.LiveDatePublishing.is_live` only says
+        whether an object is published now, asking about the past always
+        compares the dates.
+
+        :param now: the :class:`~datetime.datetime` to compare against;
+                    defaults to :meth:`datetime.datetime.now()`
         :return: All published objects
         :rtype: :class:`~django.db.models.query.QuerySet` subclass
         """
-        now = datetime.now()
+        current = now is None or now >= datetime.now()
+        if now is None:
+            now = datetime.now()
         maybe_published = Q(unpublish_on__gte=now) | Q(unpublish_on__isnull=True)
         definitely_published = Q(publish_on__lte=now)
+        if current and has_live_column(self.model):
+            swept = cache.get(live_swept_key(self.model, self.db))
+            if swept is not None and swept <= now:
+                # each side of the OR may use its own index.
+                definitely_published = (
+                    Q(is_live=True) |
+                    Q(publish_on__gt=swept, publish_on__lte=now))
         return self.filter(maybe_published & definitely_published)
 
     def unpublished(self):
@@ -143,6 +261,199 @@ class DatePublishingQuerySet(QuerySet):
         now = datetime.now()
         return self.filter(Q(unpublish_on__lte=now) | Q(publish_on__gte=now))
 
+    def scheduled(self):
+        """
+        Find all objects whose
+        :attr:`~helpfulfields.models.DatePublishing.publish_on` value is still
+        in the future.
+
+        :return: All objects yet to be published
+        :rtype: :class:`~django.db.models.query.QuerySet` subclass
+        """
+        return self.filter(publish_on__gt=datetime.now())
+
+    def expired(self):
+        """
+        Find all objects which have been published, but whose
+        :attr:`~helpfulfields.models.DatePublishing.unpublish_on` value is
+        now in the past.
+
+        :return: All objects which are no longer published
+        :rtype: :class:`~django.db.models.query.QuerySet` subclass
+        """
+        now = datetime.now()
+        return self.filter(publish_on__lte=now, unpublish_on__lt=now)
+
+    def annotate_publication_state(self, now=None):
+        """
+        Calculates whether each object is scheduled, published or expired in
+        the database, adding the result as a `publication_state` attribute on
+        every object, whose value is one of the keys in
+        :attr:`~helpfulfields.models.DatePublishing.PUBLICATION_STATES`.
+
+        Every row is compared against the same timestamp, so objects near a
+        boundary can't disagree with each other, and
+        :attr:`~helpfulfields.models.DatePublishing.is_published` will use the
+        annotated value rather than asking for the time again.
+
+        :param now: the :class:`~datetime.datetime` to compare against;
+                    defaults to :meth:`datetime.datetime.now()`
+        :return: objects with a `publication_state`
+        :rtype: :class:`~django.db.models.query.QuerySet` subclass
+        """
+        if now is None:
+            now = datetime.now()
+        scheduled, published, expired = [state[0] for state
+                                         in self.model.PUBLICATION_STATES]
+        columns = {
+            'publish': quoted_column(self, 'publish_on'),
+            'unpublish': quoted_column(self, 'unpublish_on'),
+        }
+        sql = ('CASE WHEN %(publish)s > %%s THEN %%s '
+               'WHEN %(unpublish)s IS NOT NULL '
+               'AND %(unpublish)s < %%s THEN %%s '
+               'ELSE %%s END' % columns)
+        now = datetime_param(self, now)
+        return self.extra(select={'publication_state': sql},
+                          select_params=(now, scheduled, now, expired,
+                                         published))
+
+    def publication_index(self):
+        """
+        Fetches the publication dates of every object in one query, into a
+        :class:`~helpfulfields.intervals.PublicationIndex` which can say
+        what is published at any moment, or during any period, without
+        asking the database again.
+
+        :rtype: :class:`~helpfulfields.intervals.PublicationIndex`
+        """
+        return PublicationIndex(self.order_by().values_list(
+            'pk', 'publish_on', 'unpublish_on'))
+
+    def update(self, **kwargs):
+        """
+        Updates all objects in the queryset, as
+        :meth:`~django.db.models.query.QuerySet.update` does, but for models
+        using :class:`~helpfulfields.models.LiveDatePublishing`, changing
+        either date also sets
+        :attr:`~helpfulfields.models.LiveDatePublishing.is_live` to match,
+        in the same statement where the new dates decide it for every row,
+        or in two, split by the date left alone, where they don't.
+
+        Dates given as ``F()`` expressions can't be compared in advance, so
+        the rows changed have
+        :attr:`~helpfulfields.models.LiveDatePublishing.is_live` corrected
+        afterwards instead.
+
+        :return: the number of rows matched.
+        :rtype: integer
+        """
+        dates = set(['publish_on', 'unpublish_on']) & set(kwargs)
+        update = super(DatePublishingQuerySet, self).update
+        if (not dates or 'is_live' in kwargs or
+                not has_live_column(self.model)):
+            return update(**kwargs)
+        now = datetime.now()
+        if any(isinstance(kwargs[name], ExpressionNode) for name in dates):
+            pks = list(self.values_list('pk', flat=True))
+            count = update(**kwargs)
+            for start in range(0, len(pks), LIVE_SWEEP_BATCH_SIZE):
+                changed = self.model._base_manager.using(self.db).filter(
+                    pk__in=pks[start:start + LIVE_SWEEP_BATCH_SIZE])
+                changed.filter(self._published_q(now)).update(is_live=True)
+                changed.exclude(self._published_q(now)).update(is_live=False)
+            return count
+        # whether the given dates alone decide that nothing is live, or
+        # what else needs to be true of the rows for them to be.
+        condition = Q()
+        if 'publish_on' in dates:
+            if kwargs['publish_on'] > now:
+                return update(is_live=False, **kwargs)
+        else:
+            condition &= Q(publish_on__lte=now)
+        if 'unpublish_on' in dates:
+            unpublish_on = kwargs['unpublish_on']
+            if unpublish_on is not None and unpublish_on < now:
+                return update(is_live=False, **kwargs)
+        else:
+            condition &= (Q(unpublish_on__gte=now) |
+                          Q(unpublish_on__isnull=True))
+        if not condition:
+            return update(is_live=True, **kwargs)
+        # the condition is only on the date not being changed, so the two
+        # statements can't see each other's rows.
+        return (self.filter(condition).update(is_live=True, **kwargs) +
+                self.exclude(condition).update(is_live=False, **kwargs))
+    update.alters_data = True
+
+    def _published_q(self, now):
+        """
+        :return: the dates of objects which are published at `now`
+        :rtype: :class:`~django.db.models.Q`
+        """
+        return ((Q(unpublish_on__gte=now) | Q(unpublish_on__isnull=True))
+                & Q(publish_on__lte=now))
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        As :meth:`~django.db.models.query.QuerySet.bulk_create`, setting
+        :attr:`~helpfulfields.models.LiveDatePublishing.is_live` from the
+        dates first for models using
+        :class:`~helpfulfields.models.LiveDatePublishing`, as no signals are
+        sent to do so.
+        """
+        if has_live_column(self.model):
+            now = datetime.now()
+            objs = list(objs)
+            for obj in objs:
+                obj.is_live = obj._published_at(now)
+        return super(DatePublishingQuerySet, self).bulk_create(objs, *args,
+                                                               **kwargs)
+
+    def sweep_live(self, batch_size=LIVE_SWEEP_BATCH_SIZE, now=None):
+        """
+        Corrects :attr:`~helpfulfields.models.LiveDatePublishing.is_live` for
+        every object which has been published or unpublished by the passing
+        of time, in batches, with one short transaction per batch. Once
+        finished, :meth:`published` is told it may trust
+        :attr:`~helpfulfields.models.LiveDatePublishing.is_live` for
+        anything published before `now`, by way of `Django`_'s cache, which
+        must be shared with the processes querying for it to be of use.
+
+        Each ``UPDATE`` compares the dates again, so objects saved with new
+        dates since their batch was chosen aren't changed back.
+
+        :param batch_size: the maximum number of objects per transaction.
+        :param now: the :class:`~datetime.datetime` to compare against;
+                    defaults to :meth:`datetime.datetime.now()`
+        :return: yields whether each batch was made live, and how many
+                 objects were changed.
+        :rtype: generator of tuples
+        """
+        if now is None:
+            now = datetime.now()
+        using = self.db
+        published = self._published_q(now)
+        unpublished = Q(unpublish_on__lt=now) | Q(publish_on__gt=now)
+        changes = ((True, published), (False, unpublished))
+        for is_live, dates in changes:
+            queryset = self.filter(dates, is_live=not is_live)
+            last_pk = None
+            while True:
+                batch = queryset.order_by('pk')
+                if last_pk is not None:
+                    batch = batch.filter(pk__gt=last_pk)
+                pks = list(batch.values_list('pk', flat=True)[:batch_size])
+                if not pks:
+                    break
+                with transaction.commit_on_success(using=using):
+                    count = self.model._base_manager.using(using).filter(
+                        dates, pk__in=pks).update(**stamp_modified(
+                            self.model, {'is_live': is_live}))
+                last_pk = pks[-1]
+                yield is_live, count
+        cache.set(live_swept_key(self.model, using), now, LIVE_SWEPT_TIMEOUT)
+
 
 class SoftDeleteQuerySet(QuerySet):
     """
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+from hashlib import md5
+from django.core.cache import cache
+from django.utils.encoding import force_unicode, smart_str
+from django.utils.functional import Promise
+from django.utils.translation import get_language
+from helpfulfields.settings import ROW_CACHE_TIMEOUT
+
+#: the attribute on each object under which its rendered cells are kept,
+#: once :func:`cached_rows` has found or rendered them.
+ROW_CACHE_ATTR = '_helpfulfields_cells'
+
+# the types of column attribute which contribute to column_signature()
+SIGNATURE_TYPES = (basestring, int, long, float, bool, Promise)
+
+
+def _model_label(model):
+    opts = model._meta
+    return '%s.%s' % (opts.app_label, opts.module_name)
+
+
+def stamp_key(model, pk):
+    """
+    The cache key holding the token which changes whenever a row is
+    invalidated by something other than its own
+    :attr:`~helpfulfields.models.ChangeTracking.modified` date changing.
+
+    :rtype: string
+    """
+    return 'helpfulfields:rowstamp:%s:%s' % (_model_label(model),
+                                             smart_str(pk))
+
+
+def row_key(obj, signature, language):
+    """
+    The cache key for the rendered cells of a row, which changes whenever
+    the object's :attr:`~helpfulfields.models.ChangeTracking.modified` date,
+    the columns being shown or the active language do.
+
+    :param obj: a model instance using
+                :class:`~helpfulfields.models.ChangeTracking`
+    :param signature: the result of :func:`column_signature`
+    :param language: the language code the cells are rendered in.
+    :rtype: string
+    """
+    return 'helpfulfields:row:%s:%s:%s:%s:%s' % (
+        _model_label(obj.__class__), smart_str(obj.pk),
+        obj.modified.strftime('%Y%m%d%H%M%S%f'), signature, language)
+
+
+def column_signature(columns, today=None):
+    """
+    Summarises the columns being shown, so that changing a
+    :attr:`~django.contrib.admin.ModelAdmin.list_display` doesn't show
+    stale cells.
+
+    Columns with a window of ``days`` back from today, such as
+    :class:`~helpfulfields.admin.Sparkline`, change when the day does, so
+    `today` is part of the signature if any are shown.
+
+    :param columns: the column callables.
+    :param today: the current :class:`~datetime.date`, by default.
+    :return: a short hash.
+    :rtype: string
+    """
+    parts = []
+    if any(hasattr(column, 'days') for column in columns):
+        parts.append((today or date.today()).isoformat())
+    for column in columns:
+        parts.append(column.__class__.__name__)
+        for key, value in sorted(vars(column).items()):
+            # anything else is either set on the column when it's called,
+            # or has no repr which is the same between processes.
+            if key.startswith('_') or not isinstance(value, SIGNATURE_TYPES):
+                continue
+            parts.append(u'%s=%s' % (key, force_unicode(value)))
+    return md5(smart_str(u'|'.join(parts))).hexdigest()[:12]
+
+
+def cached_rows(objs, columns, timeout=ROW_CACHE_TIMEOUT):
+    """
+    Finds the rendered output of `columns` for each of `objs`, using one
+    :meth:`~django.core.cache.backends.base.BaseCache.get_many` for the
+    whole page. Rows which weren't cached are rendered (giving any column
+    with a ``prepare`` method just those objects) and stored with one
+    :meth:`~django.core.cache.backends.base.BaseCache.set_many`.
+
+    Each object is given a list of its cells, in the same order as
+    `columns`, as :data:`ROW_CACHE_ATTR`
+
+    :param objs: model instances using
+                 :class:`~helpfulfields.models.ChangeTracking`
+    :param columns: the column callables to render.
+    :param timeout: how long to keep rendered rows for, in seconds.
+    :return: the number of rows which were found in the cache.
+    :rtype: integer
+    """
+    signature = column_signature(columns)
+    language = get_language()
+    keys = {}
+    stamps = {}
+    for obj in objs:
+        keys[obj] = row_key(obj, signature, language)
+        stamps[obj] = stamp_key(obj.__class__, obj.pk)
+    found = cache.get_many(list(keys.values()) + list(stamps.values()))
+
+    missing = []
+    for obj in objs:
+        stamp, cells = found.get(keys[obj], (None, None))
+        if cells is not None and stamp == found.get(stamps[obj]):
+            setattr(obj, ROW_CACHE_ATTR, cells)
+        else:
+            missing.append(obj)
+
+    if missing:
+        for column in columns:
+            if hasattr(column, 'prepare'):
+                column.prepare(missing)
+        rendered = {}
+        for obj in missing:
+            cells = [force_unicode(column(obj)) for column in columns]
+            setattr(obj, ROW_CACHE_ATTR, cells)
+            rendered[keys[obj]] = (found.get(stamps[obj]), cells)
+        cache.set_many(rendered, timeout)
+    return len(objs) - len(missing)
+
+
+def invalidate_rows(model, pks, timeout=ROW_CACHE_TIMEOUT):
+    """
+    Discards the cached cells for the given rows, regardless of the columns
+    or language they were rendered for.
+
+    :param model: the model whose rows are cached.
+    :param pks: the primary keys of the rows.
+    :param timeout: this should be at least as long as rows are cached for.
+    :rtype: None
+    """
+    from uuid import uuid4
+    token = uuid4().hex
+    cache.set_many(dict((stamp_key(model, pk), token) for pk in pks), timeout)
+
+
+class RowCacheInvalidator(object):
+    """
+    A signal receiver which discards cached rows of `model` when related
+    data changes, such as a child object being saved or deleted::
+
+        post_save.connect(RowCacheInvalidator(Category, 'category'),
+                          sender=Item, weak=False)
+
+    :test case: :class:`helpfulfields.tests.CachedColumnsTestCase`
+    """
+    def __init__(self, model, parents):
+        """
+        :param model: the model whose rows are cached.
+        :param parents: the name of the foreign key on the sender pointing at
+                        `model`, or a callable given the sender's instance
+                        and returning primary keys of `model`
+        """
+        self.model = model
+        self.parents = parents
+
+    def __call__(self, sender, instance, raw=False, **kwargs):
+        if raw:
+            return None
+        if callable(self.parents):
+            pks = self.parents(instance)
+        else:
+            field = instance._meta.get_field(self.parents)
+            pks = [getattr(instance, field.attname)]
+        pks = [pk for pk in pks if pk is not None]
+        if pks:
+            invalidate_rows(self.model, pks)
+
+
+def invalidate_rows_on(signal, sender, model, parents):
+    """
+    Connects a :class:`RowCacheInvalidator` to `signal`, only once however
+    many times it's asked to.
+
+    :param signal: the signal, usually
+                   :data:`~django.db.models.signals.post_save` or
+                   :data:`~django.db.models.signals.post_delete`
+    :param sender: the model sending the signal.
+    :param model: the model whose rows are cached.
+    :param parents: see :class:`RowCacheInvalidator`
+    :rtype: None
+    """
+    uid = 'helpfulfields.rowcache:%s:%s:%s:%r' % (
+        id(signal), _model_label(sender), _model_label(model), parents)
+    signal.connect(RowCacheInvalidator(model, parents), sender=sender,
+                   weak=False, dispatch_uid=uid)
+
+
+def logentry_object_pks(entry):
+    """
+    For use as the `parents` of a :class:`RowCacheInvalidator` listening to
+    :class:`~django.contrib.admin.models.LogEntry`, so that sparklines of
+    admin history are redrawn as it happens.
+
+    :return: the primary key of the object the entry is about.
+    :rtype: list
+    """
+    return [entry.object_id]
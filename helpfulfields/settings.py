@@ -4,5 +4,80 @@
 #: :class:`ChangeTrackingQuerySet`
 RECENTLY_MINUTES = 30
 
+#: default thresholds used by
+#: :meth:`~helpfulfields.querysets.ChangeTrackingQuerySet.annotate_recency`,
+#: ordered from most to least recent. Each is a name, and the `kwargs` to pass
+#: to :class:`~datetime.timedelta`
+RECENCY_BUCKETS = (
+    ('hour', {'hours': 1}),
+    ('day', {'days': 1}),
+    ('week', {'weeks': 1}),
+)
+
+#: the name used by
+#: :meth:`~helpfulfields.querysets.ChangeTrackingQuerySet.annotate_recency`
+#: for anything older than the last of the :data:`RECENCY_BUCKETS`
+RECENCY_OLDER = 'older'
+
+#: default policy used by :class:`~helpfulfields.deletion.SoftDeleteCollector`
+#: for dependants which can't be soft deleted; one of ``ignore``, ``protect``
+#: or ``delete``
+SOFT_DELETE_CASCADE_POLICY = 'ignore'
+
+#: default number of rows purged per transaction by
+#: :func:`~helpfulfields.deletion.purge_in_batches`
+PURGE_BATCH_SIZE = 500
+
+#: the maximum number of primary keys touched per ``UPDATE`` by
+#: :func:`~helpfulfields.touching.touch`
+TOUCH_BATCH_SIZE = 500
+
+#: the maximum number of objects changed per ``UPDATE`` by
+#: :func:`~helpfulfields.admin.bulk_change`, and so by the admin actions.
+BULK_CHANGE_BATCH_SIZE = 500
+
 #: default number of items to show in the :class:`RelationList`
 MAX_NUM_RELATIONS = 3
+
+#: the number of rows above which
+#: :class:`~helpfulfields.admin.EstimatedCountPaginator` will use the
+#: database's estimate, rather than counting them.
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+#: the maximum number of relations counted per query by
+#: :func:`~helpfulfields.utils.counts_for_querysets`. `SQLite` refuses to
+#: ``UNION`` more than 500 queries together.
+COUNT_BATCH_SIZE = 500
+
+#: how many seconds rendered changelist rows are kept for by
+#: :func:`~helpfulfields.rowcache.cached_rows`
+ROW_CACHE_TIMEOUT = 86400
+
+#: the maximum number of objects updated per transaction by
+#: :meth:`~helpfulfields.querysets.DatePublishingQuerySet.sweep_live`
+LIVE_SWEEP_BATCH_SIZE = 500
+
+#: how many seconds the time of the last
+#: :meth:`~helpfulfields.querysets.DatePublishingQuerySet.sweep_live` is
+#: remembered for. Any sweep is good enough for
+#: :meth:`~helpfulfields.querysets.DatePublishingQuerySet.published` to
+#: use, so this may be long. The cache must be shared between the sweeper
+#: and the processes querying (eg: memcached, rather than local memory).
+LIVE_SWEPT_TIMEOUT = 2592000
+
+#: the most seconds :func:`~helpfulfields.publishedcache.published_pks`
+#: keeps a model's published primary keys for, if nothing is due to be
+#: published or unpublished sooner.
+PUBLISHED_PKS_TIMEOUT = 3600
+
+#: how many seconds :func:`~helpfulfields.publishedcache.published_pks`
+#: stops caching a model's published primary keys for, after one of its
+#: objects changes in a transaction which is still open, unless the
+#: transaction is a :class:`~helpfulfields.touching.deferred_touches` block,
+#: which lets caching resume as soon as it commits.
+PUBLISHED_PKS_UNCOMMITTED_TIMEOUT = 60
+
+#: the number of objects fetched per query by
+#: :class:`~helpfulfields.sitemaps.PublishedSitemap`, so that only this many
+#: are held in memory at once, however long the sitemap.
+SITEMAP_CHUNK_SIZE = 1000
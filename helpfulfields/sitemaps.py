@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+from django.contrib.sitemaps import Sitemap
+from django.core.exceptions import ImproperlyConfigured
+from django.core.paginator import Paginator, Page
+from helpfulfields.settings import SITEMAP_CHUNK_SIZE
+from helpfulfields.text import sitemap_unsupported
+
+
+class ChunkedObjects(object):
+    """
+    The objects on one page of a :class:`ChunkedPaginator`, fetched a chunk
+    at a time as they are iterated over, by primary key rather than by
+    offset, so that only one chunk is ever in memory.
+    """
+    def __init__(self, queryset, offset, length, chunk_size):
+        """
+        :param queryset: the objects being paginated, ordered by primary key.
+        :param offset: how many objects come before this page.
+        :param length: the number of objects on this page.
+        :param chunk_size: the most objects to fetch per query.
+        """
+        self.queryset = queryset
+        self.offset = offset
+        self.length = length
+        self.chunk_size = chunk_size
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        remaining = self.length
+        if remaining < 1:
+            return
+        queryset = self.queryset
+        if self.offset:
+            # the only query which skips rows by offset; the chunks which
+            # follow start from the last primary key seen instead.
+            first = list(queryset.values_list('pk', flat=True)[
+                self.offset:self.offset + 1])
+            if not first:
+                return
+            queryset = queryset.filter(pk__gte=first[0])
+        while remaining > 0:
+            size = min(self.chunk_size, remaining)
+            last = None
+            found = 0
+            for obj in queryset[:size].iterator():
+                last = obj.pk
+                found += 1
+                yield obj
+            remaining -= found
+            if found < size:
+                return
+            queryset = self.queryset.filter(pk__gt=last)
+
+
+class ChunkedPaginator(Paginator):
+    """
+    A :class:`~django.core.paginator.Paginator` for querysets ordered by
+    primary key, whose pages fetch their objects in chunks as they are
+    iterated over (see :class:`ChunkedObjects`), rather than all at once.
+
+    :test case: :class:`helpfulfields.tests.PublishedSitemapTestCase`
+    """
+    def __init__(self, object_list, per_page, chunk_size=SITEMAP_CHUNK_SIZE,
+                 **kwargs):
+        """
+        :param chunk_size: the most objects to fetch per query.
+        """
+        super(ChunkedPaginator, self).__init__(object_list, per_page, **kwargs)
+        self.chunk_size = chunk_size
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        objects = ChunkedObjects(self.object_list, bottom,
+                                 max(0, top - bottom), self.chunk_size)
+        return Page(objects, number, self)
+
+
+class PublishedSitemap(Sitemap):
+    """
+    A :class:`~django.contrib.sitemaps.Sitemap` of the published objects of a
+    model using :class:`~helpfulfields.models.Publishing` or
+    :class:`~helpfulfields.models.DatePublishing`, whose default manager
+    provides ``published()``::
+
+        class ArticleSitemap(PublishedSitemap):
+            model = Article
+            url_fields = ('slug',)
+
+            def location(self, obj):
+                return reverse('article', kwargs={'slug': obj.slug})
+
+        sitemaps = {'articles': ArticleSitemap}
+
+    Only the primary key, the :attr:`url_fields` and, for models using
+    :class:`~helpfulfields.models.ChangeTracking`, the
+    :attr:`~helpfulfields.models.ChangeTracking.modified` date (which is
+    used as the ``lastmod``) are selected. Each page of the sitemap is
+    fetched :attr:`chunk_size` objects at a time, and the objects are not
+    kept once their URL is known, so memory use is bounded by
+    :attr:`~django.contrib.sitemaps.Sitemap.limit` no matter how many objects
+    there are; the sitemap index splits them into pages of that many, as
+    usual.
+
+    :test case: :class:`helpfulfields.tests.PublishedSitemapTestCase`
+    """
+    #: the model whose published objects are listed.
+    model = None
+
+    #: the fields needed by :meth:`location`, beyond the primary key.
+    url_fields = ()
+
+    #: the most objects to fetch per query; defaults to
+    #: :data:`~helpfulfields.settings.SITEMAP_CHUNK_SIZE`
+    chunk_size = SITEMAP_CHUNK_SIZE
+
+    def has_modified(self):
+        """
+        :return: whether the model has a
+                 :attr:`~helpfulfields.models.ChangeTracking.modified` date.
+        :rtype: boolean
+        """
+        from helpfulfields.models import ChangeTracking
+        return issubclass(self.model, ChangeTracking)
+
+    def items(self):
+        """
+        :return: the published objects, with only the fields needed
+                 selected, ordered by primary key.
+        :rtype: :class:`~django.db.models.query.QuerySet`
+        """
+        queryset = None
+        if self.model is not None:
+            queryset = self.model._default_manager.get_query_set()
+        assert hasattr(queryset, 'published'), sitemap_unsupported % {
+            'sitemap': self.__class__.__name__,
+        }
+        fields = [self.model._meta.pk.name] + list(self.url_fields)
+        if self.has_modified():
+            fields.append('modified')
+        return queryset.published().only(*fields).order_by('pk')
+
+    def lastmod(self, obj):
+        if self.has_modified():
+            return obj.modified
+        return None
+
+    def _get_paginator(self):
+        return ChunkedPaginator(self.items(), self.limit,
+                                chunk_size=self.chunk_size)
+    paginator = property(_get_paginator)
+
+    def get_site(self, site=None):
+        """
+        :return: the site given, or the current
+                 :class:`~django.contrib.sites.models.Site`
+        """
+        if site is not None:
+            return site
+        from django.contrib.sites.models import Site
+        if Site._meta.installed:
+            try:
+                return Site.objects.get_current()
+            except Site.DoesNotExist:
+                pass
+        raise ImproperlyConfigured('To use sitemaps, either enable the sites '
+                                   'framework or pass a Site/RequestSite '
+                                   'object in your view.')
+
+    def get_urls(self, page=1, site=None, protocol=None):
+        """
+        As :meth:`~django.contrib.sitemaps.Sitemap.get_urls`, except that
+        the objects aren't kept in the returned dictionaries, so each chunk
+        may be freed once its URLs are known.
+        """
+        protocol = self.protocol or protocol or 'http'
+        domain = self.get_site(site).domain
+        changefreq = getattr(self, 'changefreq', None)
+        priority = getattr(self, 'priority', None)
+        urls = []
+        for obj in self.paginator.page(page).object_list:
+            obj_priority = priority(obj) if callable(priority) else priority
+            urls.append({
+                'location': '%s://%s%s' % (protocol, domain,
+                                           self.location(obj)),
+                'lastmod': self.lastmod(obj),
+                'changefreq': (changefreq(obj) if callable(changefreq)
+                               else changefreq),
+                'priority': str(obj_priority is not None and obj_priority
+                                or ''),
+            })
+        return urls
@@ -0,0 +1,53 @@
+/* fills in the placeholders left by helpfulfields.admin.DeferredColumn,
+   using a single request to helpfulfields.admin.DeferredColumnsAdminMixin */
+(function () {
+    'use strict';
+
+    function fill(placeholders, cells) {
+        var i, placeholder, row, name;
+        for (i = 0; i < placeholders.length; i++) {
+            placeholder = placeholders[i];
+            row = cells[placeholder.getAttribute('data-pk')];
+            name = placeholder.getAttribute('data-column');
+            if (row && row.hasOwnProperty(name)) {
+                placeholder.innerHTML = row[name];
+            } else {
+                placeholder.innerHTML = '';
+            }
+        }
+    }
+
+    function load() {
+        var placeholders = document.querySelectorAll('.changelist-deferred'),
+            seen = {},
+            params = [],
+            request,
+            pk,
+            i;
+        if (!placeholders.length) {
+            return;
+        }
+        for (i = 0; i < placeholders.length; i++) {
+            pk = placeholders[i].getAttribute('data-pk');
+            if (!seen.hasOwnProperty(pk)) {
+                seen[pk] = true;
+                params.push('pk=' + encodeURIComponent(pk));
+            }
+        }
+        request = new XMLHttpRequest();
+        // relative to the changelist, beneath which the endpoint lives.
+        request.open('GET', 'deferred-columns/?' + params.join('&'), true);
+        request.onreadystatechange = function () {
+            if (request.readyState === 4 && request.status === 200) {
+                fill(placeholders, JSON.parse(request.responseText));
+            }
+        };
+        request.send(null);
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', load, false);
+    } else {
+        load();
+    }
+}());
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import subprocess
+import sys
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.test.client import RequestFactory
+
+#: the changelist page sizes checked by
+#: :meth:`QueryScalingTestMixin.assertChangelistQueriesConstant`
+PAGE_SIZES = (10, 100, 500)
+
+#: the modules imported by :func:`import_cost` before timing anything, as
+#: any project using the admin helpers will already have paid for them.
+IMPORT_BASELINE = ('django.db.models', 'django.contrib.admin')
+
+# run by import_cost() in a new interpreter, which can't be asked to time
+# its imports with -X importtime on Python 2.
+IMPORT_COST_SCRIPT = '''
+import json, sys, time
+for name in sys.argv[2:]:
+    __import__(name)
+before = set(k for k, v in sys.modules.items() if v is not None)
+began = time.time()
+__import__(sys.argv[1])
+taken = time.time() - began
+after = set(k for k, v in sys.modules.items() if v is not None)
+json.dump({'seconds': taken, 'modules': sorted(after - before)}, sys.stdout)
+'''
+
+
+class CountQueries(object):
+    """
+    Counts the queries executed within a block::
+
+        with CountQueries() as counter:
+            list(MyModel.objects.all())
+        assert counter.count == 1
+    """
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        """
+        :param using: the db router to use.
+        """
+        self.connection = connections[using]
+        self.count = 0
+
+    def __enter__(self):
+        self.old_debug_cursor = self.connection.use_debug_cursor
+        self.connection.use_debug_cursor = True
+        self.starting = len(self.connection.queries)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.use_debug_cursor = self.old_debug_cursor
+        self.count = len(self.connection.queries) - self.starting
+
+
+def import_cost(name, baseline=IMPORT_BASELINE):
+    """
+    Imports a module in a new interpreter, with the same path and settings
+    as this one, to find out what importing it costs.
+
+    :param name: the dotted name of the module.
+    :param baseline: the modules to import, untimed, beforehand.
+    :return: how long the import took, in seconds, and the names of the
+             modules it imported.
+    :rtype: tuple of float and list
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([path for path in sys.path if path])
+    env['DJANGO_SETTINGS_MODULE'] = settings.SETTINGS_MODULE
+    process = subprocess.Popen(
+        [sys.executable, '-c', IMPORT_COST_SCRIPT, name] + list(baseline),
+        stdout=subprocess.PIPE, env=env)
+    output = process.communicate()[0]
+    if process.returncode:
+        raise ImportError('importing %s failed' % name)
+    result = json.loads(output)
+    return result['seconds'], result['modules']
+
+
+def render_changelist(model_admin, user, page_size=None, params=None):
+    """
+    Requests and fully renders a
+    :meth:`~django.contrib.admin.ModelAdmin.changelist_view`, which calls
+    every :attr:`~django.contrib.admin.ModelAdmin.list_display` column for
+    every row on the page.
+
+    :param model_admin: a :class:`~django.contrib.admin.ModelAdmin` for a
+                        model mounted on an admin site in the urlconf.
+    :param user: who to make the request as.
+    :param page_size: the
+                      :attr:`~django.contrib.admin.ModelAdmin.list_per_page`
+                      to use for this request only.
+    :param params: the optional querystring parameters, as a dictionary.
+    :return: the rendered response.
+    :rtype: :class:`~django.template.response.TemplateResponse`
+    """
+    request = RequestFactory().get('/', params or {})
+    request.user = user
+    original = model_admin.list_per_page
+    if page_size is not None:
+        model_admin.list_per_page = page_size
+    try:
+        response = model_admin.changelist_view(request)
+        response.render()
+    finally:
+        model_admin.list_per_page = original
+    return response
+
+
+def changelist_query_counts(model_admin, user, page_sizes=PAGE_SIZES,
+                            params=None, using=DEFAULT_DB_ALIAS):
+    """
+    Counts the queries needed to render a changelist at each of the given
+    page sizes. The changelist is rendered once beforehand, so that caches
+    such as that of :class:`~django.contrib.contenttypes.models.ContentType`
+    are warm, and don't make the first page size look more expensive.
+
+    :param model_admin: see :func:`render_changelist`
+    :param user: see :func:`render_changelist`
+    :param page_sizes: the page sizes to count queries for.
+    :param params: see :func:`render_changelist`
+    :param using: the db router to use.
+    :return: a mapping of each page size to the number of queries.
+    :rtype: dictionary
+    """
+    render_changelist(model_admin, user, page_size=min(page_sizes),
+                      params=params)
+    counts = {}
+    for page_size in page_sizes:
+        with CountQueries(using=using) as counter:
+            render_changelist(model_admin, user, page_size=page_size,
+                              params=params)
+        counts[page_size] = counter.count
+    return counts
+
+
+class QueryScalingTestMixin(object):
+    """
+    A mixin for :class:`~django.test.TestCase` which checks that the number
+    of queries a changelist needs doesn't grow with the number of rows on
+    the page, as happens when a column runs a query per object, and may be
+    used by any project on its own
+    :class:`~django.contrib.admin.ModelAdmin` instances::
+
+        class MyAdminTestCase(QueryScalingTestMixin, TestCase):
+            def test_changelist(self):
+                # create at least 500 objects here, then ...
+                self.assertChangelistQueriesConstant(
+                    admin.site._registry[MyModel], superuser)
+
+    There must be at least as many objects as the largest page size, else
+    every page would be the same size anyway.
+
+    :test case: :class:`helpfulfields.tests.QueryScalingTestCase`
+    """
+    #: the page sizes to render the changelist at.
+    scaling_page_sizes = PAGE_SIZES
+
+    def assertChangelistQueriesConstant(self, model_admin, user,
+                                        page_sizes=None, params=None,
+                                        using=DEFAULT_DB_ALIAS):
+        """
+        Fails if rendering the changelist at larger page sizes takes more
+        queries than at the smallest.
+
+        :param model_admin: see :func:`render_changelist`
+        :param user: see :func:`render_changelist`
+        :param page_sizes: defaults to :attr:`scaling_page_sizes`
+        :param params: see :func:`render_changelist`
+        :param using: the db router to use.
+        :return: the number of queries at each page size.
+        :rtype: dictionary
+        """
+        page_sizes = sorted(page_sizes or self.scaling_page_sizes)
+        counts = changelist_query_counts(model_admin, user,
+                                         page_sizes=page_sizes, params=params,
+                                         using=using)
+        if len(set(counts.values())) > 1:
+            self.fail('%s changelist queries grow with the page size: %s' % (
+                model_admin.__class__.__name__,
+                ', '.join(['%d rows: %d queries' % (size, counts[size])
+                           for size in page_sizes])))
+        return counts
@@ -1,24 +1,70 @@
 # -*- coding: utf-8 -*-
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+import json
+from random import Random
+from StringIO import StringIO
 from uuid import uuid4
+from django.conf.urls import patterns, url, include
 from django.contrib import admin
 from django.contrib.admin.models import LogEntry
 from django.contrib.admin.util import flatten_fieldsets
 from django.contrib.auth.models import User, Group
 from django.contrib.contenttypes.models import ContentType
-from django.test import TestCase as DjangoTestCase
+from django.contrib.sites.models import RequestSite
+from django.core import serializers
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.paginator import EmptyPage
+from django.db import models, connection, DEFAULT_DB_ALIAS
+from django.db.models import F, ProtectedError
+from django.db.models.signals import post_save
+from django.test import TestCase as DjangoTestCase, TransactionTestCase
+from django.test.client import RequestFactory
 from django.utils.encoding import force_unicode
 from django.utils.unittest import TestCase as UnitTestCase
-from helpfulfields.admin import (ViewOnSite, LogEntrySparkline, RelationCount,
-                                 RelationList, changetracking_fieldset,
+from helpfulfields.admin import (ViewOnSite, LogEntrySparkline,
+                                 RelationSparkline, RelationCount,
+                                 RelationList,
+                                 changetracking_fieldset,
                                  titles_fieldset, publishing_fieldset,
-                                 date_publishing_fieldset, seo_fieldset)
+                                 date_publishing_fieldset, seo_fieldset,
+                                 PublishingListFilter,
+                                 DatePublishingListFilter,
+                                 SoftDeleteListFilter, EstimatedCountPaginator,
+                                 EstimatedCountAdminMixin, publish_selected,
+                                 unpublish_selected, soft_delete_selected,
+                                 restore_selected, PreparedColumnsAdminMixin,
+                                 DeferredColumn, DeferredColumnsAdminMixin,
+                                 CachedColumnsAdminMixin, Sparkline)
+from helpfulfields.checks import (check_model_admin, check_admin_site,
+                                  relation_index_field, PER_ROW_QUERIES,
+                                  UNINDEXED_ACCESSOR, UNBOUNDED_RELATION_LIST)
+from helpfulfields.deletion import purgeable, purge_in_batches
+from helpfulfields.management.commands.audit_query_plans import (
+    Command as AuditQueryPlansCommand)
 from helpfulfields.models import (ChangeTracking, Titles, SEO, Publishing,
-                                  DatePublishing)
-from helpfulfields.querysets import (ChangeTrackingQuerySet, PublishingQuerySet,
-                                     DatePublishingQuerySet)
+                                  DatePublishing, LiveDatePublishing,
+                                  SoftDelete)
+from helpfulfields.querysets import (ChangeTrackingQuerySet,
+                                     PublishingQuerySet,
+                                     DatePublishingQuerySet,
+                                     SoftDeleteQuerySet, live_swept_key)
+from helpfulfields.intervals import PublicationIndex
+from helpfulfields.publishedcache import (PublishedPks, published_pks,
+                                          is_published_pk, find_published_pks,
+                                          published_pks_key, UNCOMMITTED)
+import helpfulfields.publishedcache
+from helpfulfields.rowcache import logentry_object_pks, column_signature
+from helpfulfields.sitemaps import PublishedSitemap
 from helpfulfields.settings import RECENTLY_MINUTES, MAX_NUM_RELATIONS
+from helpfulfields.testing import QueryScalingTestMixin, import_cost
 from helpfulfields.text import logentry_empty
+from helpfulfields.touching import deferred_touches
+from helpfulfields.utils import (ROW_ESTIMATORS, estimated_row_count,
+                                 counts_by_day, query_plan, FULL_SCAN,
+                                 TEMPORARY_SORT, stamp_modified)
 from model_utils.managers import PassThroughManager
 
 
@@ -42,6 +88,69 @@ class TestModelDates(Titles, DatePublishing):
     objects = PassThroughManager.for_queryset_class(DatePublishingQuerySet)()
 
 
+class TestModelLive(Titles, LiveDatePublishing):
+    objects = PassThroughManager.for_queryset_class(DatePublishingQuerySet)()
+
+
+class TestModelDirtyFields(ChangeTracking, Titles):
+    track_dirty_fields = True
+
+
+class TestTouchParent(ChangeTracking, Titles):
+    objects = PassThroughManager.for_queryset_class(ChangeTrackingQuerySet)()
+
+
+class TestTouchChild(ChangeTracking):
+    parent = models.ForeignKey(TestTouchParent, related_name='children')
+    touch_parents = ('parent',)
+    objects = PassThroughManager.for_queryset_class(ChangeTrackingQuerySet)()
+
+
+class TestTouchGrandchild(ChangeTracking):
+    child = models.ForeignKey(TestTouchChild, related_name='children')
+    touch_parents = ('child',)
+
+
+class TestUnindexedChild(models.Model):
+    parent = models.ForeignKey(TestTouchParent, related_name='unindexed',
+                               db_index=False)
+
+
+class TestSoftDeleteCategory(SoftDelete):
+    parent = models.ForeignKey('self', null=True, related_name='children')
+    objects = PassThroughManager.for_queryset_class(SoftDeleteQuerySet)()
+
+
+class TestSoftDeleteItem(SoftDelete):
+    category = models.ForeignKey(TestSoftDeleteCategory, related_name='items')
+    objects = PassThroughManager.for_queryset_class(SoftDeleteQuerySet)()
+
+
+class TestSoftDeleteNote(models.Model):
+    item = models.ForeignKey(TestSoftDeleteItem, related_name='notes')
+
+
+class TestSoftDeleteTracked(ChangeTracking, Titles, SoftDelete):
+    objects = PassThroughManager.for_queryset_class(SoftDeleteQuerySet)()
+
+
+class TestSoftDeleteArchive(models.Model):
+    title = models.CharField(max_length=255)
+    modified = models.DateTimeField()
+
+
+# mounted at the urlconf below, for QueryScalingTestCase to render
+# changelists with.
+scaling_site = admin.AdminSite(name='scaling')
+scaling_site.register(TestTouchParent)
+scaling_site.register(TestTouchChild)
+
+urlpatterns = patterns(
+    '',
+    url(r'^scaling/', include(scaling_site.urls)),
+)
+
+
 class ChangeTrackingTestCase(DjangoTestCase):
     """
     Should verify all the methods and attributes provided by something
@@ -104,6 +213,120 @@ class ChangeTrackingTestCase(DjangoTestCase):
 
             self.assertIsNone(obj.delete())
 
+    def test_update_touches_modified(self):
+        old_date = datetime.now() - timedelta(days=1)
+        obj = TestModel.objects.create(title='update_touches_modified')
+        TestModel.objects.filter(pk=obj.pk).update(modified=old_date)
+        self.assertEqual([], list(TestModel.objects.modified_recently()))
+
+        TestModel.objects.filter(pk=obj.pk).update(menu_title='changed',
+                                                   touch_modified=False)
+        self.assertEqual([], list(TestModel.objects.modified_recently()))
+
+        with self.assertNumQueries(1):
+            TestModel.changes.filter(pk=obj.pk).update(menu_title='again')
+        self.assertEqual([obj], list(TestModel.objects.modified_recently()))
+
+    def test_stamp_modified(self):
+        when = datetime(2013, 1, 1)
+        self.assertEqual({'title': u'x', 'modified': when},
+                         stamp_modified(TestModel, {'title': u'x'}, now=when))
+        self.assertEqual({'modified': when},
+                         stamp_modified(TestModel, {'modified': when}))
+        self.assertEqual({'title': u'x'},
+                         stamp_modified(TestModelDates, {'title': u'x'}))
+
+    def test_skip_unchanged_saves(self):
+        obj = TestModelDirtyFields.objects.create(title='dirty_fields')
+        old_date = datetime.now() - timedelta(days=1)
+        TestModelDirtyFields.objects.filter(pk=obj.pk).update(
+            modified=old_date)
+
+        obj = TestModelDirtyFields.objects.get(pk=obj.pk)
+        self.assertEqual([], obj.dirty_fields())
+        with self.assertNumQueries(0):
+            obj.save()
+        self.assertFalse(obj.modified_recently())
+
+        obj.menu_title = 'changed'
+        self.assertEqual(['menu_title'], obj.dirty_fields())
+        obj.save()
+        self.assertEqual([], obj.dirty_fields())
+        obj = TestModelDirtyFields.objects.get(pk=obj.pk)
+        self.assertEqual('changed', obj.menu_title)
+        self.assertTrue(obj.modified_recently())
+
+        # copying to another database is a change, even if nothing else is.
+        obj = TestModelDirtyFields.objects.get(pk=obj.pk)
+        obj.save(using='other')
+        try:
+            copied = TestModelDirtyFields.objects.using('other').get(pk=obj.pk)
+            self.assertEqual('changed', copied.menu_title)
+            self.assertEqual('other', obj._state.db)
+        finally:
+            TestModelDirtyFields.objects.using('other').all().delete()
+
+        # deferred fields are ignored, rather than each costing a query.
+        obj = TestModelDirtyFields.objects.only('title').get(pk=obj.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual([], obj.dirty_fields())
+
+    def test_recency_buckets(self):
+        now = datetime.now()
+        ages = {
+            'hour': timedelta(minutes=5),
+            'day': timedelta(hours=3),
+            'week': timedelta(days=2),
+            'older': timedelta(days=30),
+        }
+        expected = {}
+        for bucket, age in ages.items():
+            obj = TestModel.objects.create(title=bucket)
+            TestModel.objects.filter(pk=obj.pk).update(modified=now - age)
+            expected[obj.pk] = bucket
+        objs = TestModel.objects.annotate_recency(now=now)
+        found = dict((x.pk, x.recency) for x in objs)
+        self.assertEqual(expected, found)
+
+        counts = TestModel.changes.recency_counts(now=now)
+        self.assertEqual(counts, {'hour': 1, 'day': 1, 'week': 1, 'older': 1})
+        counts = TestModel.changes.filter(title='day').recency_counts(now=now)
+        self.assertEqual(counts, {'hour': 0, 'day': 1, 'week': 0, 'older': 0})
+
+
+class TouchParentsTestCase(DjangoTestCase):
+    def setUp(self):
+        self.parent = TestTouchParent.objects.create(title='touch_parent')
+        self.children = [TestTouchChild.objects.create(parent=self.parent)
+                         for x in range(0, 5)]
+        self.old_date = datetime.now() - timedelta(days=1)
+        TestTouchParent.objects.update(modified=self.old_date)
+        TestTouchChild.objects.update(modified=self.old_date)
+
+    def test_immediately(self):
+        TestTouchGrandchild.objects.create(child=self.children[0])
+        parents = TestTouchParent.objects.modified_recently()
+        children = TestTouchChild.objects.modified_recently()
+        self.assertEqual([self.parent], list(parents))
+        self.assertEqual([self.children[0]], list(children))
+
+    def test_deferred(self):
+        # 5 saves of 2 queries each, then 1 UPDATE for the parent.
+        with self.assertNumQueries(11):
+            with deferred_touches():
+                for child in self.children:
+                    child.save()
+        parents = TestTouchParent.objects.modified_recently()
+        self.assertEqual([self.parent], list(parents))
+
+    def test_deferred_decorator_discards_on_error(self):
+        @deferred_touches()
+        def broken():
+            self.children[0].delete()
+            raise ValueError('broken')
+        self.assertRaises(ValueError, broken)
+        self.assertEqual([], list(TestTouchParent.objects.modified_recently()))
+
 
 class PublishingTestCase(DjangoTestCase):
 
@@ -204,6 +427,169 @@ class DatePublishingTestCase(DjangoTestCase):
         self.assertLess(obj.publish_on, datetime.now())
         self.assertIsNone(obj.unpublish_on)
 
+    def test_annotate_publication_state(self):
+        now = datetime.now()
+        scheduled = TestModelDates.objects.create(
+            title='date_publishing_scheduled',
+            publish_on=now + timedelta(days=1))
+        published = TestModelDates.objects.create(
+            title='date_publishing_published',
+            publish_on=now - timedelta(days=1),
+            unpublish_on=now + timedelta(days=1))
+        expired = TestModelDates.objects.create(
+            title='date_publishing_expired',
+            publish_on=now - timedelta(days=2),
+            unpublish_on=now - timedelta(days=1))
+        objs = TestModelDates.objects.annotate_publication_state(now=now)
+        states = dict((x.pk, x.publication_state) for x in objs)
+        self.assertEqual(states, {
+            scheduled.pk: u'scheduled',
+            published.pk: u'published',
+            expired.pk: u'expired',
+        })
+
+        # the annotation wins over the current time ...
+        later = now + timedelta(days=3)
+        objs = TestModelDates.objects.annotate_publication_state(now=later)
+        obj = objs.get(pk=scheduled.pk)
+        self.assertTrue(obj.is_published)
+        # ... until the object is changed via the property.
+        obj.is_published = False
+        self.assertFalse(obj.is_published)
+
+
+class SoftDeleteCascadeTestCase(DjangoTestCase):
+    def setUp(self):
+        self.root = TestSoftDeleteCategory.objects.create()
+        self.child = TestSoftDeleteCategory.objects.create(parent=self.root)
+        self.grandchild = TestSoftDeleteCategory.objects.create(
+            parent=self.child)
+        self.other = TestSoftDeleteCategory.objects.create()
+        for category in (self.root, self.grandchild, self.other):
+            for x in range(0, 5):
+                item = TestSoftDeleteItem.objects.create(category=category)
+        self.note = TestSoftDeleteNote.objects.create(item=item)
+
+    def test_without_cascade(self):
+        self.root.delete()
+        self.assertEqual(1, TestSoftDeleteCategory.objects.deleted().count())
+        self.assertEqual(0, TestSoftDeleteItem.objects.deleted().count())
+
+    def test_cascade(self):
+        self.root.delete(cascade=True)
+        deleted = TestSoftDeleteCategory.objects.deleted()
+        self.assertEqual(
+            set([self.root.pk, self.child.pk, self.grandchild.pk]),
+            set(deleted.values_list('pk', flat=True)))
+        self.assertEqual(10, TestSoftDeleteItem.objects.deleted().count())
+        self.assertEqual(5, TestSoftDeleteItem.objects.filter(
+            deleted__isnull=True).count())
+        self.assertTrue(self.root.deleted)
+        # the default policy leaves things alone.
+        self.assertEqual(1, TestSoftDeleteNote.objects.count())
+
+    def test_cascade_is_batched(self):
+        # 2 UPDATEs, 3 SELECTs to walk down the category tree.
+        with self.assertNumQueries(5):
+            self.root.delete(cascade=True)
+
+    def test_cascade_policies(self):
+        self.assertRaises(ProtectedError,
+                          lambda: self.other.delete(cascade=True,
+                                                    policy='protect'))
+        self.assertEqual(0, TestSoftDeleteCategory.objects.deleted().count())
+        # the refused object doesn't claim to be deleted.
+        self.assertFalse(self.other.deleted)
+        self.other.delete(cascade=True, policy='delete')
+        self.assertTrue(self.other.deleted)
+        self.assertEqual(0, TestSoftDeleteNote.objects.count())
+        self.assertEqual(5, TestSoftDeleteItem.objects.deleted().count())
+        tracked = TestSoftDeleteTracked.objects.create(title='cascade')
+        TestSoftDeleteTracked.objects.filter(pk=tracked.pk).update(
+            modified=datetime.now() - timedelta(days=1))
+        tracked.delete(cascade=True)
+        self.assertEqual(TestSoftDeleteTracked.objects.get(pk=tracked.pk)
+                         .modified, tracked.modified)
+        self.assertEqual([tracked], list(purgeable(TestSoftDeleteTracked)))
+        self.assertEqual([], list(purgeable(TestSoftDeleteTracked, days=1)))
+        self.assertRaises(AssertionError, self.root.delete, cascade=True,
+                          policy='nope')
+
+
+class PurgeSoftDeletedTestCase(DjangoTestCase):
+    def setUp(self):
+        old_date = datetime.now() - timedelta(days=10)
+        for x in range(0, 7):
+            obj = TestSoftDeleteTracked.objects.create(title=str(x))
+            obj.delete()
+        self.kept = TestSoftDeleteTracked.objects.create(title='kept')
+        TestSoftDeleteTracked.objects.filter(
+            title__in=['0', '1', '2', '3', '4']).update(modified=old_date)
+
+    def test_purge_in_batches(self):
+        objs = purgeable(TestSoftDeleteTracked, days=5)
+        batches = list(purge_in_batches(objs, batch_size=2))
+        self.assertEqual([2, 2, 1], [count for last_pk, count, skipped
+                                     in batches])
+        # recently deleted and undeleted objects remain.
+        self.assertEqual(3, TestSoftDeleteTracked.objects.count())
+        # resuming after the last batch finds nothing.
+        objs = purgeable(TestSoftDeleteTracked, days=5)
+        self.assertEqual([], list(purge_in_batches(
+            objs, start_after=batches[-1][0])))
+
+    def test_command_with_archive(self):
+        call_command('purge_soft_deleted',
+                     'helpfulfields.TestSoftDeleteTracked',
+                     days=0, batch_size=3,
+                     archive='helpfulfields.TestSoftDeleteArchive',
+                     verbosity=0)
+        self.assertEqual([self.kept.pk], list(
+            TestSoftDeleteTracked.objects.values_list('pk', flat=True)))
+        archived = TestSoftDeleteArchive.objects.order_by('pk')
+        self.assertEqual([str(x) for x in range(0, 7)],
+                         list(archived.values_list('title', flat=True)))
+
+    def test_live_dependants(self):
+        parent = TestSoftDeleteCategory.objects.create()
+        child = TestSoftDeleteCategory.objects.create(parent=parent)
+        item = TestSoftDeleteItem.objects.create(category=child)
+        empty = TestSoftDeleteCategory.objects.create()
+        deleted_item = TestSoftDeleteItem.objects.create(category=empty)
+        TestSoftDeleteNote.objects.create(item=deleted_item)
+        deleted_item.delete()
+        # without cascading, the child category and item stay live.
+        parent.delete()
+        empty.delete()
+        batches = list(purge_in_batches(purgeable(TestSoftDeleteCategory)))
+        self.assertEqual([(empty.pk, 1, [parent.pk])], batches)
+        manager = TestSoftDeleteCategory._base_manager
+        self.assertEqual([parent.pk, child.pk], sorted(
+            manager.values_list('pk', flat=True)))
+        self.assertEqual([item.pk], list(
+            TestSoftDeleteItem._base_manager.values_list('pk', flat=True)))
+        self.assertEqual(0, TestSoftDeleteNote.objects.count())
+
+    def test_restored_meanwhile(self):
+        restored = TestSoftDeleteTracked.objects.get(title='0')
+
+        class RestoringQuerySet(SoftDeleteQuerySet):
+            # restores an object once the batch has been chosen, as though
+            # done by another process.
+            def values_list(self, *fields, **kwargs):
+                pks = list(super(RestoringQuerySet, self).values_list(
+                    *fields, **kwargs))
+                TestSoftDeleteTracked._base_manager.filter(
+                    pk=restored.pk).update(deleted=False)
+                return pks
+
+        objs = RestoringQuerySet(model=TestSoftDeleteTracked).filter(
+            deleted=True)
+        batches = list(purge_in_batches(objs, batch_size=10))
+        self.assertEqual([6], [count for last_pk, count, skipped in batches])
+        self.assertEqual([restored.pk, self.kept.pk], sorted(
+            TestSoftDeleteTracked.objects.values_list('pk', flat=True)))
+
 
 class TitlesTestCase(DjangoTestCase):
 
@@ -307,6 +693,63 @@ class SparklineTestCase(DjangoTestCase):
         spark = LogEntrySparkline()
         self.assertEqual(2377, len(spark(obj).strip()))
 
+    def test_compact_renderers(self):
+        obj = TestModel(title=u'view_on_site_obj')
+        obj.save()
+        ct = ContentType.objects.get_for_model(obj)
+        user = User.objects.create(username=str(uuid4()))
+        for day_distance in range(0, 10):
+            LogEntry.objects.create(content_type=ct, object_id=obj.pk,
+                                    user=user, action_flag=2)
+        # action_time is set automatically on save.
+        entry = LogEntry.objects.create(content_type=ct, object_id=obj.pk,
+                                        user=user, action_flag=2)
+        LogEntry.objects.filter(pk=entry.pk).update(
+            action_time=datetime.now() - timedelta(days=1))
+        svg = LogEntrySparkline(days=365, renderer='svg')(obj)
+        self.assertTrue(svg.startswith(u'<svg '))
+        self.assertTrue(svg.endswith(u'363,9 364,0"/></svg>'))
+        self.assertEqual(1, svg.count(u'<polyline'))
+        text = LogEntrySparkline(days=3, renderer='text')(obj)
+        self.assertEqual(u'<span class="changelist-sparkline-text">'
+                         u'\u2581\u2582\u2588</span>', text)
+        self.assertRaises(AssertionError,
+                          lambda: LogEntrySparkline(renderer='nope'))
+
+    def test_counted_by_database(self):
+        obj = TestModel(title=u'view_on_site_obj')
+        obj.save()
+        ct = ContentType.objects.get_for_model(obj)
+        user = User.objects.create(username=str(uuid4()))
+        for day_distance in range(0, 20):
+            LogEntry.objects.create(content_type=ct, object_id=obj.pk,
+                                    user=user, action_flag=2)
+        spark = LogEntrySparkline(days=3, renderer='text')
+        # just the grouped count, as the ContentType is cached.
+        with self.assertNumQueries(1):
+            spark(obj)
+        by_day = counts_by_day(LogEntry.objects.all(), 'action_time')
+        self.assertEqual({datetime.now().date(): 20}, by_day)
+
+    def test_relation_sparkline(self):
+        parent = TestTouchParent.objects.create(title=u'parent')
+        other = TestTouchParent.objects.create(title=u'other')
+        for x in range(0, 4):
+            TestTouchChild.objects.create(parent=parent)
+        TestTouchChild.objects.create(parent=other)
+        old = TestTouchChild.objects.create(parent=parent)
+        TestTouchChild.objects.filter(pk=old.pk).update(
+            created=datetime.now() - timedelta(days=2))
+        spark = RelationSparkline('children', 'new children', days=3,
+                                  renderer='text')
+        self.assertEqual(u'<span class="changelist-sparkline-text">'
+                         u'\u2583\u2581\u2588</span>', spark(parent))
+        self.assertEqual(u'new children', spark.short_description)
+        by_modified = RelationSparkline('children', 'changed children',
+                                        field='modified')
+        self.assertEqual('modified', by_modified.field)
+        self.assertEqual('created', spark.field)
+
     def test_calling_empty(self):
         obj = TestModel(title=u'view_on_site_obj')
         obj.save()
@@ -328,6 +771,38 @@ class RelationCountTestCase(DjangoTestCase):
         self.assertEqual(counter._relcount, 3)
         self.assertEqual(force_unicode(counter._vname[0]), u'user')
 
+    def test_capped(self):
+        user = User.objects.create(username=str(uuid4()))
+        for x in range(1, 6):
+            g = Group.objects.create(name=str(x))
+            user.groups.add(g)
+        counter = RelationCount(accessor='groups', label='test', cap=3)
+        self.assertTrue(counter(user).startswith(u'3+ '))
+        counter = RelationCount(accessor='groups', label='test', cap=5)
+        self.assertTrue(counter(user).startswith(u'5 '))
+
+    def test_prepared_for_page(self):
+        counter = RelationCount(accessor='groups', label='test', cap=2)
+
+        class UserAdmin(PreparedColumnsAdminMixin, admin.ModelAdmin):
+            list_display = ['username', counter]
+
+        groups = [Group.objects.create(name=str(x)) for x in range(0, 3)]
+        for x in range(0, 4):
+            user = User.objects.create(username=str(x))
+            for group in groups[:x]:
+                user.groups.add(group)
+        model_admin = UserAdmin(User, admin.AdminSite(name='prepared'))
+        request = RequestFactory().get('/')
+        ChangeList = model_admin.get_changelist(request)
+        # 1 count, 1 page of users, 1 for all the relation counts.
+        with self.assertNumQueries(3):
+            cl = ChangeList(request, User, model_admin.list_display,
+                            ['username'], [], None, [], False, 100, 200, (),
+                            model_admin)
+            found = [counter(obj)[:2] for obj in cl.result_list]
+        self.assertEqual([u'0 ', u'1 ', u'2 ', u'2+'], sorted(found))
+
 
 class RelationListTestCase(DjangoTestCase):
     def test_calling(self):
@@ -355,6 +830,1020 @@ class RelationListTestCase(DjangoTestCase):
         self.assertEqual(items._count, 11)
 
 
+class ListFilterTestCase(DjangoTestCase):
+    def changelist(self, model, list_filter, **params):
+        site = admin.AdminSite(name='list_filters')
+        model_admin = admin.ModelAdmin(model, site)
+        model_admin.list_filter = list_filter
+        model_admin.search_fields = ['title']
+        request = RequestFactory().get('/', params)
+        ChangeList = model_admin.get_changelist(request)
+        return ChangeList(request, model, ['pk'], ['pk'], list_filter, None,
+                          model_admin.search_fields, False,
+                          model_admin.list_per_page,
+                          model_admin.list_max_show_all, (), model_admin)
+
+    def displayed(self, cl):
+        spec = cl.filter_specs[0]
+        return [force_unicode(x['display']) for x in spec.choices(cl)]
+
+    def test_publishing(self):
+        for x in range(0, 3):
+            TestModel.objects.create(title='yes %d' % x, is_published=True)
+        TestModel.objects.create(title='no', is_published=False)
+        cl = self.changelist(TestModel, [PublishingListFilter], published='1')
+        self.assertEqual(3, cl.result_count)
+        # all the counts come from one query.
+        with self.assertNumQueries(1):
+            displayed = self.displayed(cl)
+        self.assertEqual([u'All (4)', u'published (3)', u'unpublished (1)'],
+                         displayed)
+        # other filters are taken into account.
+        cl = self.changelist(TestModel, [PublishingListFilter], q='yes')
+        self.assertEqual([u'All (3)', u'published (3)', u'unpublished (0)'],
+                         self.displayed(cl))
+
+    def test_date_publishing(self):
+        now = datetime.now()
+        TestModelDates.objects.create(title='scheduled',
+                                      publish_on=now + timedelta(days=1))
+        TestModelDates.objects.create(title='published',
+                                      publish_on=now - timedelta(days=1))
+        TestModelDates.objects.create(title='expired',
+                                      publish_on=now - timedelta(days=2),
+                                      unpublish_on=now - timedelta(days=1))
+        for state in ('scheduled', 'published', 'expired'):
+            cl = self.changelist(TestModelDates, [DatePublishingListFilter],
+                                 publication_state=state)
+            self.assertEqual([state], [x.title for x in cl.result_list])
+        self.assertEqual([u'All (3)', u'scheduled (1)', u'published (1)',
+                          u'expired (1)'], self.displayed(cl))
+
+    def test_soft_delete(self):
+        for x in range(0, 3):
+            TestSoftDeleteTracked.objects.create(title=str(x))
+        TestSoftDeleteTracked.objects.get(title='0').delete()
+        obj = TestSoftDeleteTracked.objects.get(title='1')
+        obj.delete()
+        obj.restore()
+        cl = self.changelist(TestSoftDeleteTracked, [SoftDeleteListFilter],
+                             soft_deleted='present')
+        self.assertEqual(set(['1', '2']),
+                         set(x.title for x in cl.result_list))
+        self.assertEqual([u'All (3)', u'not deleted (2)', u'restored (1)',
+                          u'deleted (1)'], self.displayed(cl))
+
+
+class EstimatedCountTestCase(DjangoTestCase):
+    def setUp(self):
+        for x in range(0, 8):
+            TestModel.objects.create(title=str(x), is_published=x > 3)
+        # pretend the database's statistics are out of date.
+        self.estimator = ROW_ESTIMATORS[connection.vendor]
+        ROW_ESTIMATORS[connection.vendor] = lambda cursor, table: 5
+
+    def tearDown(self):
+        ROW_ESTIMATORS[connection.vendor] = self.estimator
+
+    def test_paginator(self):
+        paginator = EstimatedCountPaginator(TestModel.objects.all(), 2)
+        paginator.threshold = 4
+        self.assertEqual(5, paginator.count)
+        self.assertTrue(paginator.approximate)
+        self.assertEqual(u'about 5', force_unicode(paginator.count))
+        self.assertEqual(3, paginator.num_pages)
+
+        # small numbers are counted.
+        paginator = EstimatedCountPaginator(TestModel.objects.all(), 2)
+        self.assertEqual(8, paginator.count)
+        self.assertFalse(paginator.approximate)
+
+        # as are filtered ones.
+        objs = TestModel.objects.published()
+        paginator = EstimatedCountPaginator(objs, 2)
+        paginator.threshold = 0
+        self.assertEqual(4, paginator.count)
+        self.assertFalse(paginator.approximate)
+
+    def test_changelist(self):
+        class Paginator(EstimatedCountPaginator):
+            threshold = 4
+
+        class TestModelAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
+            paginator = Paginator
+
+        model_admin = TestModelAdmin(TestModel, admin.AdminSite(name='counts'))
+        request = RequestFactory().get('/', {'is_published__exact': '1'})
+        ChangeList = model_admin.get_changelist(request)
+        # 1 exact count of the filtered objects, and 1 page of them; the
+        # unfiltered total is estimated.
+        with self.assertNumQueries(2):
+            cl = ChangeList(request, TestModel, ['pk'], ['pk'], [], None, [],
+                            False, 2, 200, (), model_admin)
+            list(cl.result_list)
+        self.assertEqual(4, cl.result_count)
+        self.assertEqual(u'about 5', force_unicode(cl.full_result_count))
+
+    def test_failed_estimate(self):
+        def estimator(cursor, table):
+            cursor.execute('SELECT nothing FROM helpfulfields_missing')
+        ROW_ESTIMATORS[connection.vendor] = estimator
+        self.assertEqual(None, estimated_row_count(TestModel.objects.all()))
+        # the failure doesn't spoil the queries after it.
+        self.assertEqual(8, TestModel.objects.count())
+
+
+class SQLiteRowEstimateTestCase(TransactionTestCase):
+    def test_estimate(self):
+        if connection.vendor != 'sqlite':
+            return None
+        objs = TestModel.objects.all()
+        self.assertIsNone(estimated_row_count(objs))
+        for x in range(0, 3):
+            TestModel.objects.create(title=str(x))
+        # ANALYZE commits, hence this being a TransactionTestCase.
+        connection.cursor().execute('ANALYZE')
+        self.assertEqual(3, estimated_row_count(objs))
+
+
+class BulkActionsTestCase(DjangoTestCase):
+    def run_action(self, model, action, queryset, **attrs):
+        model_admin = admin.ModelAdmin(model, admin.AdminSite(name='actions'))
+        for name, value in attrs.items():
+            setattr(model_admin, name, value)
+        messages = []
+        model_admin.message_user = lambda request, msg: messages.append(msg)
+        request = RequestFactory().post('/')
+        request.user = self.user
+        action(model_admin, request, queryset)
+        return messages
+
+    def setUp(self):
+        self.user = User.objects.create(username=str(uuid4()),
+                                        is_superuser=True)
+
+    def test_live_date_publishing(self):
+        TestModelLive.objects.create(publish_on=datetime.now())
+        TestModelLive.objects.create(
+            publish_on=datetime.now() + timedelta(hours=1))
+        self.run_action(TestModelLive, publish_selected,
+                        TestModelLive.objects.all())
+        self.assertEqual(2, TestModelLive.objects.filter(is_live=True).count())
+        self.run_action(TestModelLive, unpublish_selected,
+                        TestModelLive.objects.all())
+        self.assertEqual(0, TestModelLive.objects.filter(is_live=True).count())
+
+    def test_publishing(self):
+        for x in range(0, 4):
+            TestModel.objects.create(title=str(x), is_published=x > 2)
+        # 1 SELECT, 1 UPDATE, 1 INSERT for the LogEntry objects, once the
+        # ContentType is cached.
+        ContentType.objects.get_for_model(TestModel)
+        with self.assertNumQueries(3):
+            self.run_action(TestModel, publish_selected,
+                            TestModel.objects.all())
+        self.assertEqual(4, TestModel.objects.published().count())
+        # the already published object wasn't changed again.
+        self.assertEqual(3, LogEntry.objects.count())
+        messages = self.run_action(TestModel, unpublish_selected,
+                                   TestModel.objects.filter(title='0'))
+        self.assertEqual(3, TestModel.objects.published().count())
+        self.assertEqual([u'Unpublished: 1 test models changed.'],
+                         [force_unicode(x) for x in messages])
+
+    def test_batches(self):
+        for x in range(0, 5):
+            TestModel.objects.create(title=str(x), is_published=False)
+        ContentType.objects.get_for_model(TestModel)
+        # 1 SELECT of only the fields needed, then an UPDATE and INSERT per
+        # batch of two.
+        with self.assertNumQueries(7):
+            messages = self.run_action(TestModel, publish_selected,
+                                       TestModel.objects.all(),
+                                       object_repr_fields=('title',),
+                                       bulk_change_batch_size=2)
+        self.assertEqual([u'Published: 5 test models changed.'],
+                         [force_unicode(x) for x in messages])
+        self.assertEqual(5, TestModel.objects.published().count())
+        self.assertEqual([str(x) for x in range(0, 5)], sorted(
+            LogEntry.objects.values_list('object_repr', flat=True)))
+
+    def test_date_publishing(self):
+        now = datetime.now()
+        TestModelDates.objects.create(title='scheduled',
+                                      publish_on=now + timedelta(days=1))
+        TestModelDates.objects.create(title='expired',
+                                      publish_on=now - timedelta(days=2),
+                                      unpublish_on=now - timedelta(days=1))
+        self.run_action(TestModelDates, publish_selected,
+                        TestModelDates.objects.all())
+        self.assertEqual(2, TestModelDates.objects.published().count())
+        self.run_action(TestModelDates, unpublish_selected,
+                        TestModelDates.objects.all())
+        self.assertEqual(2, TestModelDates.objects.unpublished().count())
+        self.assertEqual(4, LogEntry.objects.filter(user=self.user).count())
+
+    def test_soft_delete(self):
+        for x in range(0, 3):
+            TestSoftDeleteTracked.objects.create(title=str(x))
+        self.run_action(TestSoftDeleteTracked, soft_delete_selected,
+                        TestSoftDeleteTracked.objects.exclude(title='2'))
+        self.assertEqual(2, TestSoftDeleteTracked.objects.deleted().count())
+        self.run_action(TestSoftDeleteTracked, restore_selected,
+                        TestSoftDeleteTracked.objects.filter(title='0'))
+        self.assertEqual(1, TestSoftDeleteTracked.objects.restored().count())
+        messages = [force_unicode(x.change_message)
+                    for x in LogEntry.objects.order_by('pk')]
+        self.assertEqual([u'Soft deleted via bulk action.'] * 2 +
+                         [u'Restored via bulk action.'], messages)
+
+    def test_modified(self):
+        obj = TestSoftDeleteTracked.objects.create(title='old')
+        TestSoftDeleteTracked.objects.filter(pk=obj.pk).update(
+            modified=datetime.now() - timedelta(days=10))
+        self.run_action(TestSoftDeleteTracked, soft_delete_selected,
+                        TestSoftDeleteTracked.objects.all())
+        # only just deleted, so not yet due to be purged.
+        self.assertEqual([obj], list(purgeable(TestSoftDeleteTracked)))
+        self.assertEqual([], list(purgeable(TestSoftDeleteTracked, days=5)))
+
+    def test_permission(self):
+        self.user.is_superuser = False
+        self.assertRaises(PermissionDenied,
+                          lambda: self.run_action(TestModel, publish_selected,
+                                                  TestModel.objects.all()))
+
+
+class DeferredColumnsTestCase(DjangoTestCase):
+    def setUp(self):
+        counter = RelationCount(accessor='groups', label='test', cap=5)
+
+        class UserAdmin(DeferredColumnsAdminMixin, admin.ModelAdmin):
+            list_display = ['username', DeferredColumn(counter, 'groups'),
+                            DeferredColumn(lambda obj: u'<b>', 'escaped')]
+
+        self.model_admin = UserAdmin(User, admin.AdminSite(name='deferred'))
+        self.user = User.objects.create(username='admin', is_superuser=True)
+
+    def test_placeholder(self):
+        column = self.model_admin.list_display[1]
+        self.assertEqual(u'test', column.short_description)
+        result = column(self.user)
+        self.assertTrue(result.startswith(
+            u'<span class="changelist-deferred" data-column="groups" '
+            u'data-pk="%d">' % self.user.pk))
+        self.assertTrue('helpfulfields/deferred_columns.js'
+                        in force_unicode(self.model_admin.media))
+        names = [pattern.name for pattern in self.model_admin.get_urls()]
+        self.assertEqual('auth_user_deferred_columns', names[0])
+
+    def test_view(self):
+        groups = [Group.objects.create(name=str(x)) for x in range(0, 3)]
+        users = [self.user]
+        for x in range(0, 3):
+            user = User.objects.create(username=str(x))
+            for group in groups[:x]:
+                user.groups.add(group)
+            users.append(user)
+        request = RequestFactory().get('/', {'pk': [x.pk for x in users]})
+        request.user = self.user
+        # 1 for the users, 1 for all the relation counts.
+        with self.assertNumQueries(2):
+            response = self.model_admin.deferred_columns_view(request)
+        cells = json.loads(response.content)
+        self.assertEqual(4, len(cells))
+        self.assertTrue(cells[str(users[2].pk)]['groups'].startswith(u'1 '))
+        self.assertEqual(u'&lt;b&gt;', cells[str(users[2].pk)]['escaped'])
+
+    def test_permission(self):
+        request = RequestFactory().get('/', {'pk': self.user.pk})
+        request.user = User.objects.create(username='nobody')
+        self.assertRaises(PermissionDenied,
+                          self.model_admin.deferred_columns_view, request)
+
+
+class CachedColumnsTestCase(DjangoTestCase):
+    def setUp(self):
+        cache.clear()
+        self.counter = RelationCount(accessor='children', label='children')
+
+        class ParentAdmin(CachedColumnsAdminMixin, admin.ModelAdmin):
+            list_display = ['title', self.counter,
+                            LogEntrySparkline(days=2, renderer='text')]
+            row_cache_invalidators = (
+                (post_save, LogEntry, logentry_object_pks),
+            )
+
+        self.model_admin = ParentAdmin(TestTouchParent,
+                                       admin.AdminSite(name='cached'))
+        self.parents = [TestTouchParent.objects.create(title=str(x))
+                        for x in range(0, 3)]
+        for parent in self.parents[1:]:
+            TestTouchChild.objects.create(parent=parent)
+        self.user = User.objects.create(username=str(uuid4()))
+
+    def render(self):
+        request = RequestFactory().get('/')
+        ChangeList = self.model_admin.get_changelist(request)
+        cl = ChangeList(request, TestTouchParent,
+                        self.model_admin.list_display,
+                        ['title'], [], None, [], False, 100, 200, (),
+                        self.model_admin)
+        return [[column(obj)[:2] for column in cl.list_display[1:]]
+                for obj in cl.result_list]
+
+    def test_cached(self):
+        ContentType.objects.get_for_model(TestTouchParent)
+        # 1 count, 1 page, 1 for all the relation counts, 1 for all the
+        # sparklines.
+        with self.assertNumQueries(4):
+            first = self.render()
+        # 1 count, 1 page.
+        with self.assertNumQueries(2):
+            self.assertEqual(first, self.render())
+
+    def test_invalidated(self):
+        ContentType.objects.get_for_model(TestTouchParent)
+        self.render()
+        # modified changes when a child is added, via touch_parents.
+        TestTouchChild.objects.create(parent=self.parents[1])
+        ct = ContentType.objects.get_for_model(TestTouchParent)
+        LogEntry.objects.create(content_type=ct, object_id=self.parents[2].pk,
+                                user=self.user, action_flag=2)
+        # 1 count, 1 page, 1 for both relation counts, 1 for both sparklines.
+        with self.assertNumQueries(4):
+            found = self.render()
+        counts = sorted(cells[0] for cells in found)
+        self.assertEqual([u'0 ', u'1 ', u'2 '], counts)
+        sparklines = [cells[1] for cells in found]
+        self.assertEqual(2, sparklines.count(logentry_empty[:2]))
+
+    def test_signature(self):
+        today = date(2013, 1, 2)
+        tomorrow = today + timedelta(days=1)
+        columns = self.model_admin.list_display[1:]
+        self.assertEqual(column_signature(columns, today=today),
+                         column_signature(columns, today=today))
+        # the sparkline's window moves on with the day.
+        self.assertNotEqual(column_signature(columns, today=today),
+                            column_signature(columns, today=tomorrow))
+        self.assertEqual(column_signature([self.counter], today=today),
+                         column_signature([self.counter], today=tomorrow))
+
+
+class BenchmarkTestCase(DjangoTestCase):
+    # the benchmarks use the models above, so can't be imported until now.
+    def test_populate(self):
+        from benchmarks.fixtures import populate
+        populate(20)
+        self.assertEqual(20, TestModel.objects.count())
+        self.assertEqual(20, TestModelDates.objects.count())
+        self.assertEqual(20, TestSoftDeleteTracked.objects.count())
+        self.assertEqual(2, TestTouchParent.objects.count())
+        self.assertEqual(20, TestTouchChild.objects.count())
+        self.assertEqual(20, LogEntry.objects.count())
+        self.assertTrue(TestModel.objects.published().exists())
+
+    def test_percentile(self):
+        from benchmarks.changelist import percentile
+        timings = range(1, 101)
+        self.assertEqual(50, percentile(timings, 50))
+        self.assertEqual(99, percentile(timings, 99))
+        self.assertEqual(3, percentile([3], 95))
+
+    def test_compare(self):
+        from benchmarks.suite import compare
+        before = {'results': {'1000': {
+            'published': {'wall': 0.5, 'queries': 2, 'peak_kb': 1000},
+            'removed': {'wall': 0.5, 'queries': 2, 'peak_kb': 1000},
+        }}}
+        after = {'results': {'1000': {
+            'published': {'wall': 0.55, 'queries': 2, 'peak_kb': 1100},
+            'added': {'wall': 9.0, 'queries': 90, 'peak_kb': 90000},
+        }}}
+        self.assertEqual([], compare(before, after))
+        after['results']['1000']['published'] = {
+            'wall': 0.7, 'queries': 3, 'peak_kb': 1000}
+        self.assertEqual([
+            'published @ 1000 rows: 3 queries, was 2',
+            'published @ 1000 rows: wall 0.700s, was 0.500s',
+        ], compare(before, after))
+
+
+class QueryScalingTestCase(QueryScalingTestMixin, DjangoTestCase):
+    urls = 'helpfulfields.tests'
+
+    def setUp(self):
+        self.user = User.objects.create(username='admin', is_superuser=True)
+        size = max(self.scaling_page_sizes)
+        # in batches, as SQLite only allows so many parameters per query.
+        for start in range(0, size, 100):
+            TestTouchParent.objects.bulk_create([
+                TestTouchParent(title=str(x))
+                for x in range(start, start + 100)])
+        parents = list(TestTouchParent.objects.values_list('pk', flat=True))
+        ct = ContentType.objects.get_for_model(TestTouchParent)
+        for start in range(0, size, 100):
+            batch = parents[start:start + 100]
+            TestTouchChild.objects.bulk_create([
+                TestTouchChild(parent_id=pk) for pk in batch for x in (1, 2)])
+            LogEntry.objects.bulk_create([
+                LogEntry(content_type=ct, object_id=pk, user=self.user,
+                         action_flag=2) for pk in batch])
+
+    def model_admin(self, column):
+        class ParentAdmin(PreparedColumnsAdminMixin, admin.ModelAdmin):
+            list_display = ['title', column]
+        return ParentAdmin(TestTouchParent, scaling_site)
+
+    def test_view_on_site(self):
+        self.assertChangelistQueriesConstant(self.model_admin(ViewOnSite()),
+                                             self.user)
+
+    def test_relation_count(self):
+        counter = RelationCount('children', 'children', cap=10)
+        self.assertChangelistQueriesConstant(self.model_admin(counter),
+                                             self.user)
+
+    def test_relation_list(self):
+        items = RelationList('children', 'children', admin_site='scaling')
+        self.assertChangelistQueriesConstant(self.model_admin(items),
+                                             self.user)
+
+    def test_sparklines(self):
+        for spark in (LogEntrySparkline(),
+                      RelationSparkline('children', 'children')):
+            self.assertChangelistQueriesConstant(self.model_admin(spark),
+                                                 self.user)
+
+    def test_detects_growth(self):
+        def children(obj):
+            return obj.children.count()
+        model_admin = self.model_admin(children)
+        self.assertRaises(self.failureException,
+                          lambda: self.assertChangelistQueriesConstant(
+                              model_admin, self.user, page_sizes=(10, 20)))
+
+
+class AuditQueryPlansTestCase(DjangoTestCase):
+    def test_query_plan(self):
+        lines, problems = query_plan(TestModel.objects.filter(pk=1))
+        self.assertTrue(lines)
+        self.assertEqual([], problems)
+        lines, problems = query_plan(TestModel.objects.published())
+        self.assertEqual([FULL_SCAN], [kind for kind, line in problems])
+        lines, problems = query_plan(TestModel.objects.order_by('title'))
+        self.assertEqual([FULL_SCAN, TEMPORARY_SORT],
+                         [kind for kind, line in problems])
+
+    def test_command(self):
+        # call_command would exit on a CommandError, rather than raise it.
+        command = AuditQueryPlansCommand()
+        command.stdout = output = StringIO()
+        self.assertRaises(CommandError, command.handle,
+                          'helpfulfields.TestModel',
+                          'helpfulfields.TestSoftDeleteItem',
+                          database=DEFAULT_DB_ALIAS, verbosity=2)
+        lines = output.getvalue().splitlines()
+        self.assertTrue(
+            'helpfulfields.TestModel.published(): full table scan' in
+            [line.rsplit(':', 1)[0] for line in lines])
+        self.assertTrue('    SCAN helpfulfields_testsoftdeleteitem' in lines)
+        self.assertEqual('7 of 7 query plans have problems', lines[-1])
+
+    def test_nothing_audited(self):
+        output = StringIO()
+        call_command('audit_query_plans', 'auth', stdout=output)
+        self.assertEqual('0 of 0 query plans have problems\n',
+                         output.getvalue())
+
+
+class AdminChecksTestCase(DjangoTestCase):
+    def check(self, *columns, **attrs):
+        attrs['list_display'] = ['pk'] + list(columns)
+        bases = attrs.pop('bases', ())
+        model_admin = type('ParentAdmin', bases + (admin.ModelAdmin,), attrs)
+        warnings = check_model_admin(model_admin(TestTouchParent,
+                                                 scaling_site))
+        return [warning.id for warning in warnings]
+
+    def test_relation_index_field(self):
+        self.assertEqual(TestTouchChild._meta.get_field('parent'),
+                         relation_index_field(TestTouchParent, 'children'))
+        self.assertEqual(None, relation_index_field(TestTouchChild, 'parent'))
+        self.assertEqual(None, relation_index_field(TestTouchParent, 'title'))
+        self.assertEqual(None, relation_index_field(TestTouchParent, 'nope'))
+        through = User.groups.through
+        self.assertEqual(through._meta.get_field('user'),
+                         relation_index_field(User, 'groups'))
+        self.assertEqual(through._meta.get_field('group'),
+                         relation_index_field(Group, 'user'))
+
+    def test_per_row_queries(self):
+        self.assertEqual([PER_ROW_QUERIES] * 4, self.check(
+            RelationCount('children', 'children'),
+            RelationList('children', 'children'),
+            RelationSparkline('children', 'new children'),
+            LogEntrySparkline(), ViewOnSite()))
+
+    def test_prepared(self):
+        for bases in ((PreparedColumnsAdminMixin,),
+                      (CachedColumnsAdminMixin,)):
+            self.assertEqual([], self.check(
+                RelationCount('children', 'children'),
+                RelationList('children', 'children'),
+                RelationSparkline('children', 'new children'),
+                LogEntrySparkline(), bases=bases))
+
+    def test_deferred(self):
+        self.assertEqual([], self.check(
+            DeferredColumn(RelationCount('children', 'children'), 'count')))
+
+    def test_prefetched(self):
+        def queryset(self, request):
+            return TestTouchParent.objects.prefetch_related('children')
+        self.assertEqual([], self.check(RelationList('children', 'children'),
+                                        queryset=queryset))
+        self.assertEqual([PER_ROW_QUERIES], self.check(
+            RelationCount('children', 'children'), queryset=queryset))
+
+    def test_unpreparable(self):
+        class ModifiedSparkline(Sparkline):
+            field = 'modified'
+        model_admin = type('UserAdmin', (PreparedColumnsAdminMixin,
+                                         admin.ModelAdmin), {
+            'list_display': [RelationSparkline('groups', 'groups')],
+        })(User, scaling_site)
+        self.assertEqual([PER_ROW_QUERIES],
+                         [w.id for w in check_model_admin(model_admin)])
+        self.assertEqual([PER_ROW_QUERIES], self.check(
+            ModifiedSparkline('changes'), bases=(PreparedColumnsAdminMixin,)))
+
+    def test_unindexed_accessor(self):
+        warnings = self.check(RelationCount('unindexed', 'unindexed'),
+                              bases=(PreparedColumnsAdminMixin,))
+        self.assertEqual([UNINDEXED_ACCESSOR], warnings)
+
+    def test_unbounded_relation_list(self):
+        warnings = self.check(RelationList('children', 'children',
+                                           max_num=None),
+                              bases=(PreparedColumnsAdminMixin,))
+        self.assertEqual([UNBOUNDED_RELATION_LIST], warnings)
+
+    def test_check_admin_site(self):
+        site = admin.AdminSite(name='checks')
+        site.register(TestTouchParent, list_display=[
+            'pk', RelationList('unindexed', 'unindexed', max_num=None)])
+        site.register(TestTouchChild)
+        warnings = check_admin_site(site)
+        self.assertEqual([PER_ROW_QUERIES, UNINDEXED_ACCESSOR,
+                          UNBOUNDED_RELATION_LIST],
+                         [warning.id for warning in warnings])
+        self.assertEqual(u'helpfulfields.TestTouchParentAdmin: '
+                         u'(helpfulfields.W002) "unindexed" follows '
+                         u'"unindexed", but TestUnindexedChild.parent has '
+                         u'no index.\n\tHINT: Set db_index=True on '
+                         u'TestUnindexedChild.parent',
+                         unicode(warnings[1]))
+
+    def test_command(self):
+        # autodiscover() would otherwise clash with tests registering models.
+        registry, admin.site._registry = admin.site._registry, {}
+        output = StringIO()
+        try:
+            call_command('check_admin_columns', stdout=output)
+        finally:
+            admin.site._registry = registry
+        self.assertEqual('0 problems found\n', output.getvalue())
+
+
+class ImportCostTestCase(UnitTestCase):
+    #: the most seconds importing any one module may take, on top of the
+    #: django modules every project already has.
+    budget = 0.1
+
+    modules = ('text', 'settings', 'utils', 'querysets', 'deletion',
+               'touching', 'models', 'rowcache', 'admin', 'checks')
+
+    def test_budget(self):
+        for name in self.modules:
+            seconds, imported = import_cost('helpfulfields.%s' % name)
+            self.assertTrue(seconds < self.budget, '%s took %.3fs' % (
+                name, seconds))
+
+    def test_deferred(self):
+        seconds, imported = import_cost('helpfulfields.admin')
+        for name in ('django.contrib.admin.models', 'django.conf.urls',
+                     'uuid', 'django.test'):
+            self.assertFalse(name in imported, name)
+        seconds, imported = import_cost('helpfulfields.checks')
+        self.assertFalse('django.test' in imported)
+
+
+class PublishedPksTestCase(DjangoTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_membership(self):
+        pks = PublishedPks([5, 1, 3])
+        self.assertEqual([1, 3, 5], list(pks))
+        self.assertEqual(3, len(pks))
+        self.assertTrue(3 in pks)
+        self.assertFalse(2 in pks)
+        self.assertFalse(6 in pks)
+        pks = PublishedPks([u'b', u'a'])
+        self.assertTrue(u'a' in pks)
+        self.assertFalse(u'c' in pks)
+        self.assertFalse(pks.is_stale())
+
+    def test_publishing(self):
+        published = TestModel.objects.create(title='1', is_published=True)
+        unpublished = TestModel.objects.create(title='2', is_published=False)
+        # the test's transaction never commits, so caching would wait.
+        cache.clear()
+        with self.assertNumQueries(1):
+            pks = published_pks(TestModel)
+        self.assertEqual([published.pk], list(pks))
+        self.assertEqual(None, pks.expires)
+        with self.assertNumQueries(0):
+            self.assertTrue(is_published_pk(TestModel, published.pk))
+            self.assertFalse(is_published_pk(TestModel, unpublished.pk))
+        unpublished.is_published = True
+        unpublished.save()
+        self.assertTrue(is_published_pk(TestModel, unpublished.pk))
+        published.delete()
+        self.assertEqual([unpublished.pk], list(published_pks(TestModel)))
+
+    def test_date_publishing(self):
+        now = datetime.now()
+        published = TestModelDates.objects.create(
+            publish_on=now - timedelta(hours=1))
+        TestModelDates.objects.create(publish_on=now - timedelta(hours=2),
+                                      unpublish_on=now - timedelta(hours=1))
+        scheduled = TestModelDates.objects.create(
+            publish_on=now + timedelta(hours=2))
+        expiring = TestModelDates.objects.create(
+            publish_on=now - timedelta(hours=1),
+            unpublish_on=now + timedelta(hours=1))
+        with self.assertNumQueries(3):
+            pks = published_pks(TestModelDates)
+        self.assertEqual([published.pk, expiring.pk], list(pks))
+        self.assertEqual(expiring.unpublish_on + timedelta(microseconds=1),
+                         pks.expires)
+        self.assertFalse(pks.is_stale(now=expiring.unpublish_on))
+        self.assertTrue(pks.is_stale(now=pks.expires))
+        later = find_published_pks(TestModelDates,
+                                   now=now + timedelta(hours=3))
+        self.assertEqual([published.pk, scheduled.pk], list(later))
+        self.assertEqual(None, later.expires)
+
+    def test_expiry(self):
+        obj = TestModelDates.objects.create(
+            publish_on=datetime.now() - timedelta(hours=1))
+        pks = published_pks(TestModelDates)
+        pks.expires = datetime.now() - timedelta(seconds=1)
+        cache.set(published_pks_key(TestModelDates, DEFAULT_DB_ALIAS), pks)
+        TestModelDates.objects.filter(pk=obj.pk).update(
+            publish_on=datetime.now() + timedelta(hours=1))
+        self.assertFalse(is_published_pk(TestModelDates, obj.pk))
+
+    def test_per_database(self):
+        obj = TestModel.objects.create(title='1', is_published=True)
+        other_key = published_pks_key(TestModel, 'other')
+        cache.set(other_key, PublishedPks([obj.pk + 1]))
+        self.assertEqual([obj.pk], list(published_pks(TestModel)))
+        self.assertNotEqual(None, cache.get(published_pks_key(
+            TestModel, DEFAULT_DB_ALIAS)))
+        # saving to one database leaves the keys of others alone.
+        obj.save()
+        self.assertEqual(UNCOMMITTED, cache.get(
+            published_pks_key(TestModel, DEFAULT_DB_ALIAS)))
+        self.assertEqual([obj.pk + 1], list(cache.get(other_key)))
+
+    def test_unsupported(self):
+        self.assertRaises(AssertionError, published_pks, TestTouchParent)
+
+
+class PublishedPksTransactionTestCase(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.key = published_pks_key(TestModel, DEFAULT_DB_ALIAS)
+
+    def test_committed(self):
+        obj = TestModel.objects.create(title='1', is_published=True)
+        self.assertEqual([obj.pk], list(published_pks(TestModel)))
+        obj.is_published = False
+        obj.save()
+        self.assertEqual(None, cache.get(self.key))
+        self.assertEqual([], list(published_pks(TestModel)))
+
+    def test_racing_rebuild(self):
+        obj = TestModel.objects.create(title='1', is_published=True)
+        find = helpfulfields.publishedcache.find_published_pks
+
+        def find_then_unpublish(*args, **kwargs):
+            # another request unpublishes the object after its keys were
+            # read, but before they could be cached.
+            pks = find(*args, **kwargs)
+            obj.is_published = False
+            obj.save()
+            return pks
+        helpfulfields.publishedcache.find_published_pks = find_then_unpublish
+        try:
+            with deferred_touches():
+                self.assertEqual([obj.pk], list(published_pks(TestModel)))
+                helpfulfields.publishedcache.find_published_pks = find
+                self.assertEqual(UNCOMMITTED, cache.get(self.key))
+                # nor is anything read before the commit cached.
+                self.assertEqual([], list(published_pks(TestModel)))
+                self.assertEqual(UNCOMMITTED, cache.get(self.key))
+        finally:
+            helpfulfields.publishedcache.find_published_pks = find
+        self.assertEqual(None, cache.get(self.key))
+        self.assertEqual([], list(published_pks(TestModel)))
+        self.assertEqual([], list(cache.get(self.key)))
+
+    def test_rolled_back(self):
+        obj = TestModel.objects.create(title='1', is_published=True)
+        try:
+            with deferred_touches():
+                obj.is_published = False
+                obj.save()
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(None, cache.get(self.key))
+        self.assertEqual([obj.pk], list(published_pks(TestModel)))
+
+
+class LiveDatePublishingTestCase(TransactionTestCase):
+    # a TransactionTestCase, as asking SQLite for a query plan commits.
+    def setUp(self):
+        cache.clear()
+        now = datetime.now()
+        self.published = TestModelLive.objects.create(
+            publish_on=now - timedelta(hours=2))
+        self.scheduled = TestModelLive.objects.create(
+            publish_on=now + timedelta(hours=1))
+        self.expiring = TestModelLive.objects.create(
+            publish_on=now - timedelta(hours=2),
+            unpublish_on=now + timedelta(hours=2))
+        self.expired = TestModelLive.objects.create(
+            publish_on=now - timedelta(hours=2),
+            unpublish_on=now - timedelta(hours=1))
+
+    def published_at(self, when):
+        return set(TestModelLive.objects.published(now=when)
+                   .values_list('pk', flat=True))
+
+    def test_saving(self):
+        live = TestModelLive.objects.filter(is_live=True)
+        self.assertEqual(set([self.published.pk, self.expiring.pk]),
+                         set(live.values_list('pk', flat=True)))
+        self.scheduled.publish_on = datetime.now() - timedelta(minutes=1)
+        self.scheduled.save()
+        self.assertTrue(
+            TestModelLive.objects.get(pk=self.scheduled.pk).is_live)
+
+    def test_published(self):
+        now = datetime.now()
+        # nothing has been swept, so is_live can't be used yet.
+        query = str(TestModelLive.objects.published(now=now).query)
+        where = query.split(' WHERE ')[1]
+        self.assertFalse('is_live' in where)
+        self.assertEqual(set([self.published.pk, self.expiring.pk]),
+                         self.published_at(now))
+        self.assertEqual([], list(TestModelLive.objects.sweep_live(now=now)))
+        query = str(TestModelLive.objects.published().query)
+        where = query.split(' WHERE ')[1]
+        self.assertTrue('is_live' in where)
+        self.assertEqual(set([self.published.pk, self.expiring.pk]), set(
+            TestModelLive.objects.published().values_list('pk', flat=True)))
+        # is_live says nothing about the past, so the dates are compared.
+        query = str(TestModelLive.objects.published(now=now).query)
+        self.assertFalse('is_live' in query.split(' WHERE ')[1])
+        self.assertEqual(set([self.published.pk, self.expiring.pk]),
+                         self.published_at(now))
+        # the scheduled object isn't live yet, nor has the expiring one been
+        # swept, but the results are still right.
+        later = now + timedelta(hours=3)
+        self.assertEqual(set([self.published.pk, self.scheduled.pk]),
+                         self.published_at(later))
+        # before the sweep, is_live can't be trusted.
+        earlier = now - timedelta(hours=1, minutes=30)
+        self.assertEqual(set([self.published.pk, self.expiring.pk,
+                              self.expired.pk]), self.published_at(earlier))
+
+    def test_query_plan(self):
+        now = datetime.now()
+        # an archive of mostly expired objects, which is_live rules out.
+        TestModelLive.objects.bulk_create([
+            TestModelLive(publish_on=now - timedelta(days=x + 2),
+                          unpublish_on=now - timedelta(days=1))
+            for x in range(200)])
+        list(TestModelLive.objects.sweep_live(now=now))
+        if connection.vendor == 'sqlite':
+            connection.cursor().execute('ANALYZE')
+        lines, found = query_plan(TestModelLive.objects.published())
+        self.assertEqual([], [kind for kind, line in found
+                              if kind == FULL_SCAN])
+        if connection.vendor == 'sqlite':
+            self.assertTrue([line for line in lines if '(is_live=?)' in line])
+
+    def test_sweeping(self):
+        later = datetime.now() + timedelta(hours=3)
+        batches = list(TestModelLive.objects.sweep_live(batch_size=1,
+                                                        now=later))
+        self.assertEqual([(True, 1), (False, 1)], batches)
+        live = TestModelLive.objects.filter(is_live=True)
+        self.assertEqual(set([self.published.pk, self.scheduled.pk]),
+                         set(live.values_list('pk', flat=True)))
+        self.assertEqual(later, cache.get(live_swept_key(TestModelLive,
+                                                         'default')))
+        self.assertEqual([], list(TestModelLive.objects.sweep_live(now=later)))
+
+    def test_unsaved_changes(self):
+        now = datetime.now()
+        list(TestModelLive.objects.sweep_live(now=now))
+        TestModelLive.objects.bulk_create([
+            TestModelLive(publish_on=now - timedelta(days=1))])
+        fixture = serializers.serialize('json', [
+            TestModelLive(pk=100, publish_on=now - timedelta(days=1))])
+        for obj in serializers.deserialize('json', fixture):
+            obj.save()
+        later = now + timedelta(seconds=1)
+        self.assertEqual(4, len(self.published_at(later)))
+        self.assertTrue(100 in self.published_at(later))
+
+    def test_update(self):
+        now = datetime.now()
+        objs = TestModelLive.objects.all()
+        objs.filter(pk=self.scheduled.pk).update(
+            publish_on=now - timedelta(minutes=1))
+        # only the publish date changes, so the unpublish dates decide.
+        with self.assertNumQueries(2):
+            objs.exclude(pk=self.scheduled.pk).update(
+                publish_on=now - timedelta(days=1))
+        self.assertEqual(set([self.published.pk, self.scheduled.pk,
+                              self.expiring.pk]), self.live_pks())
+        with self.assertNumQueries(1):
+            objs.update(unpublish_on=now - timedelta(minutes=1))
+        self.assertEqual(set(), self.live_pks())
+        objs.filter(pk=self.expired.pk).update(
+            unpublish_on=F('publish_on') + timedelta(days=2))
+        self.assertEqual(set([self.expired.pk]), self.live_pks())
+        self.assertEqual(self.live_pks(), set(
+            TestModelLive.objects.published(now=datetime.now())
+            .values_list('pk', flat=True)))
+
+    def live_pks(self):
+        return set(TestModelLive.objects.filter(is_live=True)
+                   .values_list('pk', flat=True))
+
+    def test_sweep_rechecks_dates(self):
+        later = datetime.now() + timedelta(hours=3)
+        expiring = self.expiring
+
+        class SavingQuerySet(DatePublishingQuerySet):
+            # saves new dates once a batch has been chosen, as though done
+            # by another process.
+            def values_list(self, *fields, **kwargs):
+                pks = list(super(SavingQuerySet, self).values_list(
+                    *fields, **kwargs))
+                if expiring.pk in pks and expiring.unpublish_on is not None:
+                    expiring.unpublish_on = None
+                    expiring.save()
+                return pks
+
+        batches = list(SavingQuerySet(model=TestModelLive).sweep_live(
+            now=later))
+        self.assertEqual([(True, 1), (False, 0)], batches)
+        self.assertTrue(TestModelLive.objects.get(pk=expiring.pk).is_live)
+        self.assertEqual(set([self.published.pk, self.scheduled.pk,
+                              expiring.pk]), self.published_at(later))
+
+    def test_command(self):
+        TestModelLive.objects.filter(pk=self.published.pk).update(
+            is_live=False)
+        output = StringIO()
+        call_command('sweep_live_publishing', 'helpfulfields.TestModelLive',
+                     stdout=output)
+        self.assertEqual('TestModelLive: 1 made live, 0 no longer live\n',
+                         output.getvalue())
+        self.assertTrue(
+            TestModelLive.objects.get(pk=self.published.pk).is_live)
+
+
+class PublicationIndexTestCase(DjangoTestCase):
+    def test_against_database(self):
+        start = datetime(2013, 1, 1)
+        rng = Random(0)
+        for x in range(200):
+            publish_on = start + timedelta(days=rng.randint(0, 100))
+            unpublish_on = rng.choice([None, publish_on + timedelta(
+                days=rng.randint(0, 30))])
+            TestModelDates.objects.create(publish_on=publish_on,
+                                          unpublish_on=unpublish_on)
+        with self.assertNumQueries(1):
+            index = TestModelDates.objects.publication_index()
+        self.assertEqual(200, len(index))
+        for day in range(-1, 140, 3):
+            when = start + timedelta(days=day, hours=12)
+            expected = TestModelDates.objects.published(now=when)
+            self.assertEqual(sorted(expected.values_list('pk', flat=True)),
+                             sorted(index.published_at(when)))
+
+    def test_boundaries(self):
+        day = timedelta(days=1)
+        start = datetime(2013, 1, 1)
+        index = PublicationIndex([
+            (1, start, start + day),
+            (2, start + day, None),
+            (3, start + 3 * day, start + 4 * day),
+            (4, start + 2 * day, start),
+        ])
+        self.assertEqual(3, len(index))
+        self.assertEqual([1], index.published_at(start))
+        self.assertEqual([1, 2], sorted(index.published_at(start + day)))
+        self.assertEqual([], index.published_at(start - day))
+        self.assertEqual([2], index.published_between(start + 2 * day,
+                                                      start + 2 * day))
+        self.assertEqual([1, 2, 3], sorted(index.published_between(
+            start - day, start + 3 * day)))
+        self.assertEqual([2, 3], sorted(index.published_between(
+            start + 4 * day, start + 10 * day)))
+        self.assertEqual([], PublicationIndex([]).published_at(start))
+
+
+class TestModelSitemap(PublishedSitemap):
+    model = TestModel
+    limit = 3
+    chunk_size = 2
+
+
+class TestModelDatesSitemap(PublishedSitemap):
+    model = TestModelDates
+    url_fields = ('title',)
+
+    def location(self, obj):
+        return u'/dates/%s/' % obj.title
+
+
+class PublishedSitemapTestCase(DjangoTestCase):
+    def setUp(self):
+        self.site = RequestSite(RequestFactory().get('/'))
+
+    def test_pages(self):
+        for x in range(8):
+            TestModel.objects.create(title=str(x), is_published=x != 4)
+        sitemap = TestModelSitemap()
+        self.assertEqual(3, sitemap.paginator.num_pages)
+        seen = []
+        # counting, finding where the page starts (after the first), and
+        # a chunk of up to two objects at a time.
+        for page, queries in ((1, 3), (2, 4), (3, 3)):
+            with self.assertNumQueries(queries):
+                urls = sitemap.get_urls(page=page, site=self.site)
+            for entry in urls:
+                self.assertEqual(u'http://testserver/whee/',
+                                 entry['location'])
+                self.assertNotIn('item', entry)
+            seen.extend(urls)
+        self.assertEqual([3, 3, 1], [len(sitemap.get_urls(page=page,
+                                                          site=self.site))
+                                     for page in range(1, 4)])
+        published = TestModel.objects.published().order_by('pk')
+        self.assertEqual([obj.modified for obj in published],
+                         [entry['lastmod'] for entry in seen])
+        self.assertRaises(EmptyPage, sitemap.get_urls, page=4, site=self.site)
+
+    def test_only(self):
+        TestModelDates.objects.create(title=u'past',
+                                      publish_on=datetime(2013, 1, 1))
+        TestModelDates.objects.create(title=u'future',
+                                      publish_on=datetime.now() +
+                                      timedelta(days=1))
+        sitemap = TestModelDatesSitemap()
+        select = str(sitemap.items().query).split(' FROM ')[0]
+        self.assertIn('title', select)
+        self.assertNotIn('menu_title', select)
+        self.assertNotIn('unpublish_on', select)
+        urls = sitemap.get_urls(site=self.site, protocol='https')
+        self.assertEqual([u'https://testserver/dates/past/'],
+                         [entry['location'] for entry in urls])
+        self.assertEqual(None, urls[0]['lastmod'])
+
+    def test_unsupported(self):
+        class NoModelSitemap(PublishedSitemap):
+            pass
+
+        class UnpublishableSitemap(PublishedSitemap):
+            model = TestModelDirtyFields
+
+        self.assertRaises(AssertionError, NoModelSitemap().items)
+        self.assertRaises(AssertionError, UnpublishableSitemap().items)
+
+
 class FieldsetsTestCase(UnitTestCase):
     def test_construction(self):
         fieldsets = [
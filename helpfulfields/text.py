@@ -142,6 +142,52 @@ unpublish_label = _(u'publishing end date')
 unpublish_help = _(u'if filled in, this date and time are when this object '
                    u'will cease being available.')
 
+#: :attr:`~django.db.models.Field.verbose_name` /
+#: :attr:`~django.forms.Field.label` for the
+#: :attr:`~helpfulfields.models.LiveDatePublishing.is_live` field on
+#: :class:`~helpfulfields.models.LiveDatePublishing`
+is_live_label = _(u'live')
+
+#: the :attr:`~django.db.models.Field.help_text` for the
+#: :attr:`~helpfulfields.models.LiveDatePublishing.is_live` field on
+#: :class:`~helpfulfields.models.LiveDatePublishing`
+is_live_help = _(u'whether this object was published when it was last '
+                 u'saved or checked.')
+
+#: the state text for objects whose
+#: :attr:`~helpfulfields.models.DatePublishing.publish_on` is still in the
+#: future, used in
+#: :attr:`~helpfulfields.models.DatePublishing.PUBLICATION_STATES`
+publication_scheduled = _(u'scheduled')
+
+#: the state text for objects which are currently visible, used in
+#: :attr:`~helpfulfields.models.DatePublishing.PUBLICATION_STATES`
+publication_published = _(u'published')
+
+#: the state text for objects whose
+#: :attr:`~helpfulfields.models.DatePublishing.unpublish_on` has passed,
+#: used in :attr:`~helpfulfields.models.DatePublishing.PUBLICATION_STATES`
+publication_expired = _(u'expired')
+
+#: the state text for objects which aren't published, used by
+#: :class:`~helpfulfields.admin.PublishingListFilter`
+publication_unpublished = _(u'unpublished')
+
+#: the title of :class:`~helpfulfields.admin.DatePublishingListFilter`
+publication_filter_label = _(u'publication state')
+
+#: the state text for objects which have never been deleted, or have since been
+#: restored, used by :class:`~helpfulfields.admin.SoftDeleteListFilter`
+soft_delete_present = _(u'not deleted')
+
+#: text used by the list filters in :mod:`~helpfulfields.admin` for the choice
+#: which doesn't filter anything.
+list_filter_all = _(u'All')
+
+#: text used by the list filters in :mod:`~helpfulfields.admin` to show how
+#: many objects each choice would find.
+list_filter_count = _(u'%(title)s (%(count)d)')
+
 #: text for an exception used by :class:`~helpfulfields.models.SoftDelete` when
 #: trying to delete an unsaved object.
 object_lacks_pk = _(u"%(model)s object can't be deleted because its %(pk)s "
@@ -152,6 +198,18 @@ object_lacks_pk = _(u"%(model)s object can't be deleted because its %(pk)s "
 object_not_deleted = _(u"%(model)s object can't be restored because it has not "
                        u"been deleted.")
 
+#: text for an exception used by
+#: :class:`~helpfulfields.deletion.SoftDeleteCollector` when dependants can't
+#: be soft deleted, and the policy is to protect them.
+soft_delete_protected = _(u"Cannot soft delete, because related %(model)s "
+                          u"objects (via %(field)s) can't be soft deleted.")
+
+#: text for an exception used by
+#: :class:`~helpfulfields.deletion.SoftDeleteCollector` when given a policy it
+#: doesn't know about.
+soft_delete_bad_policy = _(u'%(policy)s is not a valid policy; expected one '
+                           u'of %(choices)s')
+
 #: text used by :class:`~helpfulfields.admin.ViewOnSite` to display in a
 #: :class:`~django.contrib.admin.ModelAdmin`'s `list_display`
 view_on_site_label = _(u'view on site')
@@ -164,7 +222,114 @@ object_not_mounted = _(u'the %(verbose_name)s is not mounted on admin site %(sit
 #: a default value in the changelist column header.
 logentry_label = _(u'change history')
 
+#: text for an exception used by
+#: :class:`~helpfulfields.admin.LogEntrySparkline` when asked to draw using a
+#: renderer it doesn't have.
+logentry_bad_renderer = _(u'%(renderer)s is not a valid renderer; expected '
+                          u'one of %(choices)s')
+
 #: text used by :class:`~helpfulfields.admin.LogEntrySparkline` for scenarios
 #: in which there are no :class:`~django.contrib.admin.models.LogEntry`
 #: objects for the given period.
 logentry_empty = _(u'no changes')
+
+#: text used by :class:`~helpfulfields.admin.EstimatedCountPaginator` when
+#: displaying a count which is only an estimate.
+approximate_count = _(u'about %(count)d')
+
+#: the :attr:`~django.contrib.admin.ModelAdmin.actions` description for
+#: :func:`~helpfulfields.admin.publish_selected`
+publish_action_label = _(u'Publish selected %(verbose_name_plural)s')
+
+#: the :attr:`~django.contrib.admin.ModelAdmin.actions` description for
+#: :func:`~helpfulfields.admin.unpublish_selected`
+unpublish_action_label = _(u'Unpublish selected %(verbose_name_plural)s')
+
+#: the :attr:`~django.contrib.admin.ModelAdmin.actions` description for
+#: :func:`~helpfulfields.admin.soft_delete_selected`
+soft_delete_action_label = _(u'Soft delete selected %(verbose_name_plural)s')
+
+#: the :attr:`~django.contrib.admin.ModelAdmin.actions` description for
+#: :func:`~helpfulfields.admin.restore_selected`
+restore_action_label = _(u'Restore selected %(verbose_name_plural)s')
+
+#: the :class:`~django.contrib.admin.models.LogEntry` change message written
+#: for each object changed by one of the bulk actions in
+#: :mod:`~helpfulfields.admin`
+bulk_action_log = _(u'%(action)s via bulk action.')
+
+#: the message shown to the user after one of the bulk actions in
+#: :mod:`~helpfulfields.admin` has finished.
+bulk_action_done = _(u'%(action)s: %(count)d %(verbose_name_plural)s changed.')
+
+#: the state text for objects which have been published by a bulk action in
+#: :mod:`~helpfulfields.admin`
+published_action = _(u'Published')
+
+#: the state text for objects which have been unpublished by a bulk action in
+#: :mod:`~helpfulfields.admin`
+unpublished_action = _(u'Unpublished')
+
+#: the state text for objects which have been soft deleted by a bulk action
+#: in :mod:`~helpfulfields.admin`
+soft_deleted_action = _(u'Soft deleted')
+
+#: the state text for objects which have been restored by a bulk action in
+#: :mod:`~helpfulfields.admin`
+restored_action = _(u'Restored')
+
+#: text shown by :class:`~helpfulfields.admin.DeferredColumn` in place of
+#: a cell's content, until it has been loaded.
+deferred_loading = _(u'loading&hellip;')
+
+#: text for an exception used by :func:`~helpfulfields.utils.query_plan`
+#: when it doesn't know how to ask a database for a query plan.
+query_plan_unsupported = _(u'query plans are not supported for %(vendor)s '
+                           u'databases')
+
+#: text for a warning from :func:`~helpfulfields.checks.check_model_admin`
+#: about a column which queries the database once per changelist row.
+check_per_row_queries = _(u'"%(column)s" will query the database for every '
+                          u'row of the changelist.')
+
+#: the hint given alongside :data:`check_per_row_queries` when the column
+#: could be prepared for the whole page.
+check_per_row_hint = _(u'Use PreparedColumnsAdminMixin or '
+                       u'CachedColumnsAdminMixin, or wrap the column in a '
+                       u'DeferredColumn.')
+
+#: the hint given alongside :data:`check_per_row_queries` when the column
+#: can't be prepared for the whole page.
+check_per_row_unpreparable_hint = _(u'Only reverse foreign keys, and columns '
+                                    u'with a page_queryset, may be counted '
+                                    u'for the whole page at once.')
+
+#: text for a warning from :func:`~helpfulfields.checks.check_model_admin`
+#: about a column following a relation without an index.
+check_unindexed_accessor = _(u'"%(column)s" follows "%(accessor)s", but '
+                             u'%(model)s.%(field)s has no index.')
+
+#: the hint given alongside :data:`check_unindexed_accessor`
+check_unindexed_accessor_hint = _(u'Set db_index=True on %(model)s.%(field)s')
+
+#: text for a warning from :func:`~helpfulfields.checks.check_model_admin`
+#: about a :class:`~helpfulfields.admin.RelationList` without a ``max_num``
+check_unbounded_relation_list = _(u'"%(column)s" loads and shows every '
+                                  u'object related via "%(accessor)s", for '
+                                  u'every row of the changelist.')
+
+#: the hint given alongside :data:`check_unbounded_relation_list`
+check_unbounded_relation_list_hint = _(u'Give the RelationList a max_num, or '
+                                       u'use a RelationCount instead.')
+
+#: text for an exception used by
+#: :func:`~helpfulfields.publishedcache.published_pks` when the model's
+#: default manager can't find published objects.
+published_pks_unsupported = _(u'the default manager of %(model)s has no '
+                              u'published() method')
+
+#: text for an exception used by
+#: :class:`~helpfulfields.sitemaps.PublishedSitemap` when it has no model, or
+#: the model's default manager can't find published objects.
+sitemap_unsupported = _(u'%(sitemap)s needs a model whose default manager '
+                        u'has a published() method')
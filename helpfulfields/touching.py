@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+from functools import wraps
+import sys
+from threading import local
+from django.db import transaction
+from helpfulfields.settings import TOUCH_BATCH_SIZE
+from helpfulfields.utils import stamp_modified
+
+_state = local()
+
+
+def _pending():
+    """
+    The parents waiting to be touched by the innermost active
+    :class:`deferred_touches` block in this thread, or :data:`None` if there
+    isn't one.
+    """
+    stack = getattr(_state, 'stack', None)
+    if stack:
+        return stack[-1]
+    return None
+
+
+def after_transaction(func, *args):
+    """
+    Calls ``func(*args)`` once the innermost active :class:`deferred_touches`
+    block in this thread has committed (or rolled back), rather than now.
+    The same call is only made once per block.
+
+    :return: whether there was a block to wait for; if not, the caller must
+             decide what to do instead.
+    :rtype: boolean
+    """
+    stack = getattr(_state, 'finished', None)
+    if not stack:
+        return False
+    if (func, args) not in stack[-1]:
+        stack[-1].append((func, args))
+    return True
+
+
+def parents_of(instance):
+    """
+    Finds the parents which should be touched when `instance` changes, as
+    declared in its :attr:`~helpfulfields.models.ChangeTracking.touch_parents`
+
+    :param instance: a model instance.
+    :return: pairs of the parent model and primary key.
+    :rtype: list of tuples
+    """
+    parents = []
+    for name in getattr(instance, 'touch_parents', ()):
+        field = instance._meta.get_field(name)
+        value = getattr(instance, field.attname)
+        if value is not None:
+            parents.append((field.rel.to, value))
+    return parents
+
+
+def touch(pending, using=None):
+    """
+    Sets the :attr:`~helpfulfields.models.ChangeTracking.modified` date of
+    the given objects to now, using one ``UPDATE`` per model (batched, should
+    there be a great many primary keys).
+
+    Touched models which declare their own
+    :attr:`~helpfulfields.models.ChangeTracking.touch_parents` have those
+    touched in turn, so that changes propagate all the way up.
+
+    :param pending: a mapping of models to a set of primary keys.
+    :param using: the db router to use.
+    :rtype: None
+    """
+    now = datetime.now()
+    done = {}
+    pending = dict((model, set(pks)) for model, pks in pending.items())
+    while pending:
+        model, pks = pending.popitem()
+        seen = done.setdefault(model, set())
+        pks = sorted(pks - seen)
+        seen.update(pks)
+        manager = model._base_manager.using(using)
+        for start in range(0, len(pks), TOUCH_BATCH_SIZE):
+            batch = pks[start:start + TOUCH_BATCH_SIZE]
+            manager.filter(pk__in=batch).update(
+                **stamp_modified(model, {}, now=now))
+            for name in getattr(model, 'touch_parents', ()):
+                field = model._meta.get_field(name)
+                found = (manager.filter(pk__in=batch)
+                         .exclude(**{'%s__isnull' % field.attname: True})
+                         .values_list(field.attname, flat=True))
+                pending.setdefault(field.rel.to, set()).update(found)
+
+
+class deferred_touches(object):
+    """
+    Opens a transaction, during which saving or deleting objects with
+    :attr:`~helpfulfields.models.ChangeTracking.touch_parents` only
+    remembers which parents need touching. Just before the transaction
+    commits, each parent model gets one ``UPDATE``, rather than one per
+    child::
+
+        with deferred_touches():
+            for item in category.items.all():
+                item.save()
+
+    May also be used as a decorator. Outside of a block, parents are
+    touched immediately whenever a child changes.
+
+    Anything waiting on the transaction via :func:`after_transaction` (such
+    as discarding the cached keys of
+    :func:`~helpfulfields.publishedcache.published_pks`) is done once it
+    has ended.
+
+    :test case: :class:`helpfulfields.tests.TouchParentsTestCase`
+    """
+    def __init__(self, using=None):
+        """
+        :param using: the db router to use.
+        """
+        self.using = using
+
+    def __enter__(self):
+        self.transaction = transaction.commit_on_success(using=self.using)
+        self.transaction.__enter__()
+        if getattr(_state, 'stack', None) is None:
+            _state.stack = []
+        _state.stack.append({})
+        if getattr(_state, 'finished', None) is None:
+            _state.finished = []
+        _state.finished.append([])
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pending = _state.stack.pop()
+        try:
+            if exc_type is None and pending:
+                try:
+                    touch(pending, using=self.using)
+                except Exception:
+                    self.transaction.__exit__(*sys.exc_info())
+                    raise
+            return self.transaction.__exit__(exc_type, exc_value, traceback)
+        finally:
+            self.finish(_state.finished.pop())
+
+    def finish(self, waiting):
+        """
+        Makes the calls given to :func:`after_transaction` during the block,
+        or hands them on to the enclosing block, if the transaction is still
+        open.
+        """
+        if transaction.is_managed(using=self.using):
+            for func, args in waiting:
+                after_transaction(func, *args)
+            return None
+        for func, args in waiting:
+            func(*args)
+
+    def __call__(self, func):
+        @wraps(func)
+        def inner(*args, **kwargs):
+            with self.__class__(using=self.using):
+                return func(*args, **kwargs)
+        return inner
+
+
+def touch_parents_receiver(sender, instance, raw=False, using=None, **kwargs):
+    """
+    Listens to :data:`~django.db.models.signals.post_save` and
+    :data:`~django.db.models.signals.post_delete` for every model, and
+    touches (or remembers to touch) the parents of those which declare
+    :attr:`~helpfulfields.models.ChangeTracking.touch_parents`
+    """
+    if raw or not getattr(sender, 'touch_parents', None):
+        return None
+    pending = _pending()
+    immediately = pending is None
+    if immediately:
+        pending = {}
+    for model, pk in parents_of(instance):
+        pending.setdefault(model, set()).add(pk)
+    if immediately and pending:
+        touch(pending, using=using)
@@ -1 +1,361 @@
 # -*- coding: utf-8 -*-
+from datetime import datetime
+from django.db import connections, transaction, DatabaseError
+from django.db.models.fields import FieldDoesNotExist
+from django.db.backends.util import typecast_timestamp
+from helpfulfields.settings import COUNT_BATCH_SIZE
+from helpfulfields.text import query_plan_unsupported
+
+
+def quoted_column(queryset, field_name):
+    """
+    Finds the fully qualified, quoted column name for a field on the model
+    a queryset represents, for use in hand-written SQL fragments passed to
+    :meth:`~django.db.models.query.QuerySet.extra`.
+
+    :param queryset: the :class:`~django.db.models.query.QuerySet` whose
+                     model we're interested in.
+    :param field_name: the name of the field on the model.
+    :return: the quoted ``table.column``
+    :rtype: string
+    """
+    qn = connections[queryset.db].ops.quote_name
+    opts = queryset.model._meta
+    return '%s.%s' % (qn(opts.db_table), qn(opts.get_field(field_name).column))
+
+
+def datetime_param(queryset, value):
+    """
+    Prepares a :class:`~datetime.datetime` for use as a parameter to
+    hand-written SQL, in the same way the ORM would.
+
+    :param queryset: the :class:`~django.db.models.query.QuerySet` which will
+                     execute the SQL.
+    :param value: the :class:`~datetime.datetime` to convert.
+    :return: the database representation of `value`
+    """
+    return connections[queryset.db].ops.value_to_db_datetime(value)
+
+
+def has_modified(model):
+    """
+    :return: whether the model has a
+             :attr:`~helpfulfields.models.ChangeTracking.modified` date.
+    :rtype: boolean
+    """
+    return 'modified' in [field.name for field in model._meta.fields]
+
+
+def stamp_modified(model, changes, now=None):
+    """
+    Adds :attr:`~helpfulfields.models.ChangeTracking.modified` to the
+    `changes` about to be given to
+    :meth:`~django.db.models.query.QuerySet.update`, if the model has it and
+    it isn't being set already, so that the rows changed are stamped in the
+    same statement, as saving them would have done. Every bulk write made
+    by `helpfulfields` goes through this, whichever manager (and so
+    queryset) it uses.
+
+    :param model: the model being updated.
+    :param changes: the field values to set.
+    :param now: the :class:`~datetime.datetime` to stamp; defaults to
+                :meth:`datetime.datetime.now()`
+    :return: the changes to make.
+    :rtype: dictionary
+    """
+    if 'modified' not in changes and has_modified(model):
+        changes = dict(changes, modified=now or datetime.now())
+    return changes
+
+
+def grouped_count(queryset, column, *columns):
+    """
+    Counts the rows in a queryset per distinct value of `column`, in a single
+    query, by wrapping the queryset's SQL in a ``GROUP BY``.
+    This allows grouping by values added via
+    :meth:`~django.db.models.query.QuerySet.extra`, which the ORM otherwise
+    won't do for us.
+
+    :param queryset: the :class:`~django.db.models.query.QuerySet` to count,
+                     which must select `column`
+    :param column: the name of the selected column (or model field) to
+                   group by.
+    :param columns: further columns to group by, in which case the keys of
+                    the mapping returned are tuples of every value.
+    :return: a mapping of each value found to the number of rows having it.
+    :rtype: dictionary
+    """
+    connection = connections[queryset.db]
+    qn = connection.ops.quote_name
+    names = (column,) + columns
+    inner = queryset.order_by().values(*names)
+    sql, params = inner.query.get_compiler(queryset.db).as_sql()
+    selected = []
+    for name in names:
+        try:
+            selected.append(qn(queryset.model._meta.get_field(name).column))
+        except FieldDoesNotExist:
+            # added via extra(), so selected under its own name.
+            selected.append(qn(name))
+    outer = ('SELECT %(cols)s, COUNT(*) FROM (%(sql)s) %(alias)s '
+             'GROUP BY %(cols)s')
+    cursor = connection.cursor()
+    cursor.execute(outer % {
+        'cols': ', '.join(selected),
+        'sql': sql,
+        'alias': qn('%s_grouped' % column),
+    }, params)
+    if columns:
+        return dict((tuple(row[:-1]), row[-1]) for row in cursor.fetchall())
+    return dict(cursor.fetchall())
+
+
+def counts_by_day(queryset, field_name, owner=None):
+    """
+    Counts the rows in a queryset per calendar day of a date or datetime
+    field, in a single query, by truncating the column to the day in the
+    database and grouping on that. Only the per-day totals are ever
+    fetched, however many rows there are.
+
+    :param queryset: the :class:`~django.db.models.query.QuerySet` to count.
+    :param field_name: the name of the date or datetime field on the model.
+    :param owner: the optional name of a field to count each value of
+                  separately, such as the foreign key to a parent object.
+    :return: a mapping of each :class:`~datetime.date` which has rows to the
+             number of rows on it. Given an `owner`, a mapping of each of
+             its values to such a mapping.
+    :rtype: dictionary
+    """
+    connection = connections[queryset.db]
+    day = connection.ops.date_trunc_sql('day',
+                                        quoted_column(queryset, field_name))
+    queryset = queryset.extra(select={'day': day})
+    if owner is None:
+        counts = dict(((None, value), count) for value, count
+                      in grouped_count(queryset, 'day').items())
+    else:
+        counts = dict(((key, value), count) for (value, key), count
+                      in grouped_count(queryset, 'day', owner).items())
+    by_owner = {}
+    for (key, value), count in counts.items():
+        # backends differ in whether truncated dates come back as strings
+        # or as datetimes.
+        if isinstance(value, basestring):
+            value = typecast_timestamp(value)
+        if isinstance(value, datetime):
+            value = value.date()
+        by_day = by_owner.setdefault(key, {})
+        by_day[value] = by_day.get(value, 0) + count
+    if owner is None:
+        return by_owner.get(None, {})
+    return by_owner
+
+
+def counts_for_querysets(querysets, cap=None):
+    """
+    Counts each of a number of querysets, in as few queries as possible, by
+    joining a ``COUNT(*)`` of each together with ``UNION ALL``.
+
+    Given a `cap`, each count is of a subquery limited to ``cap + 1`` rows,
+    so the database does a bounded amount of work no matter how many
+    objects there really are; a count greater than `cap` means "more than".
+
+    :param querysets: a mapping of any key to the
+                      :class:`~django.db.models.query.QuerySet` to count. All
+                      querysets should be for the same database.
+    :param cap: the optional number of objects to stop counting after.
+    :return: a mapping of the same keys to their counts.
+    :rtype: dictionary
+    """
+    items = list(querysets.items())
+    if not items:
+        return {}
+    connection = connections[items[0][1].db]
+    counts = {}
+    for start in range(0, len(items), COUNT_BATCH_SIZE):
+        batch = items[start:start + COUNT_BATCH_SIZE]
+        parts = []
+        params = []
+        for index, (key, queryset) in enumerate(batch):
+            inner = queryset.order_by().values('pk')
+            if cap is not None:
+                inner = inner[:cap + 1]
+            sql, inner_params = inner.query.get_compiler(queryset.db).as_sql()
+            parts.append('SELECT %d, COUNT(*) FROM (%s) %s' % (
+                index, sql, connection.ops.quote_name('counted_%d' % index)))
+            params.extend(inner_params)
+        cursor = connection.cursor()
+        cursor.execute(' UNION ALL '.join(parts), params)
+        for index, count in cursor.fetchall():
+            counts[batch[index][0]] = count
+    return counts
+
+
+def is_unfiltered(queryset):
+    """
+    Whether or not a queryset represents every row in its table, in which
+    case the database's own statistics may be used to count it.
+
+    :rtype: boolean
+    """
+    query = queryset.query
+    return not (query.where or query.having or query.distinct
+                or query.low_mark or query.high_mark is not None)
+
+
+def _sqlite_row_estimate(cursor, table):
+    # only populated by running ANALYZE; the first number of the stat column
+    # is the number of rows in the table.
+    cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table])
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return int(row[0].split()[0])
+
+
+def _postgresql_row_estimate(cursor, table):
+    cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s',
+                   [table])
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return int(row[0])
+
+
+def _mysql_row_estimate(cursor, table):
+    cursor.execute('SELECT table_rows FROM information_schema.tables WHERE '
+                   'table_schema = DATABASE() AND table_name = %s', [table])
+    row = cursor.fetchone()
+    if row is None or row[0] is None:
+        return None
+    return int(row[0])
+
+
+#: functions for estimating the number of rows in a table without counting
+#: them, keyed by the database ``vendor``. Each is given a cursor and the
+#: table name, and should return an integer, or :data:`None` if it has no idea.
+#: Other backends may be supported by adding to this.
+ROW_ESTIMATORS = {
+    'sqlite': _sqlite_row_estimate,
+    'postgresql': _postgresql_row_estimate,
+    'mysql': _mysql_row_estimate,
+}
+
+
+def estimated_row_count(queryset):
+    """
+    Asks the database roughly how many rows are in the queryset's table,
+    using one of the :data:`ROW_ESTIMATORS`.
+
+    If the estimator fails, it's rolled back to a savepoint (or the whole
+    transaction is, where savepoints aren't used and it isn't managed), so
+    that the queries which follow don't find PostgreSQL's transaction
+    aborted.
+
+    :return: the estimate, or :data:`None` if there isn't one.
+    :rtype: integer
+    """
+    using = queryset.db
+    connection = connections[using]
+    estimator = ROW_ESTIMATORS.get(connection.vendor)
+    if estimator is None:
+        return None
+    sid = transaction.savepoint(using=using)
+    try:
+        estimate = estimator(connection.cursor(),
+                             queryset.model._meta.db_table)
+    except DatabaseError:
+        if sid is not None:
+            transaction.savepoint_rollback(sid, using=using)
+        else:
+            transaction.rollback_unless_managed(using=using)
+        return None
+    if sid is not None:
+        transaction.savepoint_commit(sid, using=using)
+    return estimate
+
+
+#: the problem reported by :func:`query_plan` when the database reads every
+#: row of a table.
+FULL_SCAN = 'full table scan'
+
+#: the problem reported by :func:`query_plan` when the database has to sort
+#: or group rows itself, rather than reading them in order from an index.
+TEMPORARY_SORT = 'temporary sort'
+
+
+def _sqlite_query_plan(cursor, sql, params):
+    cursor.execute('EXPLAIN QUERY PLAN %s' % sql, params)
+    # the detail is always the last column, however many the version of
+    # SQLite returns.
+    lines = [row[-1] for row in cursor.fetchall()]
+    problems = []
+    for line in lines:
+        # "SCAN TABLE x", or just "SCAN x" in newer versions, but not when
+        # it's scanning an index instead.
+        if line.startswith('SCAN') and 'INDEX' not in line:
+            problems.append((FULL_SCAN, line))
+        if 'TEMP B-TREE' in line:
+            problems.append((TEMPORARY_SORT, line))
+    return lines, problems
+
+
+def _postgresql_query_plan(cursor, sql, params):
+    cursor.execute('EXPLAIN %s' % sql, params)
+    lines = [row[0] for row in cursor.fetchall()]
+    problems = []
+    for line in lines:
+        node = line.strip().lstrip('->').strip()
+        if node.startswith('Seq Scan'):
+            problems.append((FULL_SCAN, node))
+        if node.startswith('Sort ') or node.startswith('HashAggregate'):
+            problems.append((TEMPORARY_SORT, node))
+    return lines, problems
+
+
+def _mysql_query_plan(cursor, sql, params):
+    cursor.execute('EXPLAIN %s' % sql, params)
+    names = [column[0].lower() for column in cursor.description]
+    rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+    lines = []
+    problems = []
+    for row in rows:
+        line = '%(table)s: type=%(type)s key=%(key)s extra=%(extra)s' % row
+        lines.append(line)
+        if row['type'] == 'ALL':
+            problems.append((FULL_SCAN, line))
+        extra = row['extra'] or ''
+        if 'Using filesort' in extra or 'Using temporary' in extra:
+            problems.append((TEMPORARY_SORT, line))
+    return lines, problems
+
+
+#: functions for asking the database how it would execute a query, keyed by
+#: the database ``vendor``. Each is given a cursor, the SQL and its
+#: parameters, and should return the lines of the plan, and a list of any
+#: problems found in it, as pairs of :data:`FULL_SCAN` or
+#: :data:`TEMPORARY_SORT` and the offending line.
+#: Other backends may be supported by adding to this.
+QUERY_PLANNERS = {
+    'sqlite': _sqlite_query_plan,
+    'postgresql': _postgresql_query_plan,
+    'mysql': _mysql_query_plan,
+}
+
+
+def query_plan(queryset):
+    """
+    Asks the database how it would execute a queryset, using one of the
+    :data:`QUERY_PLANNERS`, to find any full table scans or sorts which an
+    index might avoid.
+
+    :return: the lines of the plan, and a list of the problems in it.
+    :rtype: tuple
+    """
+    connection = connections[queryset.db]
+    planner = QUERY_PLANNERS.get(connection.vendor)
+    assert planner is not None, query_plan_unsupported % {
+        'vendor': connection.vendor,
+    }
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    return planner(connection.cursor(), sql, params)
@@ -39,7 +39,7 @@ TROVE_CLASSIFIERS = [
     'License :: OSI Approved :: BSD License',
 ]
 
-PACKAGES = find_packages()
+PACKAGES = find_packages(exclude=['benchmarks'])
 
 README = open(os.path.join(BASE_DIR, 'README.rst')).read()
 
@@ -54,6 +54,7 @@ setup(
     long_description=README,
     url='https://github.com/kezabelle/django-helpfulfields/tree/master',
     packages=PACKAGES,
+    include_package_data=True,
     install_requires=REQUIREMENTS,
     tests_require=TEST_REQUIREMENTS,
     test_suite='setuptest.setuptest.SetupTestSuite',
@@ -3,7 +3,11 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': None,
-    }
+    },
+    'other': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': None,
+    },
 }
 
 INSTALLED_APPS = (